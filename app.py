@@ -1,15 +1,25 @@
+# Ext, patch before anything opens sockets so concurrent requests cooperate
+from gevent import monkey
+monkey.patch_all()
+
 # Lib
 from v2.system.canned_os import CannedOS
+from v2.system.multi_os import MultiProcessOS
+from v2.data.simple_data import ServiceMetaData
 from v2.services.analyzer import AnalyzerService
 from v2.services.initializer import InitializerService
 from v2.services.requestor import RequestorService
 from v2.services.response import ResponseParserService
-from v2.services.freezer import Freezer50Service, Freezer250Service, Freezer500Service, Freezer1000Service
-from v2.services.db import DBService
+from v2.services.dedup import EventDedupService
+from v2.services.freezer import FreezerService
+from v2.services.db import SqliteDBService
 from v2.services.queue import QueueService
+from v2.services.rate_limits import RateLimitService
 from v2.data.timings import ResourceTimings, Resource
 
 # Ext
+from functools import partial
+from os import environ
 import gevent
 
 __author__ = 'jason'
@@ -28,46 +38,79 @@ def github_events_resource():
     return resource
 
 
-def main():
+def schedule_services(os, shard=None, publish_events=False):
     """
-    Main
+    Schedules the pipeline, on a worker of a MultiProcessOS only the resources
+    of its shard are polled.
+    :param os: the OS to schedule on
+    :param shard: the Shard of the worker, None for all resources
+    :param publish_events: put the new events of each response on the events topic, the response
+                           service publishes its results and the dedup service forwards the new ones.
+                           Opt in, nothing in the pipeline consumes the events topic yet.
     :return:
     """
-
-    os = CannedOS("CannedOS")
-    os.bootup()
-
     # == support services ==
-    os.schedule_service(DBService, "database-service", True)
-    os.schedule_service(QueueService, "queue-service", True)
+    # these start first, together, the action services declare what they depend on
+    # so they only start, in waves, once those have started, see `ServiceMetaData.depends_on`
+    os.schedule_service(SqliteDBService, ServiceMetaData("database-service", recovery_enabled=True))
+    os.schedule_service(QueueService, ServiceMetaData("queue-service", recovery_enabled=True))
+    os.schedule_service(RateLimitService, ServiceMetaData("rate-limit-service", recovery_enabled=True))
 
     # == action services ==
 
     # reads either file or db and prims the queue - right now hard coded
-    os.schedule_service(InitializerService, "initializer-service", True)
+    os.schedule_service(InitializerService, ServiceMetaData("initializer-service", recovery_enabled=True,
+                                                            depends_on=["database-service", "queue-service"]),
+                        shard=shard)
 
     # analyzer pulls from queue things to analyze, if a resource can
     # be requested it is sent to the requestor queue to be requested
-    os.schedule_service(AnalyzerService, "analyzer-service", True)
+    os.schedule_service(AnalyzerService, ServiceMetaData("analyzer-service", recovery_enabled=True,
+                                                         depends_on=["queue-service"]))
 
     # requestor pulls from the request queue and executes a request
     # the response is then put on the publish queue
-    os.schedule_service(RequestorService, "requestor-service", True)
+    os.schedule_service(RequestorService, ServiceMetaData("requestor-service", recovery_enabled=True,
+                                                          depends_on=["queue-service"]))
 
     # response service will read from the publish queue and
     # parse the response, updating the timings and doing other
     # data intense tasks. One complete the resource is once again put
     # on the analyze queue
-    os.schedule_service(ResponseParserService, "response-service", True)
+    os.schedule_service(ResponseParserService, ServiceMetaData("response-service", recovery_enabled=True,
+                                                               depends_on=["database-service", "queue-service"]),
+                        publish_results=publish_events)
+
+    # dedup reads the results the response service publishes and puts only
+    # the events not seen before on the events topic
+    if publish_events:
+        os.schedule_service(EventDedupService, ServiceMetaData("dedup-service", recovery_enabled=True,
+                                                               depends_on=["queue-service", "response-service"]))
 
-    # setup the freezer services, where each work in a different greenlet
-    # event loop with a sleep (wait idle).
-    os.schedule_service(Freezer50Service, "freezer-50", True)
-    os.schedule_service(Freezer250Service, "freezer-250", True)
-    os.schedule_service(Freezer500Service, "freezer-500", True)
-    os.schedule_service(Freezer1000Service, "freezer-1000", True)
+    # setup the freezer service, which sleeps until the earliest waiting
+    # resource is due and releases it back through the analyzer.
+    os.schedule_service(FreezerService, ServiceMetaData("freezer-service", recovery_enabled=True,
+                                                        depends_on=["queue-service"]))
 
 
+def main():
+    """
+    Main
+    Set WORKERS to run the pipeline on that many processes, one per core.
+    Set EVENTS=1 to publish the new events of each response, see `schedule_services()`.
+    :return:
+    """
+    workers = int(environ.get("WORKERS", 1))
+    setup = partial(schedule_services, publish_events=environ.get("EVENTS") == "1")
+
+    if workers > 1:
+        os = MultiProcessOS("MultiProcessOS", setup, workers=workers)
+        os.bootup()
+    else:
+        os = CannedOS("CannedOS")
+        os.bootup()
+        setup(os)
+
     def stop_os():
         os.shutdown()
 
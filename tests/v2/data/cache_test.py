@@ -0,0 +1,35 @@
+from v2.data.cache import ResponseCache
+
+__author__ = 'jason'
+
+
+def test_response_cache_lru():
+    body = "x" * 1000
+    entry_size = ResponseCache().put("mock://size", "etag", None, body).size
+    cache = ResponseCache(max_bytes=entry_size * 2)
+
+    cache.put("mock://1", "etag1", None, body)
+    cache.put("mock://2", "etag2", None, body)
+    assert cache.get("mock://1").content() == body  # now most recently used
+
+    # over budget, the least recently used is evicted
+    cache.put("mock://3", "etag3", None, body)
+    assert "mock://2" not in cache
+    assert len(cache) == 2
+    assert cache.bytes == entry_size * 2
+    assert cache.evictions == 1
+
+    # replacing an entry does not count it twice
+    cache.put("mock://3", "etag3b", None, body)
+    assert cache.bytes == entry_size * 2
+    assert cache.get("mock://3").matches("etag3b", None)
+
+
+def test_response_cache_budget():
+    cache = ResponseCache(max_bytes=64)
+
+    # bodies are compressed, a body larger than the budget is never cached
+    assert cache.put("mock://small", "etag", None, "a" * 1000) is not None
+    assert cache.put("mock://large", "etag", None, str(range(1000))) is None
+    assert cache.get("mock://large") is None
+    assert cache.misses == 1
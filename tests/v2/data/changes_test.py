@@ -0,0 +1,41 @@
+import gevent
+import pytest
+
+from v2.data.changes import ChangeFeed, ChangeTypes
+from v2.system.exceptions import ChangeFeedTruncatedException
+
+__author__ = 'jason'
+
+
+def test_change_feed_since():
+    feed = ChangeFeed(size=3)
+    assert feed.since(0) == []
+
+    for key in ["a", "b", "c"]:
+        feed.record(ChangeTypes.Insert, key)
+
+    assert [change.seq for change in feed.since(0)] == [1, 2, 3]
+    assert [change.key for change in feed.since(1, limit=1)] == ["b"]
+    assert feed.since(3) == []
+
+    # the oldest change is dropped, a consumer which has not seen it must resync
+    feed.record(ChangeTypes.Delete, "a")
+    assert [(change.type, change.key) for change in feed.since(1)] == [(ChangeTypes.Insert, "b"),
+                                                                       (ChangeTypes.Insert, "c"),
+                                                                       (ChangeTypes.Delete, "a")]
+
+    with pytest.raises(ChangeFeedTruncatedException):
+        feed.since(0)
+
+
+def test_change_feed_wait():
+    feed = ChangeFeed()
+    assert feed.wait(0, timeout=0.01) is False
+
+    waiter = gevent.spawn(feed.wait, 0)
+    gevent.sleep(0)
+    assert not waiter.ready()
+
+    feed.record(ChangeTypes.Insert, "a")
+    assert waiter.get(timeout=1) is True
+    assert feed.wait(0) is True  # returns at once with changes pending
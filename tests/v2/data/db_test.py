@@ -0,0 +1,150 @@
+import sqlite3
+
+import pytest
+
+from v2.data.changes import ChangeTypes
+from v2.data.db import MemDB, SqliteDB
+from v2.data.states import ResourceStates
+from v2.data.timings import Resource, ResourceTimings
+
+__author__ = 'jason'
+
+
+def create_resource(uri, interval_timestamp=None):
+    timings = ResourceTimings(etag="1fa058")
+    timings.interval_timestamp = interval_timestamp
+    timings.refresh()
+    return Resource(uri, timings, send_headers={"Authorization": "token abc"}, json=True)
+
+
+def test_mem_db_deadline_order():
+    db = MemDB()
+    db.save_resource(create_resource("mock://c", 3000))
+    db.save_resource(create_resource("mock://a", 1000))
+    db.save_resource(create_resource("mock://b"))
+    db.update_resource(db.get_resource("mock://b"), "mock://b")
+
+    first = db.get_resources_by_deadline(2)
+    assert [key for key, _ in first] == ["mock://b", "mock://a"]
+
+    after = (first[-1][1].timings.next_eligible_at, first[-1][0])
+    assert [key for key, _ in db.get_resources_by_deadline(2, after)] == ["mock://c"]
+
+
+def test_mem_db_slices():
+    db = MemDB()
+    db.save_resource(create_resource("mock://host-a/1", 1000))
+    db.save_resource(create_resource("mock://host-a/2", 3000))
+    db.save_resource(Resource("mock://host-b/1", ResourceTimings()))
+
+    assert [key for key, _ in db.get_resources_due(0)] == ["mock://host-b/1"]
+    assert [key for key, _ in db.get_resources_due(2000)] == ["mock://host-b/1", "mock://host-a/1"]
+    assert [key for key, _ in db.get_resources_due(5000, limit=2)] == ["mock://host-b/1", "mock://host-a/1"]
+    assert sorted(key for key, _ in db.get_resources_by_host("host-a")) == ["mock://host-a/1", "mock://host-a/2"]
+    assert sorted(key for key, _ in db.get_resources_by_credential("token abc")) == ["mock://host-a/1",
+                                                                                      "mock://host-a/2"]
+    assert [key for key, _ in db.get_resources_by_credential(None)] == ["mock://host-b/1"]
+    assert db.get_resources_by_state(ResourceStates.Error) == []
+
+    resource = db.get_resource("mock://host-a/2")
+    resource.set_error_state()
+    db.update_resource(resource, resource.uri)
+    assert db.get_resources_by_state(ResourceStates.Error) == [("mock://host-a/2", resource)]
+
+
+def test_mem_db_changes():
+    db = MemDB()
+    resource = create_resource("mock://a")
+    db.save_resource(resource)
+    db.update_resource(resource, resource.uri)
+    db.save_resource(create_resource("mock://b"))
+    assert db.delete_resource("mock://a") is resource
+    assert db.delete_resource("mock://a") is None
+
+    assert db.change_seq() == 4
+    assert [(change.type, change.key) for change in db.get_changes(0)] == [(ChangeTypes.Insert, "mock://a"),
+                                                                           (ChangeTypes.Update, "mock://a"),
+                                                                           (ChangeTypes.Insert, "mock://b"),
+                                                                           (ChangeTypes.Delete, "mock://a")]
+    assert db.get_changes(4) == []
+    assert db.get_resource("mock://a") is None
+    assert [key for key, _ in db.get_resources_by_deadline()] == ["mock://b"]
+
+
+def test_sqlite_db_write_behind(tmpdir):
+    path = str(tmpdir.join("resources.db"))
+    db = SqliteDB(path)
+    resource = create_resource("mock://a", 1000)
+    db.save_resource(resource)
+
+    # saves are pending until flushed
+    count = "SELECT COUNT(*) FROM resources"
+    assert sqlite3.connect(path).execute(count).fetchone()[0] == 0
+    assert db.flush() == 1
+    assert sqlite3.connect(path).execute(count).fetchone()[0] == 1
+    assert db.flush() == 0
+
+    resource.timings.rate_limit_remaining = 42
+    resource.set_error_state()
+    db.update_resource(resource, resource.uri)
+    db.close()
+
+    # a restart loads the resources as they were last flushed
+    restarted = SqliteDB(path)
+    loaded = restarted.get_resource("mock://a")
+    assert loaded.id == resource.id
+    assert loaded.timings.rate_limit_remaining == 42
+    assert loaded.timings.etag == "1fa058"
+    assert loaded.timings.next_eligible_at == resource.timings.next_eligible_at
+    assert loaded.send_headers == {"Authorization": "token abc"}
+    assert loaded.is_json()
+    assert loaded.state == ResourceStates.Error
+    assert restarted.get_resources_by_state(ResourceStates.Error) == [("mock://a", loaded)]
+
+    # deletes are written behind as well
+    restarted.delete_resource("mock://a")
+    assert restarted.flush() == 1
+    assert sqlite3.connect(path).execute(count).fetchone()[0] == 0
+    restarted.close()
+
+
+def test_sqlite_db_failed_flush(tmpdir):
+    path = str(tmpdir.join("resources.db"))
+    db = SqliteDB(path)
+    write = db._write
+
+    def locked(rows, deleted):
+        raise sqlite3.OperationalError("database is locked")
+
+    db.save_resource(create_resource("mock://a", 1000))
+    db.save_resource(create_resource("mock://b", 2000))
+    db._write = locked
+
+    # a failed write keeps the resources dirty
+    with pytest.raises(sqlite3.OperationalError):
+        db.flush()
+
+    assert sorted(db.pending) == ["mock://a", "mock://b"]
+
+    db._write = write
+    assert db.flush() == 2
+    assert db.pending == {}
+    assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM resources").fetchone()[0] == 2
+    db.close()
+
+
+def test_sqlite_db_deadline_order(tmpdir):
+    db = SqliteDB(str(tmpdir.join("resources.db")))
+    db.save_resource(create_resource("mock://c", 3000))
+    db.save_resource(create_resource("mock://a", 1000))
+    db.save_resource(create_resource("mock://b"))
+
+    # pages are served by the in memory index, pending writes included
+    first = db.get_resources_by_deadline(2)
+    assert [key for key, _ in first] == ["mock://b", "mock://a"]
+    assert first[0][1] is db.get_resource("mock://b")
+
+    after = (first[-1][1].timings.next_eligible_at, first[-1][0])
+    assert [key for key, _ in db.get_resources_by_deadline(2, after)] == ["mock://c"]
+    assert [key for key, _ in db.get_resources_by_deadline()] == ["mock://b", "mock://a", "mock://c"]
+    db.close()
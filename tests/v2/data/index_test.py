@@ -0,0 +1,121 @@
+from v2.data.index import LAST, ResourceIndexes, SortedIndex, credential_key
+from v2.data.states import ResourceStates
+from v2.data.timings import Resource, ResourceTimings
+
+__author__ = 'jason'
+
+
+def test_sorted_index_range():
+    index = SortedIndex()
+
+    for value, key in [(3, "c"), (1, "a"), (2, "b2"), (2, "b1"), (5, u"e")]:
+        index.add(value, key)
+
+    assert index.range() == [(1, "a"), (2, "b1"), (2, "b2"), (3, "c"), (5, u"e")]
+    assert index.range(upto=2) == [(1, "a"), (2, "b1"), (2, "b2")]
+    assert index.range(upto=5) == index.range()
+    assert index.range(after=(2, "b1"), upto=3) == [(2, "b2"), (3, "c")]
+    assert index.range(after=(2, "b1"), limit=1) == [(2, "b2")]
+
+    index.remove(2, "b1")
+    index.remove(2, "missing")
+    assert index.range(upto=2) == [(1, "a"), (2, "b2")]
+
+    assert "z" < LAST and u"z" < LAST
+
+    # re-indexing a key replaces its entry
+    for value in xrange(1000):
+        index.add(value, "c")
+
+    assert len(index) == 4
+    assert sum(len(bucket) for bucket in index.buckets) == 4
+    assert index.range(after=(2, "b2")) == [(5, u"e"), (999, "c")]
+    assert index.range(upto=998, limit=2) == [(1, "a"), (2, "b2")]
+
+
+class Deadline(object):
+    """
+    Counts the comparisons made on deadlines.
+    """
+    compared = 0
+
+    def __init__(self, value):
+        self.value = value
+
+    def __cmp__(self, other):
+        Deadline.compared += 1
+        return cmp(self.value, other.value)
+
+
+def test_sorted_index_pages():
+    index = SortedIndex()
+    deadlines = [Deadline(n) for n in xrange(20000)]
+
+    for n in reversed(xrange(20000)):
+        index.add(deadlines[n], n)
+
+    assert len(index.buckets) > 1
+    assert [key for _, key in index.range(limit=3)] == [0, 1, 2]
+
+    # a page seeks its cursor, the entries before it are not read
+    Deadline.compared = 0
+    page = index.range(after=(deadlines[15000], 15000), limit=10)
+    assert [key for _, key in page] == range(15001, 15011)
+    assert Deadline.compared < 50
+
+    # nor are those after the page
+    Deadline.compared = 0
+    page = index.range(after=(deadlines[511], 511), upto=deadlines[515])
+    assert [key for _, key in page] == range(512, 516)
+    assert Deadline.compared < 50
+
+    # pages through every entry
+    after, keys = None, []
+
+    while True:
+        page = index.range(after=after, limit=700)
+
+        if not page:
+            break
+
+        keys.extend(key for _, key in page)
+        after = page[-1]
+
+    assert keys == range(20000)
+
+    for n in xrange(0, 20000, 2):
+        index.remove(deadlines[n], n)
+
+    assert [key for _, key in index.range(limit=3)] == [1, 3, 5]
+    assert len(index) == 10000
+
+
+def test_resource_indexes_follow_saves():
+    indexes = ResourceIndexes()
+    resource = Resource("https://api.github.com/events", ResourceTimings(),
+                        send_headers={"Authorization": "token abc"})
+    indexes.add("a", resource)
+
+    assert indexes.hosts.get("api.github.com") == {"a"}
+    assert indexes.credentials.get(credential_key("token abc")) == {"a"}
+    assert indexes.states.get(ResourceStates.Idle) == {"a"}
+    assert indexes.deadlines.range() == [(0, "a")]
+
+    # changes are seen once the resource is saved again
+    resource.set_error_state()
+    resource.timings.interval_timestamp = 1000
+    resource.timings.refresh()
+    resource.send_headers = {}
+    assert indexes.states.get(ResourceStates.Idle) == {"a"}
+
+    indexes.add("a", resource)
+    assert indexes.states.get(ResourceStates.Idle) == ()
+    assert indexes.states.get(ResourceStates.Error) == {"a"}
+    assert indexes.credentials.get(None) == {"a"}
+    assert indexes.credentials.count(credential_key("token abc")) == 0
+    assert indexes.deadlines.range() == [(1001, "a")]
+
+    indexes.remove("a")
+    assert indexes.entries == {}
+    assert len(indexes.deadlines) == 0
+    assert indexes.hosts.get("api.github.com") == ()
@@ -0,0 +1,31 @@
+from v2.data.payload import Payload, resolve_decoder
+
+__author__ = 'jason'
+
+
+def test_resolve_decoder():
+    name, loads = resolve_decoder(["not-a-decoder", "json"])
+    assert name == "json"
+    assert loads('{"a": 1}') == {"a": 1}
+
+    # falls back to the stdlib
+    assert resolve_decoder(["not-a-decoder"])[0] == "json"
+
+
+def test_payload_lazy():
+    calls = []
+
+    def decoder(body):
+        calls.append(body)
+        return [1, 2]
+
+    payload = Payload("[1, 2]", decoder)
+    assert not payload.is_decoded()
+    assert len(payload) == 6
+
+    # decoded once, on first read
+    assert payload.data == [1, 2]
+    assert payload.data == [1, 2]
+    assert calls == ["[1, 2]"]
+
+    assert Payload("raw", None).data == "raw"
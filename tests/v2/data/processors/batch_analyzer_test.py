@@ -0,0 +1,84 @@
+from v2.data.timings import ResourceTimings, ResourceHeaders, Resource
+from v2.data.processors.resource import ResourceAnalyzer
+from v2.data.processors.batch_analyzer import BatchResourceAnalyzer, ResourceTimingTable, CAN_REQUEST
+from v2.data.states import ResourceStates
+from v2.utils import timeutils
+
+__author__ = 'jason'
+
+
+def create_resources(now):
+    def resource(remaining=1, reset=None, last_request=None, interval_timestamp=None, owner=""):
+        timings = ResourceTimings()
+        timings.rate_limit_remaining = remaining
+        timings.time_to_reset = now + 60000 if reset is None else reset
+        timings.last_request_timestamp = last_request
+        timings.interval_timestamp = interval_timestamp
+        timings.refresh()
+        return Resource("mock://test", timings, ResourceHeaders(), owner=owner)
+
+    errored = resource()
+    errored.set_error_state()
+
+    return [
+        resource(),  # new resource
+        resource(interval_timestamp=now - 10, last_request=now - 1010),  # interval passed
+        resource(interval_timestamp=now + 500, last_request=now - 500),  # waiting for interval
+        resource(remaining=0, reset=now + 2000),  # waiting for reset
+        resource(remaining=0, reset=now + 2000, interval_timestamp=now + 500),  # reset binds over interval
+        resource(remaining=0, reset=now - 2000),  # reset passed
+        resource(remaining=0, reset=now - 2000, last_request=now - 1000),  # edge case
+        resource(owner="TestProcessor"),
+        errored
+    ]
+
+
+def test_batch_matches_scalar_analyzer():
+    now = timeutils.milliseconds()
+    resources = create_resources(now)
+
+    scalar = ResourceAnalyzer("test-resource-analyzer")
+    codes, deadlines = BatchResourceAnalyzer.classify(ResourceTimingTable(resources), now)
+
+    for i, resource in enumerate(resources):
+        can_request, state = scalar.can_request(resource, now)
+
+        if can_request:
+            assert codes[i] == CAN_REQUEST
+        else:
+            assert codes[i] == state.value
+
+        if state in [ResourceStates.WaitingForInterval, ResourceStates.WaitingForReset]:
+            assert deadlines[i] == resource.timings.next_eligible_at
+
+
+def test_batch_analyze_groups():
+    now = timeutils.milliseconds()
+    resources = create_resources(now)
+
+    analyzer = BatchResourceAnalyzer("test-batch-analyzer")
+    requestable, waiting, errored = analyzer.analyze(resources, now)
+
+    assert requestable == [resources[0], resources[1], resources[5]]
+    assert waiting == [(resources[2], now + 501), (resources[3], now + 2001), (resources[4], now + 2001)]
+    assert errored == [resources[6], resources[7], resources[8]]
+
+    # the scalar analyzer groups the same way
+    scalar = ResourceAnalyzer("test-resource-analyzer")
+    assert scalar.analyze(resources, now) == (requestable, waiting, errored)
+
+
+def test_table_gathers_precomputed_timings():
+    now = timeutils.milliseconds()
+    resources = create_resources(now)
+
+    # the table reads what refresh() precomputed, it does not derive it again
+    resources[0].timings.next_eligible_at = now + 100
+    resources[0].timings.waiting_state = ResourceStates.WaitingForInterval
+    table = ResourceTimingTable(resources)
+
+    assert list(table.next_eligible_at) == [r.timings.next_eligible_at for r in resources]
+    assert list(table.edge_errors) == [r.timings.edge_error for r in resources]
+
+    codes, deadlines = BatchResourceAnalyzer.classify(table, now)
+    assert codes[0] == ResourceStates.WaitingForInterval.value and deadlines[0] == now + 100
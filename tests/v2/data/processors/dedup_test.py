@@ -0,0 +1,56 @@
+from v2.data.processors.dedup import EventDeduplicator
+from v2.data.timings import Resource, ResourceTimings
+
+__author__ = 'jason'
+
+
+def events(*ids):
+    return [{"id": str(id)} for id in ids]
+
+
+def test_event_deduplicator_pages():
+    deduplicator = EventDeduplicator("event-deduplicator")
+    resource = Resource("mock://github/events", ResourceTimings())
+    other = Resource("mock://github/events", ResourceTimings())
+
+    assert deduplicator.filter(resource, events(3, 2, 1)) == events(3, 2, 1)
+
+    # overlapping pages only forward the new events, per resource
+    assert deduplicator.filter(resource, events(5, 4, 3, 2)) == events(5, 4)
+    assert deduplicator.filter(other, events(5, 4)) == events(5, 4)
+    assert deduplicator.get_seen(resource).high_water_mark == 5
+
+    # events without an id are always forwarded
+    assert deduplicator.filter(resource, [{"type": "PingEvent"}]) == [{"type": "PingEvent"}]
+
+
+def test_event_deduplicator_out_of_order():
+    deduplicator = EventDeduplicator("event-deduplicator", recent_size=3)
+    resource = Resource("mock://github/events", ResourceTimings())
+
+    assert deduplicator.filter(resource, events(10, 12)) == events(10, 12)
+
+    # a late event below the high water mark is still new once
+    assert deduplicator.filter(resource, events(11, 12)) == events(11)
+    assert deduplicator.filter(resource, events(11)) == []
+
+    # ids which fell out of the recent ids count as seen
+    assert deduplicator.filter(resource, events(13)) == events(13)
+    assert deduplicator.get_seen(resource).floor == 10
+    assert deduplicator.filter(resource, events(9, 10, 14)) == events(14)
+
+
+def test_event_deduplicator_pages_longer_than_recent_ids():
+    deduplicator = EventDeduplicator("event-deduplicator", recent_size=3)
+    resource = Resource("mock://github/events", ResourceTimings())
+
+    # a newest first page longer than the recent ids forwards every event
+    assert deduplicator.filter(resource, events(6, 5, 4, 3, 2, 1)) == events(6, 5, 4, 3, 2, 1)
+
+    # the highest ids are remembered, the ones below count as seen
+    seen = deduplicator.get_seen(resource)
+    assert seen.floor == 3 and seen.high_water_mark == 6
+    assert deduplicator.filter(resource, events(8, 7, 6, 5, 4, 3, 2, 1)) == events(8, 7)
+
+    # as are duplicates within a page
+    assert deduplicator.filter(resource, events(9, 9)) == events(9)
@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import zlib
+
+from v2.data.processors.offload import ExecutionModes, ParseExecutor, digest_bodies
+
+__author__ = 'jason'
+
+BODIES = [json.dumps([{"id": n}] * 50) for n in range(3)] + ["plain text"]
+
+
+def test_digest_bodies():
+    digests = digest_bodies(BODIES, compress_level=6)
+
+    assert [zlib.decompress(digest.compressed) for digest in digests] == BODIES
+
+    digest = digest_bodies(BODIES[:1], compress_level=None)[0]
+    assert digest.compressed is None
+
+
+def test_parse_executor():
+    expected = [zlib.decompress(d.compressed) for d in digest_bodies(BODIES)]
+
+    executor = ParseExecutor(ExecutionModes.Thread, size=2)
+
+    try:
+        digests = executor.digest(BODIES)
+        assert [zlib.decompress(d.compressed) for d in digests] == expected
+    finally:
+        executor.close()
+
+
+PATCHED_DIGEST = """
+from gevent import monkey
+monkey.patch_all()
+
+import zlib
+import gevent
+from v2.data.processors.offload import ParseExecutor
+
+executor = ParseExecutor(size=2)
+ticks = []
+ticker = gevent.spawn(lambda: [ticks.append(gevent.sleep(0.001)) for _ in range(10)])
+digest, = executor.digest(["x" * 100000])
+executor.close()
+ticker.join()
+assert zlib.decompress(digest.compressed) == "x" * 100000
+assert len(ticks) == 10
+"""
+
+
+def test_parse_executor_monkey_patched():
+    # as in app.py, patching is process wide so it runs in a process of its own
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))))
+    process = subprocess.Popen([sys.executable, "-c", PATCHED_DIGEST], cwd=root)
+    deadline = time.time() + 30
+
+    while process.poll() is None and time.time() < deadline:
+        time.sleep(0.05)
+
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+
+    assert process.returncode == 0
@@ -11,6 +11,7 @@ def test_resource_analyzer_edge_case():
     timings.rate_limit_remaining = 0  # limit reached
     timings.time_to_reset = timeutils.milliseconds() - 2000  # past now
     timings.last_request_timestamp = timeutils.milliseconds() - 1000  # was done after reset
+    timings.refresh()  # fields were changed directly
 
     resource = Resource("mock://test", timings, ResourceHeaders())
     ra = ResourceAnalyzer("test-resource-analyzer")
@@ -27,6 +28,7 @@ def test_resource_with_owner():
     timings.rate_limit_remaining = 1000
     timings.time_to_reset = timeutils.milliseconds() - 2000  # past now
     timings.last_request_timestamp = timeutils.milliseconds() - 1000  # was done after reset
+    timings.refresh()  # fields were changed directly
 
     resource = Resource("mock://test", timings, ResourceHeaders(), owner="TestProcessor")
     ra = ResourceAnalyzer("test-resource-analyzer")
@@ -43,6 +45,7 @@ def test_with_limit_remaining():
     timings.rate_limit_remaining = 1000
     timings.time_to_reset = timeutils.milliseconds() - 2000  # past now
     timings.last_request_timestamp = timeutils.milliseconds() - 1000  # was done after reset
+    timings.refresh()  # fields were changed directly
 
     resource = Resource("mock://test", timings, ResourceHeaders())
     ra = ResourceAnalyzer("test-resource-analyzer")
@@ -59,6 +62,7 @@ def test_limit_reached_reset_ready():
     timings.rate_limit_remaining = 0
     timings.time_to_reset = timeutils.milliseconds() - 2000  # in the past
     # timings.last_request_timestamp = timeutils.milliseconds() - 1000  # was done after reset
+    timings.refresh()  # fields were changed directly
 
     resource = Resource("mock://test", timings, ResourceHeaders())
     ra = ResourceAnalyzer("test-resource-analyzer")
@@ -74,6 +78,7 @@ def test_limit_reached_reset_infuture():
     timings = ResourceTimings()  # default timings
     timings.rate_limit_remaining = 0
     timings.time_to_reset = timeutils.milliseconds() + 2000  # in the future
+    timings.refresh()  # fields were changed directly
 
     resource = Resource("mock://test", timings, ResourceHeaders())
     ra = ResourceAnalyzer("test-resource-analyzer")
@@ -34,3 +34,49 @@ def test_response_parser():
     #
     # 2nd Response, should be
     #
+
+
+def test_response_parser_cache():
+    from v2.data.cache import ResponseCache
+
+    uri = "mock://github/events/statustest"
+    session = mock_requests.create_mock_session()
+    resource = Resource(uri, ResourceTimings(), json=True)
+    parser = ResponseParser("response-parser", cache=ResponseCache())
+
+    # the 200 body is cached with its validators
+    response = session.get(uri)
+    assert parser.parse(response, resource)
+    assert parser.cache.get(uri).matches(mock_requests.GLOBAL_MOCK_REQUEST_ETAG1, 'Wed, 26 Aug 2015 20:13:37 GMT')
+
+    # a 304 is served the cached body
+    not_modified = session.get(uri)
+    assert not_modified.status_code == 304
+    assert parser.read_body(not_modified, resource) == response.content
+    assert parser.parse(not_modified, resource)
+    assert resource.timings.etag == mock_requests.GLOBAL_MOCK_REQUEST_ETAG1
+
+    # without the cached body the validators are dropped, the next request is unconditional
+    parser.cache.remove(uri)
+    assert parser.read_body(not_modified, resource) is None
+    assert parser.parse(not_modified, resource)
+    assert resource.timings.etag is None
+    assert resource.timings.last_modified is None
+
+
+def test_response_parser_publish():
+    uri = "mock://github/events/statustest"
+    session = mock_requests.create_mock_session()
+    resource = Resource(uri, ResourceTimings(), json=True)
+    published = []
+    parser = ResponseParser("response-parser", publish=lambda res, payload: published.append((res, payload)))
+
+    response = session.get(uri)
+    assert parser.parse(response, resource)
+
+    # results are published undecoded
+    (published_resource, payload), = published
+    assert published_resource is resource
+    assert not payload.is_decoded()
+    assert payload.body == response.content
+    assert payload.data == response.json()
@@ -1,4 +1,7 @@
-from v2.data.queue import MemQueue
+import gevent
+
+from v2.data.queue import MemQueue, DelayQueue, OverloadPolicies, Topic, Topics
+from v2.utils import timeutils
 
 __author__ = 'jason'
 
@@ -10,3 +13,109 @@ def test_mem_queue():
 
     assert queue.get_analyze() == "test1"
     assert queue.get_analyze() == "test2"
+
+
+def test_mem_queue_topics():
+    queue = MemQueue()
+
+    # a new topic needs only be registered
+    queue.register_topic("custom")
+    assert queue.put("custom", "test1") == 1
+    assert queue.put_many("custom", ["test2", "test3", "test4"]) == 4
+    assert queue.size("custom") == 4
+
+    # batches drain what is ready, up to the maximum
+    assert queue.get_batch("custom", 3) == ["test1", "test2", "test3"]
+    assert queue.get_batch("custom", 3) == ["test4"]
+
+    # an empty topic times out with an empty batch
+    assert queue.get_batch("custom", 3, timeout=.05) == []
+
+    # named methods are conveniences over the same topics
+    queue.put_many(Topics.Requests, ["r1", "r2"])
+    assert queue.requests_size() == 2
+    assert queue.get_requests() == "r1"
+
+
+def test_delay_queue_deadline_order():
+    queue = DelayQueue()
+    now = timeutils.milliseconds()
+
+    assert queue.put("late", now + 5000) == 1
+    assert queue.put("due-2", now - 10) == 2
+    assert queue.put("due-1", now - 20) == 3
+    assert queue.next_deadline() == now - 20
+
+    # only what is due is released, earliest deadline first
+    assert queue.pop_due(now) == ["due-1", "due-2"]
+    assert queue.qsize() == 1
+    assert queue.pop_due(now) == []
+
+
+def test_delay_queue_sleeps_until_deadline():
+    queue = MemQueue()
+    start = timeutils.milliseconds()
+    queue.put_frozen("item", start + 200)
+
+    assert queue.get_frozen() == ["item"]
+    assert timeutils.milliseconds() - start >= 200
+    assert queue.frozen_size() == 0
+
+    # an empty queue times out with nothing due
+    assert queue.get_frozen(timeout=.05) == []
+
+
+def test_delay_queue_wakes_on_earlier_deadline():
+    queue = DelayQueue()
+    start = timeutils.milliseconds()
+    queue.put("far", start + 60000)
+
+    # the reader is asleep on the far deadline, an earlier one must wake it
+    gevent.spawn_later(.05, queue.put, "near", start + 100)
+
+    assert queue.get_batch(timeout=5) == ["near"]
+    assert timeutils.milliseconds() - start < 5000
+    assert queue.qsize() == 1
+
+
+def test_topic_watermarks():
+    topic = Topic("bounded", capacity=10, high_watermark=4, low_watermark=2)
+    topic.put_many(range(3))
+    assert not topic.is_overloaded()
+
+    # overloaded from the high watermark...
+    topic.put(3)
+    assert topic.is_overloaded()
+
+    # ...until drained to the low watermark
+    topic.get()
+    assert topic.is_overloaded()
+    topic.get()
+    assert not topic.is_overloaded()
+
+
+def test_mem_queue_backpressure():
+    queue = MemQueue(limits={Topics.Requests: {"capacity": 10, "high_watermark": 4, "low_watermark": 1}})
+    queue.put_many(Topics.Requests, range(4))
+
+    # a shedding producer is told to back off, a blocking one times out
+    assert not queue.admit(Topics.Requests, OverloadPolicies.Shed)
+    assert not queue.admit(Topics.Requests, OverloadPolicies.Block, timeout=.05)
+
+    # a blocking producer resumes once a consumer drains to the low watermark
+    consumer = gevent.spawn_later(.05, queue.get_batch, Topics.Requests, 3)
+    assert queue.admit(Topics.Requests, OverloadPolicies.Block, timeout=5)
+    assert consumer.get() == [0, 1, 2]
+
+    # unbounded topics are never overloaded
+    queue.put_many(Topics.Analyze, range(100))
+    assert queue.admit(Topics.Analyze, OverloadPolicies.Shed)
+
+
+def test_mem_queue_sinks_unbounded():
+    queue = MemQueue()
+
+    # nothing may consume the sinks, producers never block on them
+    for topic in [Topics.Results, Topics.Events]:
+        assert queue.put_many(topic, range(20000)) == 20000
+        assert queue.admit(topic, OverloadPolicies.Shed)
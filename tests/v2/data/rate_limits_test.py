@@ -0,0 +1,67 @@
+from v2.data.rate_limits import RateLimitRegistry, rate_limit_key
+from v2.data.timings import Resource, ResourceTimings
+
+__author__ = 'jason'
+
+
+def create_resource(uri, token=None, remaining=5000, reset=60000):
+    send_headers = {} if token is None else {"Authorization": "token %s" % token}
+    timings = ResourceTimings(rate_limit=5000, rate_limit_remaining=remaining, time_to_reset=reset)
+    return Resource(uri, timings, send_headers=send_headers)
+
+
+def test_rate_limit_key():
+    events = create_resource("https://api.github.com/events", token="abc")
+    repos = create_resource("https://api.github.com/repos", token="abc")
+    anonymous = create_resource("https://api.github.com/events")
+
+    # resources sharing a credential share a budget, credentials are not kept
+    assert rate_limit_key(events) == rate_limit_key(repos)
+    assert "abc" not in rate_limit_key(events)
+    assert rate_limit_key(anonymous) == "host/api.github.com"
+
+
+def test_rate_limit_registry_shared_budget():
+    registry = RateLimitRegistry()
+    first = create_resource("https://api.github.com/events", token="abc", remaining=2)
+    second = create_resource("https://api.github.com/repos", token="abc", remaining=2)
+    other = create_resource("https://api.github.com/events", token="xyz", remaining=2)
+
+    # unknown budgets do not hold requests back
+    assert registry.acquire(first, 1000) is None
+
+    registry.observe(first, 1000)
+    assert registry.acquire(first, 1000) is None
+    assert registry.acquire(second, 1000) is None
+
+    # the siblings spent the budget, until the reset
+    assert registry.acquire(second, 1000) == 60001
+    assert registry.acquire(other, 1000) is None
+    assert registry.get_budget(first).request_rate(2000) == 2.0  # admitted within the window
+
+    # a trailing response does not refill the window, a new window does
+    registry.observe(second, 1500)
+    assert registry.acquire(first, 1500) == 60001
+    second.timings.time_to_reset = 120000
+    registry.observe(second, 61000)
+    assert registry.acquire(first, 61000) is None
+
+
+def test_rate_limit_budget_release():
+    registry = RateLimitRegistry()
+    resource = create_resource("https://api.github.com/events", token="abc", remaining=1)
+    registry.observe(resource, 1000)
+
+    # a token released for a request not made can be taken again
+    assert registry.acquire(resource, 1000) is None
+    assert registry.acquire(resource, 1000) == 60001
+    registry.release(resource, 1000)
+    assert registry.acquire(resource, 1000) is None
+
+    # never above the limit, nor within a window which passed
+    budget = registry.get_budget(resource)
+    budget.remaining = budget.limit
+    registry.release(resource, 1000)
+    assert budget.remaining == budget.limit
+    registry.release(resource, 61000)
+    assert budget.requests == 0
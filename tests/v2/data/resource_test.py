@@ -1,3 +1,8 @@
+import gc
+import sys
+import types
+from uuid import uuid4
+
 from v2.data.timings import ResourceTimings, ResourceHeaders, Resource
 
 __author__ = 'jason'
@@ -24,3 +29,55 @@ def test_resource_has_owner():
 
     assert resource.has_owner()
 
+
+def deep_size(roots):
+    """
+    :return: bytes reachable from the roots, objects shared between them counted once
+    """
+    seen = set()
+    size = 0
+    stack = list(roots)
+
+    while stack:
+        obj = stack.pop()
+
+        if id(obj) in seen or isinstance(obj, (type, types.ModuleType, types.FunctionType, types.ClassType)):
+            continue
+
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+
+    return size
+
+
+def test_resource_shares_headers():
+    first = Resource("mock://first", ResourceTimings(), send_headers={"Authorization": "token abc"})
+    second = Resource("mock://second", ResourceTimings(), ResourceHeaders(),
+                      send_headers={"Authorization": "token abc"})
+    other = Resource("mock://other", ResourceTimings(), send_headers={"Authorization": "token xyz"})
+
+    assert first.headers is second.headers
+    assert first.send_headers is second.send_headers
+    assert first.send_headers is not other.send_headers
+    assert Resource("mock://test", ResourceTimings()).send_headers == {}
+
+
+def test_resource_id():
+    resource = Resource("mock://test", ResourceTimings())
+    assert resource.unique_name == '/%s/%s' % (resource.id, resource.uri)
+
+    id = uuid4()
+    resource.id = id
+    assert resource.id == id
+    assert resource.id_int == id.int  # what maps and logs key on, no UUID built
+    assert resource.unique_name == '/%s/mock://test' % id
+
+
+def test_resource_bytes():
+    send_headers = {"Authorization": "token abc", "User-Agent": "test"}
+    resources = [Resource("https://api.github.com/repos/%d/events" % n, ResourceTimings(),
+                          send_headers=dict(send_headers), json=True) for n in range(1000)]
+
+    # ~4200 bytes before slots and shared headers, ~380 after
+    assert deep_size(resources) / 1000.0 < 600
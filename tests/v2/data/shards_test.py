@@ -0,0 +1,14 @@
+from v2.data.shards import Shard, shard_of
+
+__author__ = 'jason'
+
+
+def test_shards_partition_keys():
+    keys = ["https://api.github.com/repos/%d/events" % n for n in range(100)]
+    shards = [Shard(index, 4) for index in range(4)]
+
+    for key in keys:
+        assert len([shard for shard in shards if shard.owns(key)]) == 1
+
+    assert all(len([key for key in keys if shard.owns(key)]) > 0 for shard in shards)
+    assert shard_of(u"mock://a", 4) == shard_of("mock://a", 4)  # keys loaded from sqlite are unicode
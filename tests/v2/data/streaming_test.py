@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from v2.data.streaming import JsonArrayStream
+
+__author__ = 'jason'
+
+EVENTS = [{"id": "1", "payload": {"body": 'a "quoted", \\"escaped\\", [bracketed] {braced} string'}},
+          {"id": "2", "payload": {"commits": [{"sha": "abc"}, {"sha": "def"}]}},
+          "text, with a comma",
+          3]
+
+
+def stream(body, chunk_size):
+    parser = JsonArrayStream(json.loads)
+    events = []
+
+    for i in range(0, len(body), chunk_size):
+        events.extend(parser.feed(body[i:i + chunk_size]))
+
+    return events + parser.close()
+
+
+def test_json_array_stream_chunks():
+    body = "  " + json.dumps(EVENTS, indent=2)
+
+    # elements are split correctly wherever the chunks fall, even within escapes
+    for chunk_size in range(1, 40):
+        assert [event.data for event in stream(body, chunk_size)] == EVENTS
+
+
+def test_json_array_stream_incremental():
+    parser = JsonArrayStream(json.loads)
+
+    # each element is yielded once its delimiter arrives
+    assert parser.feed('[{"id": 1}') == []
+    events = parser.feed(', {"id": 2}, {"id"')
+    assert [event.body for event in events] == ['{"id": 1}', '{"id": 2}']
+    assert [event.data for event in parser.feed(': 3}]')] == [{"id": 3}]
+    assert parser.close() == []
+
+    assert stream("[]", 1) == []
+
+
+def test_json_array_stream_documents():
+    # a body which is not an array is yielded whole
+    events = stream('{"message": "Not Found"}', 4)
+    assert [event.data for event in events] == [{"message": "Not Found"}]
+
+    with pytest.raises(ValueError):
+        stream('[{"id": 1}, {"id"', 4)
@@ -1,4 +1,5 @@
 from v2.data.timings import ResourceTimings
+from v2.data.states import ResourceStates
 from v2.utils import timeutils
 
 __author__ = 'jason'
@@ -94,3 +95,30 @@ def test_timings_interval_past():
     # the interval is passed
     timings.interval_timestamp = now - 1  # making it minus 1ms will make it past
     assert timings.has_interval_passed(now) is True
+
+
+def test_timings_next_eligible():
+    timings = ResourceTimings()  # default timings
+
+    # new resources may be requested immediately
+    assert timings.next_eligible_at == 0
+    assert timings.waiting_state is None
+
+    # interval bound, due 1ms after the interval timestamp
+    timings.update_timestamp()
+    timings.update_interval_timestamp()
+    assert timings.next_eligible_at == timings.interval_timestamp + 1
+    assert timings.waiting_state == ResourceStates.WaitingForInterval
+
+    # limit reached with a reset window later than the interval, the reset binds
+    timings.rate_limit_remaining = 0
+    timings.time_to_reset = timings.interval_timestamp + 5000
+    timings.refresh()
+    assert timings.next_eligible_at == timings.time_to_reset + 1
+    assert timings.waiting_state == ResourceStates.WaitingForReset
+    assert timings.edge_error is False
+
+    # requested after the reset window while the limit is reached
+    timings.time_to_reset = timings.last_request_timestamp - 1000
+    timings.refresh()
+    assert timings.edge_error is True
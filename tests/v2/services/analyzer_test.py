@@ -0,0 +1,41 @@
+# Lib
+from v2.data.queue import MemQueue, OverloadPolicies, Topics
+from v2.data.timings import Resource, ResourceTimings
+from v2.services.analyzer import AnalyzerService
+from v2.services.rate_limits import RateLimitService
+from v2.utils import timeutils
+
+__author__ = 'jason'
+
+
+def create_resource():
+    timings = ResourceTimings()
+    timings.rate_limit_remaining = 1000
+    timings.time_to_reset = timeutils.milliseconds() - 2000  # past now
+    timings.last_request_timestamp = timeutils.milliseconds() - 1000  # was done after reset
+    timings.refresh()  # fields were changed directly
+    return Resource("mock://github/events", timings)
+
+
+def test_analyzer_shed_batch_keeps_budget():
+    limits = {Topics.Requests: {"capacity": 10, "high_watermark": 1, "low_watermark": 0}}
+    service = AnalyzerService("analyzer-service", overload_policy=OverloadPolicies.Shed)
+    service.queue = MemQueue(limits=limits)
+    service.rate_limits = RateLimitService("rate-limit-service")
+    resource = create_resource()
+    now = timeutils.milliseconds()
+    budget = service.rate_limits.registry.get_budget(resource)
+    budget.observe(5000, 2, now + 60000, now)
+
+    # the request topic is overloaded, the batch is shed without spending tokens
+    service.queue.put(Topics.Requests, None)
+    service._analyze_batch([resource], now)
+    assert service.queue.size(Topics.Requests) == 1
+    assert service.queue.size(Topics.Frozen) == 1
+    assert budget.remaining == 2
+
+    # once drained the resource is admitted and takes its token
+    service.queue.get_batch(Topics.Requests, None)
+    service._analyze_batch([resource], now)
+    assert service.queue.get_batch(Topics.Requests, None) == [resource]
+    assert budget.remaining == 1
@@ -0,0 +1,53 @@
+# External
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+import threading
+
+# Lib
+from v2.services.connection_pool import ConnectionPoolManager
+
+__author__ = 'jason'
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write("ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def serve():
+    server = HTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def test_connection_pool_reuse():
+    server = serve()
+    host = "127.0.0.1:%d" % server.server_port
+
+    manager = ConnectionPoolManager("/test/connection-pool", pool_maxsize=2, host_pool_sizes={host: 1})
+    session = manager.create_session()
+
+    try:
+        for _ in range(3):
+            assert session.get("http://%s/events" % host).status_code == 200
+
+        # one connection is opened and kept alive for the following requests
+        assert manager.created == 1
+        assert manager.reused == 2
+        assert manager.reuse_ratio() == 2.0 / 3
+
+        # the host override is mounted for the host only
+        assert session.get_adapter("http://%s/events" % host).poolmanager.connection_pool_kw["maxsize"] == 1
+        assert session.get_adapter("http://example.com/").poolmanager.connection_pool_kw["maxsize"] == 2
+    finally:
+        session.close()  # the server handles one keep-alive connection at a time
+        server.shutdown()
@@ -0,0 +1,17 @@
+# Lib
+from v2.data.payload import Payload
+from v2.data.timings import Resource, ResourceTimings
+from v2.services.dedup import EventDedupService
+
+__author__ = 'jason'
+
+
+def test_event_dedup_service():
+    service = EventDedupService("event-dedup-service")
+    resource = Resource("mock://github/events", ResourceTimings(), json=True)
+
+    # pages and streamed events are deduplicated alike
+    assert service.dedup(resource, Payload('[{"id": "2"}, {"id": "1"}]')) == [(resource, {"id": "2"}),
+                                                                            (resource, {"id": "1"})]
+    assert service.dedup(resource, Payload('{"id": "2"}')) == []
+    assert service.dedup(resource, Payload('{"id": "3"}')) == [(resource, {"id": "3"})]
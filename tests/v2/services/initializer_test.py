@@ -0,0 +1,69 @@
+# External
+import gevent
+
+# Lib
+from v2.data.db import MemDB
+from v2.data.queue import MemQueue
+from v2.data.shards import Shard, shard_of
+from v2.data.timings import Resource, ResourceTimings
+from v2.services.initializer import InitializerService
+from v2.system.states import BaseStates
+
+__author__ = 'jason'
+
+
+def test_initializer_follows_change_feed():
+    db = MemDB(feed_size=2)
+    queue = MemQueue()
+    db.save_resource(Resource("mock://existing", ResourceTimings()))
+
+    service = InitializerService("initializer-service")
+    service.db = db
+    service.queue = queue
+    service.set_state(BaseStates.Started)
+    loop = gevent.spawn(service.event_loop)
+
+    try:
+        gevent.sleep(0.01)  # resyncs on start, then blocks on the feed
+        assert queue.analyze_size() == 1
+        assert service.seq == 1
+
+        resource = Resource("mock://new", ResourceTimings())
+        db.save_resource(resource)
+        db.update_resource(resource, resource.uri)
+        gevent.sleep(0.01)
+        assert queue.analyze_size() == 2  # updates of a registered resource are not registered again
+        assert service.seq == 3
+
+        db.delete_resource("mock://existing")
+        gevent.sleep(0.01)
+        assert "mock://existing" not in service.registered
+
+        # a consumer which fell behind the feed resyncs
+        loop.kill()
+        for n in range(3):
+            db.save_resource(Resource("mock://behind/%d" % n, ResourceTimings()))
+
+        loop = gevent.spawn(service.event_loop)
+        gevent.sleep(0.01)
+        assert queue.analyze_size() == 5
+        assert service.seq == db.change_seq()
+    finally:
+        loop.kill()
+
+
+def test_initializer_registers_its_shard():
+    db = MemDB()
+    queue = MemQueue()
+    keys = ["mock://github/%d" % n for n in range(20)]
+
+    for key in keys:
+        db.save_resource(Resource(key, ResourceTimings()))
+
+    service = InitializerService("initializer-service", shard=Shard(1, 3))
+    service.db = db
+    service.queue = queue
+    service.resync()
+
+    assert sorted(service.registered) == sorted(key for key in keys if shard_of(key, 3) == 1)
+    assert queue.analyze_size() == len(service.registered) > 0
@@ -0,0 +1,224 @@
+# External
+import gevent
+import json
+import pytest
+import requests
+
+# Lib
+from v2.data.queue import MemQueue, Topics
+from v2.data.timings import Resource, ResourceTimings
+from v2.data.streaming import StreamedResponse
+from v2.services.rate_limits import RateLimitService
+from v2.services.requestor import RequestorService
+from v2.system.exceptions import ResponseTooLargeException
+from v2.utils import timeutils
+
+# Test libs
+from tests.v2.system import mock_requests
+
+__author__ = 'jason'
+
+
+class MockResponse(object):
+    status_code = 200
+
+
+class MockSession(requests.Session):
+    """
+    Tracks the requests in flight, each taking `latency` seconds.
+    """
+    def __init__(self, latency=.05):
+        requests.Session.__init__(self)
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        if request.url.startswith("mock://broken"):
+            gevent.sleep(self.latency)
+            raise IOError("connection refused")
+
+        self.sent.append(request)
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        gevent.sleep(self.latency)
+        self.in_flight -= 1
+        return MockResponse()
+
+
+def create_requestor(**kwargs):
+    requestor = RequestorService("requestor-service", **kwargs)
+    requestor.set_queue(MemQueue())
+    requestor.session = MockSession()
+    return requestor
+
+
+def dispatch_all(requestor, uris):
+    for uri in uris:
+        requestor.pool.spawn(requestor.dispatch, Resource(uri, ResourceTimings()))
+    requestor.pool.join()
+
+
+def test_requestor_concurrency():
+    requestor = create_requestor(concurrency=4)
+    dispatch_all(requestor, ["mock://host-%d/events" % n for n in range(10)])
+
+    assert requestor.session.max_in_flight == 4
+    assert requestor.queue.size(Topics.Publish) == 10
+
+
+def test_requestor_per_host_limit():
+    requestor = create_requestor(concurrency=8, per_host_limit=2)
+    dispatch_all(requestor, ["mock://github/events?page=%d" % n for n in range(6)])
+
+    assert requestor.session.max_in_flight == 2
+    assert requestor.queue.size(Topics.Publish) == 6
+
+
+def test_requestor_failed_request():
+    requestor = create_requestor()
+    dispatch_all(requestor, ["mock://broken/events", "mock://github/events"])
+
+    # only the failed resource is affected
+    assert requestor.queue.size(Topics.RequestErrors) == 1
+    assert requestor.queue.size(Topics.Publish) == 1
+
+
+def test_requestor_failed_request_releases_budget():
+    requestor = create_requestor()
+    requestor.rate_limits = RateLimitService("rate-limit-service")
+    resource = Resource("mock://broken/events", ResourceTimings())
+    budget = requestor.rate_limits.registry.get_budget(resource)
+    budget.observe(5000, 10, timeutils.milliseconds() + 60000, timeutils.milliseconds())
+
+    # the token the analyzer took comes back when the request fails
+    assert requestor.rate_limits.acquire(resource, timeutils.milliseconds()) is None
+    assert budget.remaining == 9
+    requestor.dispatch(resource)
+    assert requestor.queue.size(Topics.RequestErrors) == 1
+    assert budget.remaining == 10
+
+
+def test_requestor_headers():
+    requestor = create_requestor()
+    send_headers = {"Authorization": "token abc"}
+    first = Resource("mock://github/events", ResourceTimings(), send_headers=send_headers)
+    second = Resource("mock://github/events", ResourceTimings(etag="1fa058",
+                                                              last_modified="Wed, 26 Aug 2015 20:13:37 GMT"))
+
+    for resource in [first, second, first]:
+        requestor.request(resource)
+
+    first_sent, second_sent, first_resent = requestor.session.sent
+
+    # conditional headers are only sent with an etag, and never leak between resources
+    assert first_sent.headers["Authorization"] == "token abc"
+    assert "If-None-Match" not in first_sent.headers
+    assert second_sent.headers["If-None-Match"] == "1fa058"
+    assert second_sent.headers["If-Modified-Since"] == "Wed, 26 Aug 2015 20:13:37 GMT"
+    assert "Authorization" not in second_sent.headers
+    assert "Authorization" not in requestor.session.headers
+    assert send_headers == {"Authorization": "token abc"}
+
+    # the template is prepared once and copied per call
+    assert first_resent is not first_sent
+    assert requestor.get_template(first).headers == first_sent.headers
+    assert len(requestor.templates) == 2
+
+
+def test_requestor_templates_bounded():
+    requestor = create_requestor(max_templates=2)
+    first, second, third = [Resource("mock://github/%d" % n, ResourceTimings()) for n in range(3)]
+
+    # the least recently used template is evicted
+    template = requestor.get_template(first)
+    requestor.get_template(second)
+    assert requestor.get_template(first) is template
+    requestor.get_template(third)
+    assert list(requestor.templates) == [first.id_int, third.id_int]
+
+    requestor.invalidate_template(first)
+    assert list(requestor.templates) == [third.id_int]
+
+
+def test_requestor_coalescing():
+    requestor = create_requestor(concurrency=8)
+    requestor.rate_limits = RateLimitService("rate-limit-service")
+    tenants = [Resource("mock://github/events", ResourceTimings(), send_headers={"Authorization": "token abc"})
+               for _ in range(3)]
+    other = Resource("mock://github/events", ResourceTimings(), send_headers={"Authorization": "token xyz"})
+    now = timeutils.milliseconds()
+    budget = requestor.rate_limits.registry.get_budget(tenants[0])
+    budget.observe(5000, 10, now + 60000, now)
+
+    for resource in tenants + [other]:
+        requestor.rate_limits.acquire(resource, now)  # as the analyzer does
+        requestor.pool.spawn(requestor.dispatch, resource)
+    requestor.pool.join()
+
+    # only the request made spends a token of the shared budget
+    assert budget.remaining == 9
+
+    # identical requests share one call and its response, another credential does not
+    assert len(requestor.session.sent) == 2
+    assert requestor.coalesced == 2
+    assert requestor.in_flight == {}
+
+    responses = dict(requestor.queue.get_batch(Topics.Publish, None))
+    assert len(responses) == 4
+    assert responses[tenants[0]] is responses[tenants[1]] is responses[tenants[2]]
+    assert responses[other] is not responses[tenants[0]]
+
+
+def test_requestor_coalesced_failure():
+    requestor = create_requestor()
+    requestor.rate_limits = RateLimitService("rate-limit-service")
+    resources = [Resource("mock://broken/events", ResourceTimings()) for _ in range(3)]
+    now = timeutils.milliseconds()
+    budget = requestor.rate_limits.registry.get_budget(resources[0])
+    budget.observe(5000, 10, now + 60000, now)
+
+    for resource in resources:
+        requestor.rate_limits.acquire(resource, now)  # as the analyzer does
+        requestor.pool.spawn(requestor.dispatch, resource)
+    requestor.pool.join()
+
+    # each failed resource releases its token once
+    assert budget.remaining == 10
+
+    # every coalesced resource fails with the shared request
+    assert len(requestor.session.sent) == 0
+    assert requestor.coalesced == 2
+    assert requestor.queue.size(Topics.RequestErrors) == 3
+
+
+def test_requestor_stream():
+    requestor = create_requestor(stream=True, chunk_size=256)
+    requestor.session = mock_requests.create_mock_session()
+    resource = Resource("mock://github/events", ResourceTimings(), json=True)
+    requestor.request(resource)
+
+    # events are put on the results topic, the status and headers go on to be parsed
+    events = json.load(open('./tests/system/mock_data/get_event_body.json', 'r'))
+    results = requestor.queue.get_batch(Topics.Results, None)
+    assert [payload.data for _, payload in results] == events
+
+    (published, response), = requestor.queue.get_batch(Topics.Publish, None)
+    assert published is resource
+    assert isinstance(response, StreamedResponse)
+    assert response.events == len(events)
+    assert response.headers["ETag"] == mock_requests.GLOBAL_MOCK_REQUEST_ETAG1
+
+
+def test_requestor_stream_max_body():
+    requestor = create_requestor(stream=True, chunk_size=256, max_body_bytes=1024)
+    requestor.session = mock_requests.create_mock_session()
+
+    with pytest.raises(ResponseTooLargeException):
+        requestor.request(Resource("mock://github/events", ResourceTimings(), json=True))
+
+    # aborted early, with only the events read so far
+    assert 0 < requestor.queue.size(Topics.Results) < 5
+    assert requestor.queue.size(Topics.Publish) == 0
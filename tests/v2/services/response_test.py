@@ -0,0 +1,99 @@
+# External
+import gevent
+
+# Lib
+from v2.data.processors.offload import ExecutionModes
+from v2.data.queue import MemQueue, Topics
+from v2.data.timings import Resource, ResourceTimings
+from v2.services.rate_limits import RateLimitService
+from v2.services.response import ResponseParserService
+from v2.utils import timeutils
+
+# Test libs
+from tests.v2.system import mock_requests
+
+__author__ = 'jason'
+
+
+def test_response_service_offload():
+    service = ResponseParserService("response-service", publish_results=True, cache_bytes=1024 * 1024,
+                                    execution_mode=ExecutionModes.Thread)
+    service.set_queue(MemQueue())
+    session = mock_requests.create_mock_session()
+    resource = Resource("mock://github/events", ResourceTimings(), json=True)
+    batch = [(resource, session.get(resource.uri)), (None, None)]
+
+    try:
+        # the bodies of the batch's 200s are compressed off the hub
+        digests = service.digest(batch)
+        assert digests[1] is None
+        assert [service.parse(res, resp, digest) for (res, resp), digest in zip(batch, digests)] == [True, False]
+    finally:
+        service.stop()
+
+    assert service.cache.get(resource.uri).content() == batch[0][1].content
+
+    (published, payload), = service.queue.get_batch(Topics.Results, None)
+    assert published is resource
+    # decoding holds the GIL, it stays lazy on the hub
+    assert not payload.is_decoded()
+    assert payload.data == batch[0][1].json()
+
+
+def test_response_service_cache_off_by_default():
+    service = ResponseParserService("response-service", execution_mode=ExecutionModes.Thread)
+    session = mock_requests.create_mock_session()
+    resource = Resource("mock://github/events", ResourceTimings(), json=True)
+
+    # nothing is compressed without a cache to put the bodies in
+    assert service.cache is None
+    assert service.digest([(resource, session.get(resource.uri))]) == [None]
+    assert service.executor is None
+
+
+def test_response_service_drains_batches():
+    service = ResponseParserService("response-service", batch_size=8)
+    service.set_queue(MemQueue())
+    session = mock_requests.create_mock_session()
+    resources = [Resource("mock://github/events", ResourceTimings(), json=True) for _ in range(20)]
+    service.queue.put_many(Topics.Publish, [(resource, session.get(resource.uri)) for resource in resources])
+
+    service.start()
+
+    try:
+        # drained without pausing between batches, then blocks on the empty topic
+        with gevent.Timeout(1):
+            while service.queue.size(Topics.Analyze) < len(resources):
+                gevent.sleep(.01)
+    finally:
+        service.stop()
+
+    assert service.queue.size(Topics.Publish) == 0
+
+
+class RateLimitedResponse(object):
+    status_code = 403
+    content = '{"message": "API rate limit exceeded"}'
+
+    def __init__(self, reset):
+        self.headers = {"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)}
+
+
+def test_response_service_rate_limited_403():
+    service = ResponseParserService("response-service", cache_bytes=None)
+    service.set_queue(MemQueue())
+    service.rate_limits = RateLimitService("rate-limit-service")
+    send_headers = {"Authorization": "token abc"}
+    resource = Resource("mock://github/events", ResourceTimings(), send_headers=send_headers)
+    sibling = Resource("mock://github/repos", ResourceTimings(), send_headers=send_headers)
+    now = timeutils.milliseconds()
+    reset = now // 1000 + 60
+
+    # the siblings' shared budget is known and has tokens left
+    service.rate_limits.registry.get_budget(resource).observe(5000, 10, reset * 1000, now)
+    assert service.rate_limits.acquire(sibling, now) is None
+
+    # a 403 spends the budget the siblings share until the reset
+    assert service.parse(resource, RateLimitedResponse(reset)) is False
+    assert resource.timings.rate_limit_remaining == 0
+    assert service.rate_limits.acquire(sibling, now) == reset * 1000 + 1
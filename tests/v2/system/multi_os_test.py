@@ -0,0 +1,55 @@
+# External
+import os
+import signal
+import gevent
+
+# Lib
+from v2.services.retry_delays import no_delay
+from v2.system.multi_os import MultiProcessOS
+
+__author__ = 'jason'
+
+
+def wait_for(condition, timeout=10):
+    with gevent.Timeout(timeout, False):
+        while not condition():
+            gevent.sleep(0.05)
+
+    return condition()
+
+
+def test_multi_process_os(tmpdir):
+    def setup(worker, shard):
+        # record which process runs which shard
+        # renamed into place so a reader never sees a partly written file
+        partial = tmpdir.join("shard-%d.partial" % shard.index)
+        partial.write("%d/%d" % (os.getpid(), shard.count))
+        partial.rename(tmpdir.join("shard-%d" % shard.index))
+
+    def pid_of(index):
+        path = tmpdir.join("shard-%d" % index)
+        return int(path.read().split("/")[0]) if path.check() else None
+
+    multi_os = MultiProcessOS("MultiProcessOS", setup, workers=2, retry_delay_fx=no_delay, stop_timeout=5)
+    multi_os.bootup()
+
+    try:
+        assert wait_for(lambda: pid_of(0) is not None and pid_of(1) is not None)
+        assert multi_os.alive_workers() == 2
+        assert tmpdir.join("shard-1").read().endswith("/2")
+        assert pid_of(0) == multi_os.workers[0].pid
+
+        # a worker which dies is forked again
+        killed = pid_of(0)
+        os.kill(killed, signal.SIGKILL)
+        assert wait_for(lambda: pid_of(0) not in (None, killed))
+        assert multi_os.workers[0].starts == 2
+        assert os.WTERMSIG(multi_os.workers[0].exits[0]) == signal.SIGKILL
+    finally:
+        multi_os.shutdown()
+
+    # workers exit cleanly on shutdown and are not forked again
+    assert multi_os.alive_workers() == 0
+    assert [os.WEXITSTATUS(entry.exits[-1]) for entry in multi_os.workers.itervalues()] == [0, 0]
+    gevent.sleep(0.1)
+    assert multi_os.alive_workers() == 0
@@ -4,7 +4,7 @@ import gevent
 
 # Lib
 from v2.system.canned_os import CannedOS
-from v2.services.freezer import Freezer50Service, Freezer250Service, Freezer500Service, Freezer1000Service
+from v2.services.freezer import FreezerService
 from v2.services.queue import QueueService
 from v2.services.db import DBService
 from v2.services.analyzer import AnalyzerService
@@ -86,11 +86,8 @@ def test_services_for_exceptions():
 
     os.schedule_service(AnalyzerService, ServiceMetaData("analyzer-service", recovery_enabled=True))
 
-    # == freezes - will wait until analyzer runs ==
-    os.schedule_service(Freezer50Service, ServiceMetaData("freezer-50", recovery_enabled=True))
-    os.schedule_service(Freezer250Service, ServiceMetaData("freezer-250", recovery_enabled=True))
-    os.schedule_service(Freezer500Service, ServiceMetaData("freezer-500", recovery_enabled=True))
-    os.schedule_service(Freezer1000Service, ServiceMetaData("freezer-1000", recovery_enabled=True))
+    # == freezer - will wait until analyzer runs ==
+    os.schedule_service(FreezerService, ServiceMetaData("freezer-service", recovery_enabled=True))
 
     # == error handlers for MockResponseService ==
     error_handlers = [MockErrorHandler]
@@ -105,7 +102,7 @@ def test_services_for_exceptions():
     # Manually restart a service to register a retry count of +1
     os.scheduler.restart_service("database-service")
 
-    assert os.scheduler.get_services_count() == 10
+    assert os.scheduler.get_services_count() == 7
     assert os.scheduler.get_service_manager().get_service_meta("database-service").starts == 1
 
     # now assert other services have retries set to 0
@@ -4,7 +4,7 @@ import gevent
 
 # Lib
 from v2.system.canned_os import CannedOS
-from v2.services.freezer import Freezer50Service, Freezer250Service, Freezer500Service, Freezer1000Service
+from v2.services.freezer import FreezerService
 from v2.services.queue import QueueService
 from v2.services.db import DBService
 from v2.services.analyzer import AnalyzerService
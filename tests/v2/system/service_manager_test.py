@@ -1,8 +1,27 @@
+import gevent
+import pytest
+
 from v2.data.simple_data import ServiceMetaData
 from v2.services.services import BaseService
+from v2.system.exceptions import ServiceDependencyCycleException
 from v2.system.os import ServiceManager
 
 
+class FailingService(BaseService):
+    def event_loop(self):
+        raise Exception("failing service, seeing this is good!")
+
+
+class StartedService(BaseService):
+    def event_loop(self):
+        self.ack = True
+
+
+class NeverStartingService(BaseService):
+    def start_event_loop(self):
+        return  # state remains 'starting'
+
+
 def test_service_manager():
     manager = ServiceManager("service-manager-1")
     d1 = manager.service_directory
@@ -46,3 +65,164 @@ def test_stop_service():
 
     # Stop Again will fail
     assert manager.stop_service(service_alias) == False
+
+
+def test_monitor_services_checks_dirty_services():
+    manager = ServiceManager("service-manager-1")
+    service_meta = ServiceMetaData("failing", retries=1, recovery_enabled=True)
+    service = FailingService(service_meta.alias)
+    manager.add_service(service, service_meta)
+    assert manager.add_service(BaseService("idle"), ServiceMetaData("idle")) is True
+
+    # added services are checked once
+    assert manager.monitor_services() == 2
+    assert manager.checks == 2
+    assert manager.monitor_services() == 0
+    assert manager.checks == 2
+
+    # the failing service is checked again only once its greenlet has finished
+    gevent.sleep(0.01)
+    assert manager.dirty == {"failing"}
+    assert manager.wait_for_changes(timeout=0) is True
+    assert manager.monitor_services() == 1
+    assert service_meta.starts == 2
+
+    # retries are spent, it is not started again
+    gevent.sleep(0.01)
+    assert manager.monitor_services() == 0
+    assert service_meta.starts == 2
+    assert manager.checks == 4
+    assert manager.wait_for_changes(timeout=0.01) is False
+
+    manager.get_service("idle").stop()
+
+
+def test_monitor_services_start_timeout():
+    manager = ServiceManager("service-manager-1")
+    service_meta = ServiceMetaData("never-starting", start_timeout=0.05)
+    service = NeverStartingService(service_meta.alias)
+    manager.add_service(service, service_meta)
+    assert manager.monitor_services() == 1
+
+    # a timer marks the service once its start timeout has passed, and again if it fired early
+    checks = 0
+
+    while not service.has_stopped() and checks < 5:
+        assert manager.wait_for_changes(timeout=1) is True
+        assert manager.monitor_services() == 0
+        checks += 1
+
+    assert service.has_stopped()
+    assert len(service_meta.exceptions) == 1
+
+
+def test_monitor_services_delayed_start():
+    manager = ServiceManager("service-manager-1")
+    service_meta = ServiceMetaData("delayed", delay=0.05, recovery_enabled=True)
+    service = StartedService(service_meta.alias)
+    manager.add_service(service, service_meta)
+    assert manager.monitor_services() == 1
+
+    # the start waits on the manager's timers, the service is not a zombie meanwhile
+    assert len(manager.timers) == 1
+    assert service.is_start_pending()
+    assert not service.is_zombie()
+
+    gevent.sleep(0.1)
+    assert service.ack is True
+    assert service_meta.starts == 1
+
+
+def test_service_handles():
+    manager = ServiceManager("service-manager-1")
+    service_meta = ServiceMetaData("test-1")
+    test_service = BaseService(service_meta.alias)
+    manager.add_service(test_service, service_meta)
+    directory = manager.get_directory_service_proxy()
+
+    # handles are cached until invalidated
+    handle = manager.get_handle("test-1")
+    assert handle.service is test_service
+    assert handle.service_meta is service_meta
+    assert manager.get_handle("test-1") is handle
+    assert test_service.get_directory_handle() is handle
+    assert test_service.get_meta() is service_meta
+
+    # a restart invalidates the handle, the service takes a new one
+    version = directory.version
+    manager.restart_service("test-1")
+    assert handle.valid is False
+    assert directory.version > version
+    assert test_service.get_directory_handle() is manager.get_handle("test-1") is not handle
+
+    # as does removing the service
+    handle = manager.get_handle("test-1")
+    manager.stop_service("test-1")
+    assert handle.valid is False
+    assert manager.get_handle("test-1") is None
+    assert test_service.get_meta() is None
+
+
+class RunningService(BaseService):
+    def __init__(self, name, started):
+        BaseService.__init__(self, name)
+        self.started = started
+        self.registered = None
+
+    def register(self):
+        directory = self.get_directory_service_proxy()
+        self.registered = set(alias for alias in "abcd" if directory.find_service(alias) is not None)
+
+    def event_loop(self):
+        self.started.append(self.alias)
+
+        while self.should_loop():
+            gevent.sleep(0.01)
+
+
+def test_monitor_services_starts_dependencies_first():
+    manager = ServiceManager("service-manager-1")
+    started = []
+    metas = [ServiceMetaData("d", depends_on=["b", "c"]),
+             ServiceMetaData("c", depends_on=["a"]),
+             ServiceMetaData("b", depends_on=["a"]),
+             ServiceMetaData("a")]
+    services = dict((meta.alias, RunningService(meta.alias, started)) for meta in metas)
+
+    for meta in metas:  # dependents first
+        assert manager.add_service(services[meta.alias], meta) is True
+
+    manager.start()
+    checks = 0
+
+    while len(started) < len(metas) and checks < 10:
+        manager.wait_for_changes(timeout=1)
+        manager.monitor_services()
+        checks += 1
+
+    # started in waves: a, then b and c, then d
+    assert started[0] == "a"
+    assert set(started[1:3]) == {"b", "c"}
+    assert started[3] == "d"
+
+    # services added before their dependencies registered once those were added
+    assert services["d"].registered >= {"b", "c"}
+
+    # each service's time to ready, and the boot, were recorded
+    assert all(meta.time_to_ready >= 0 for meta in metas)
+    assert metas[0].time_to_ready >= metas[3].time_to_ready
+    assert manager.time_to_boot >= metas[0].time_to_ready
+    assert not manager.unready
+
+    manager.stop_services()
+    manager.stop()
+
+
+def test_add_service_dependency_cycle():
+    manager = ServiceManager("service-manager-1")
+    assert manager.add_service(BaseService("a"), ServiceMetaData("a", depends_on=["b"])) is True
+
+    with pytest.raises(ServiceDependencyCycleException):
+        manager.add_service(BaseService("b"), ServiceMetaData("b", depends_on=["a"]))
+
+    assert manager.get_service_count() == 1
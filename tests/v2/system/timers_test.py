@@ -0,0 +1,111 @@
+import gevent
+
+from v2.system.timers import TimerWheel
+
+__author__ = 'jason'
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_timer_wheel_fires_in_order():
+    clock = Clock()
+    wheel = TimerWheel(tick=1, bits=2, levels=2, clock=clock)  # 4 slots, level 1 reaches 16 ticks
+    fired = []
+
+    for delay in [30, 0, 5, 1, 17, 3]:  # within level 0, level 1 and the overflow
+        wheel.schedule(delay, fired.append, delay)
+
+    cancelled = wheel.schedule(2, fired.append, 2)
+    cancelled.cancel()
+    wheel.stop()  # advanced by hand below
+    assert len(wheel) == 6
+
+    for _ in range(40):
+        clock.now += 1
+        wheel.advance()
+
+    assert fired == [0, 1, 3, 5, 17, 30]
+    assert len(wheel) == 0
+
+
+def test_timer_wheel_never_fires_early():
+    clock = Clock()
+    wheel = TimerWheel(tick=1, bits=2, levels=2, clock=clock)
+    fired = []
+    wheel.schedule(2.5, fired.append, "a")
+    wheel.stop()
+
+    clock.now += 2.5
+    wheel.advance()
+    assert fired == []
+
+    clock.now += 1
+    wheel.advance()
+    assert fired == ["a"]
+
+
+def test_timer_wheel_runs_while_pending():
+    wheel = TimerWheel(tick=0.005)
+    fired = []
+    wheel.schedule(0.02, fired.append, "a")
+    wheel.schedule(0.01, fired.append, "b")
+    assert wheel.greenlet is not None
+
+    gevent.sleep(0.1)
+    assert fired == ["b", "a"]
+    assert wheel.greenlet is None  # stops once nothing is pending
+
+    wheel.schedule(0, fired.append, "c")
+    gevent.sleep(0.05)
+    assert fired == ["b", "a", "c"]
+
+
+class CountingWheel(TimerWheel):
+    def __init__(self, *args, **kwargs):
+        TimerWheel.__init__(self, *args, **kwargs)
+        self.advances = 0
+
+    def advance(self, now_tick=None):
+        self.advances += 1
+        return TimerWheel.advance(self, now_tick)
+
+
+def test_timer_wheel_sleeps_until_next_timer():
+    wheel = CountingWheel(tick=0.005)
+    fired = []
+    later = wheel.schedule(60, fired.append, "later")
+
+    # a far timer does not wake the greenlet every tick
+    gevent.sleep(0.1)
+    assert wheel.advances <= 2
+    assert wheel.next_tick() > wheel.current + 1
+
+    # a sooner timer wakes it early
+    wheel.schedule(0.01, fired.append, "sooner")
+    gevent.sleep(0.1)
+    assert fired == ["sooner"]
+
+    later.cancel()
+    wheel.stop()
+
+
+def test_timer_wheel_skips_empty_ticks():
+    clock = Clock()
+    wheel = TimerWheel(tick=1, bits=2, levels=2, clock=clock)
+    fired = []
+
+    for delay in [3, 17, 40]:  # level 0, level 1 and the overflow
+        wheel.schedule(delay, fired.append, delay)
+
+    wheel.stop()
+
+    # one advance over a long sleep fires every timer due, in order
+    clock.now += 50
+    assert wheel.advance() == 3
+    assert fired == [3, 17, 40]
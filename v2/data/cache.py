@@ -0,0 +1,100 @@
+from collections import OrderedDict
+import zlib
+
+__author__ = 'jason'
+
+
+class CachedResponse(object):
+    """
+    The validators and compressed body of the last full response for a resource.
+    """
+    def __init__(self, etag, last_modified, compressed):
+        """
+        :param compressed: the zlib compressed body
+        """
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body = compressed
+        self.size = len(compressed)
+
+    def content(self):
+        return zlib.decompress(self.body)
+
+    def matches(self, etag, last_modified):
+        """
+        A 304 only vouches for the body the request's validators were taken from.
+        :return: True if the validators are those of this entry
+        """
+        return self.etag == etag and self.last_modified == last_modified
+
+
+class ResponseCache(object):
+    """
+    LRU cache of response bodies keyed by resource URI, bounded by the total
+    size of the compressed bodies. Lets a 304 be served with the body of the
+    last 200.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, compress_level=6):
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self.entries = OrderedDict()  # uri -> CachedResponse, least recently used first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, uri):
+        return uri in self.entries
+
+    def get(self, uri):
+        """
+        :param uri:
+        :return: the CachedResponse for the uri, or None
+        """
+        entry = self.entries.pop(uri, None)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.entries[uri] = entry  # most recently used
+        self.hits += 1
+        return entry
+
+    def put(self, uri, etag, last_modified, body):
+        """
+        Caches the body, evicting the least recently used entries over the byte budget.
+        A body which alone exceeds the budget is not cached.
+        :return: the CachedResponse, or None if not cached
+        """
+        return self.put_compressed(uri, etag, last_modified, zlib.compress(body, self.compress_level))
+
+    def put_compressed(self, uri, etag, last_modified, compressed):
+        """
+        As `put()`, for a body already compressed with zlib.
+        """
+        self.remove(uri)
+        entry = CachedResponse(etag, last_modified, compressed)
+
+        if entry.size > self.max_bytes:
+            return None
+
+        while self.bytes + entry.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= evicted.size
+            self.evictions += 1
+
+        self.entries[uri] = entry
+        self.bytes += entry.size
+        return entry
+
+    def remove(self, uri):
+        entry = self.entries.pop(uri, None)
+
+        if entry is not None:
+            self.bytes -= entry.size
+
+        return entry
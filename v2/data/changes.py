@@ -0,0 +1,81 @@
+from collections import deque
+
+from gevent.event import AsyncResult
+
+from v2.system.exceptions import ChangeFeedTruncatedException
+
+__author__ = 'jason'
+
+
+class ChangeTypes:
+    Insert = "insert"
+    Update = "update"
+    Delete = "delete"
+
+
+class Change(object):
+    """
+    One entry of the change feed.
+    """
+    __slots__ = ("seq", "type", "key")
+
+    def __init__(self, seq, type, key):
+        self.seq = seq
+        self.type = type
+        self.key = key
+
+    def __repr__(self):
+        return '{"change":{"seq":%d,"type":"%s","key":"%s"}}' % (self.seq, self.type, self.key)
+
+
+class ChangeFeed(object):
+    """
+    The inserts, updates and deletes of a store, numbered by a monotonically
+    increasing sequence. Only the last `size` changes are kept, a consumer
+    which falls further behind is told so (see `since()`) and should resync
+    from the store.
+    """
+    def __init__(self, size=100000):
+        self.changes = deque(maxlen=size)
+        self.seq = 0  # seq of the last change, 0 before any
+        self.next = AsyncResult()  # set when the next change is recorded
+
+    def record(self, type, key):
+        self.seq += 1
+        self.changes.append(Change(self.seq, type, key))
+
+        # wake the waiters, later waiters wait on a new result
+        recorded, self.next = self.next, AsyncResult()
+        recorded.set(self.seq)
+        return self.seq
+
+    def since(self, after, limit=None):
+        """
+        :param after: seq of the last change consumed, 0 for all
+        :param limit: at most this many changes, None for all
+        :return: list of Change after `after`, in order
+        :raises ChangeFeedTruncatedException: if changes after `after` were dropped
+        """
+        if after >= self.seq:
+            return []
+
+        first = self.seq - len(self.changes) + 1  # seq of the oldest change kept
+
+        if after + 1 < first:
+            raise ChangeFeedTruncatedException(after, first)
+
+        start = after + 1 - first
+        end = len(self.changes) if limit is None else min(len(self.changes), start + limit)
+        return [self.changes[i] for i in xrange(start, end)]
+
+    def wait(self, after, timeout=None):
+        """
+        Blocks the calling greenlet until there are changes after `after`.
+        :param timeout: seconds, None to wait for ever
+        :return: True if there are changes after `after`
+        """
+        if after < self.seq:
+            return True
+
+        self.next.wait(timeout)
+        return after < self.seq
@@ -1,4 +1,16 @@
 from abc import ABCMeta, abstractmethod
+from uuid import UUID
+import json
+import sqlite3
+
+from gevent.threadpool import ThreadPool
+
+from v2.data.changes import ChangeFeed, ChangeTypes
+from v2.data.index import ResourceIndexes, credential_key
+from v2.data.states import ResourceStates
+from v2.data.timings import Resource, ResourceHeaders, ResourceTimings
+
+__author__ = 'jason'
 
 
 class BaseDB(object):
@@ -24,26 +36,81 @@ class BaseDB(object):
     def update_resource(self, resource, key):
         raise NotImplementedError("Please Implement this method")
 
+    @abstractmethod
+    def delete_resource(self, key):
+        raise NotImplementedError("Please Implement this method")
+
     @abstractmethod
     def resource_count(self):
         raise NotImplementedError("Please Implement this method")
 
+    @abstractmethod
+    def get_resources_by_deadline(self, limit=None, after=None):
+        raise NotImplementedError("Please Implement this method")
+
+    @abstractmethod
+    def get_resources_due(self, now, limit=None):
+        raise NotImplementedError("Please Implement this method")
+
+    @abstractmethod
+    def get_resources_by_state(self, state):
+        raise NotImplementedError("Please Implement this method")
+
+    @abstractmethod
+    def get_resources_by_host(self, host):
+        raise NotImplementedError("Please Implement this method")
+
+    @abstractmethod
+    def get_resources_by_credential(self, credential):
+        raise NotImplementedError("Please Implement this method")
+
+    @abstractmethod
+    def change_seq(self):
+        raise NotImplementedError("Please Implement this method")
+
+    @abstractmethod
+    def get_changes(self, after, limit=None):
+        raise NotImplementedError("Please Implement this method")
+
+    @abstractmethod
+    def wait_for_changes(self, after, timeout=None):
+        raise NotImplementedError("Please Implement this method")
+
+    def flush(self):
+        """
+        Persists pending writes, a no-op for stores which write through.
+        :return: the number of resources written
+        """
+        return 0
+
+    def close(self):
+        pass
+
 
 class MemDB(BaseDB):
     """
-    In memory DB, not optimized, not persistent.
+    In memory DB, not persistent.
     Use as a testing tool.
     Can also be used as a cache for test.
+
+    Resources are indexed by next eligible time, host, credential and state
+    (see `ResourceIndexes`) as of their last save or update, so slices are
+    served in O(log n + k) rather than by a scan. Every save, update and
+    delete is recorded on a change feed (see `ChangeFeed`) of `feed_size`.
     """
-    def __init__(self):
+    def __init__(self, feed_size=100000):
         self.resources = {}
+        self.indexes = ResourceIndexes()
+        self.changes = ChangeFeed(feed_size)
 
     def save_resource_with_key(self, resource, key):
+        change = ChangeTypes.Update if key in self.resources else ChangeTypes.Insert
         self.resources[key] = resource
+        self.indexes.add(key, resource)
+        self.changes.record(change, key)
 
     def save_resource(self, resource):
-        key = resource.uri
-        self.resources[key] = resource
+        self.save_resource_with_key(resource, resource.uri)
 
     def get_resource(self, key):
         if key in self.resources:
@@ -55,7 +122,232 @@ class MemDB(BaseDB):
         return self.resources.iteritems()
 
     def update_resource(self, resource, key):
-        return self.save_resource(resource, key)
+        return self.save_resource_with_key(resource, key)
+
+    def delete_resource(self, key):
+        resource = self.resources.pop(key, None)
+
+        if resource is not None:
+            self.indexes.remove(key)
+            self.changes.record(ChangeTypes.Delete, key)
+
+        return resource
 
     def resource_count(self):
         return len(self.resources)
+
+    def change_seq(self):
+        """
+        :return: seq of the last change, resync from the store then consume the changes after it
+        """
+        return self.changes.seq
+
+    def get_changes(self, after, limit=None):
+        """
+        :param after: seq of the last change consumed
+        :param limit: at most this many changes, None for all
+        :return: list of Change, in order
+        :raises ChangeFeedTruncatedException: if the feed no longer holds every change after `after`
+        """
+        return self.changes.since(after, limit)
+
+    def wait_for_changes(self, after, timeout=None):
+        """
+        Blocks the calling greenlet until there are changes after `after`.
+        :param timeout: seconds, None to wait for ever
+        :return: True if there are changes after `after`
+        """
+        return self.changes.wait(after, timeout)
+
+    def _slice(self, keys):
+        return [(key, self.resources[key]) for key in keys]
+
+    def get_resources_by_deadline(self, limit=None, after=None):
+        """
+        Pages through the resources in the order they are next eligible.
+        :param limit: page size, None for all
+        :param after: Tuple(next_eligible_at, key) of the last resource of the previous page
+        :return: list of Tuple(key, resource)
+        """
+        return self._slice(key for _, key in self.indexes.deadlines.range(after=after, limit=limit))
+
+    def get_resources_due(self, now, limit=None):
+        """
+        :param now: timestamp (ms)
+        :param limit: at most this many resources, None for all
+        :return: list of Tuple(key, resource) eligible at `now`, earliest due first
+        """
+        return self._slice(key for _, key in self.indexes.deadlines.range(upto=now, limit=limit))
+
+    def get_resources_by_state(self, state):
+        """
+        :param state: a ResourceStates
+        :return: list of Tuple(key, resource)
+        """
+        return self._slice(self.indexes.states.get(state))
+
+    def get_resources_by_host(self, host):
+        """
+        :param host: host as in the resource uri, including the port if any
+        :return: list of Tuple(key, resource)
+        """
+        return self._slice(self.indexes.hosts.get(host))
+
+    def get_resources_by_credential(self, credential):
+        """
+        :param credential: the value of the Authorization header, None for the anonymous resources
+        :return: list of Tuple(key, resource)
+        """
+        return self._slice(self.indexes.credentials.get(credential_key(credential)))
+
+
+# columns of the resources table, in the order of `SqliteDB.to_row()`
+COLUMNS = ("key", "id", "uri", "owner", "json", "state", "send_headers", "headers",
+           "interval", "rate_limit", "rate_limit_remaining", "time_to_reset", "etag", "last_modified",
+           "interval_timestamp", "last_request_timestamp", "next_eligible_at")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    key TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    uri TEXT NOT NULL,
+    owner TEXT,
+    json INTEGER,
+    state INTEGER,
+    send_headers TEXT,
+    headers TEXT,
+    interval INTEGER,
+    rate_limit INTEGER,
+    rate_limit_remaining INTEGER,
+    time_to_reset INTEGER,
+    etag TEXT,
+    last_modified TEXT,
+    interval_timestamp INTEGER,
+    last_request_timestamp INTEGER,
+    next_eligible_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS resources_next_eligible ON resources (next_eligible_at, key);
+"""
+
+DELETE = "DELETE FROM resources WHERE key = ?"
+UPSERT = "INSERT OR REPLACE INTO resources (%s) VALUES (%s)" % (", ".join(COLUMNS), ", ".join("?" * len(COLUMNS)))
+SELECT = "SELECT %s FROM resources" % ", ".join(COLUMNS)
+
+
+class SqliteDB(MemDB):
+    """
+    SQLite persisted DB. The resources are loaded into memory on open and
+    served and indexed from there, as the pipeline holds them anyway. Writes are behind:
+    saves, updates and deletes only mark the resource dirty, and `flush()` writes
+    the dirty resources in one transaction within a worker thread so the hub never
+    waits on the disk. The owner (see `DBService`) flushes on an interval.
+
+    The database runs in WAL mode, so the hub reads while the worker writes.
+    The path must be a file, each connection to `:memory:` is its own database.
+    """
+    def __init__(self, path, feed_size=100000):
+        MemDB.__init__(self, feed_size)
+        self.path = path
+        self.pending = {}  # key -> resource (None if deleted), written on the next flush
+        self.writer = ThreadPool(1)
+
+        self.reader = self.connect()
+        self.reader.executescript(SCHEMA)
+        self.writer_connection = self.connect()
+        self.load()
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints, safe in WAL mode
+        return connection
+
+    @staticmethod
+    def to_row(key, resource):
+        timings = resource.timings
+        return (key, str(resource.id), resource.uri, resource.owner, int(resource.json), resource.state.value,
+                json.dumps(resource.send_headers), json.dumps(resource.headers.to_dict()),
+                timings.interval, timings.rate_limit, timings.rate_limit_remaining, timings.time_to_reset,
+                timings.etag, timings.last_modified, timings.interval_timestamp, timings.last_request_timestamp,
+                timings.next_eligible_at)
+
+    @staticmethod
+    def from_row(row):
+        values = dict(zip(COLUMNS, row))
+        timings = ResourceTimings(interval=values["interval"],
+                                  rate_limit=values["rate_limit"],
+                                  rate_limit_remaining=values["rate_limit_remaining"],
+                                  time_to_reset=values["time_to_reset"],
+                                  etag=values["etag"],
+                                  last_modified=values["last_modified"])
+        timings.interval_timestamp = values["interval_timestamp"]
+        timings.last_request_timestamp = values["last_request_timestamp"]
+        timings.refresh()
+
+        headers = ResourceHeaders.from_dict(json.loads(values["headers"]))
+
+        resource = Resource(values["uri"], timings, headers=headers, send_headers=json.loads(values["send_headers"]),
+                            owner=values["owner"], json=bool(values["json"]))
+        resource.id = UUID(values["id"])
+        resource.set_state(ResourceStates(values["state"]))
+        return values["key"], resource
+
+    def load(self):
+        for row in self.reader.execute(SELECT + " ORDER BY next_eligible_at, key"):
+            key, resource = self.from_row(row)
+            MemDB.save_resource_with_key(self, resource, key)
+
+    def save_resource_with_key(self, resource, key):
+        MemDB.save_resource_with_key(self, resource, key)
+        self.pending[key] = resource
+
+    def save_resource(self, resource):
+        self.save_resource_with_key(resource, resource.uri)
+
+    def update_resource(self, resource, key):
+        return self.save_resource_with_key(resource, key)
+
+    def delete_resource(self, key):
+        resource = MemDB.delete_resource(self, key)
+
+        if resource is not None:
+            self.pending[key] = None
+
+        return resource
+
+    def _write(self, rows, deleted):
+        with self.writer_connection:  # one transaction
+            self.writer_connection.executemany(UPSERT, rows)
+            self.writer_connection.executemany(DELETE, deleted)
+
+    def flush(self):
+        """
+        Upserts or deletes the dirty resources within the writer thread, only
+        the calling greenlet waits. If the write fails the resources stay dirty
+        for the next flush.
+        :return: the number of resources written
+        :raises sqlite3.Error: if the write failed, such as when the database is locked
+        """
+        if not self.pending:
+            return 0
+
+        # snapshot on the hub, resources keep changing while the worker writes
+        pending, self.pending = self.pending, {}
+        rows = [self.to_row(key, resource) for key, resource in pending.iteritems() if resource is not None]
+        deleted = [(key,) for key, resource in pending.iteritems() if resource is None]
+
+        try:
+            self.writer.apply(self._write, (rows, deleted))
+        except Exception:
+            for key, resource in pending.iteritems():
+                self.pending.setdefault(key, resource)  # changes made while writing are newer
+
+            raise
+
+        return len(rows) + len(deleted)
+
+    def close(self):
+        self.flush()
+        self.writer.kill()
+        self.writer_connection.close()
+        self.reader.close()
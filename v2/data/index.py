@@ -0,0 +1,260 @@
+from bisect import bisect_left, bisect_right, insort
+from hashlib import sha1
+from urlparse import urlparse
+
+__author__ = 'jason'
+
+
+def resource_host(resource):
+    """
+    :return: the host (and port) the resource is requested from
+    """
+    return urlparse(resource.uri).netloc
+
+
+def credential_key(credential):
+    """
+    Credentials are hashed so they are not kept as keys.
+    :param credential: the value of the Authorization header
+    :return: the hashed credential, None if there is none
+    """
+    if not credential:
+        return None
+
+    return sha1(credential).hexdigest()
+
+
+def resource_credential(resource):
+    """
+    :return: the hashed credential the resource sends, None if anonymous
+    """
+    return credential_key(resource.send_headers.get("Authorization"))
+
+
+class IndexEntry(object):
+    """
+    The values a resource is indexed under, as of its last save.
+    """
+    __slots__ = ("uri", "send_headers", "host", "credential", "deadline", "state")
+
+    def __init__(self, resource):
+        self.uri = resource.uri
+        self.send_headers = resource.send_headers
+        self.host = resource_host(resource)
+        self.credential = resource_credential(resource)
+        self.deadline = resource.timings.next_eligible_at
+        self.state = resource.state
+
+
+class HashIndex(object):
+    """
+    Keys grouped by an indexed value.
+    """
+    def __init__(self):
+        self.keys = {}  # value -> set of keys
+
+    def add(self, value, key):
+        keys = self.keys.get(value)
+
+        if keys is None:
+            keys = self.keys[value] = set()
+
+        keys.add(key)
+
+    def remove(self, value, key):
+        keys = self.keys.get(value)
+
+        if keys is not None:
+            keys.discard(key)
+
+            if not keys:
+                del self.keys[value]
+
+    def get(self, value):
+        return self.keys.get(value, ())
+
+    def count(self, value):
+        return len(self.keys.get(value, ()))
+
+
+class _Last(object):
+    """
+    Sorts after any key.
+    """
+    def __eq__(self, other):
+        return False
+
+    def __ne__(self, other):
+        return True
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+LAST = _Last()
+
+
+class SortedIndex(object):
+    """
+    Keys ordered by an indexed value, one value per key, as Tuple(value, key)
+    kept in order in buckets of up to `2 * load` entries. Buckets are found by
+    bisecting the last entry of each, then bisected in turn, so adding or
+    removing a key costs O(log n) plus a move within one bucket, as every
+    response moves its resource's deadline. Ranges seek their start the same
+    way and then only read the entries returned, O(log n + k). Ties are broken
+    by key.
+    """
+    load = 256
+
+    def __init__(self):
+        self.buckets = []  # lists of Tuple(value, key), in order
+        self.maxes = []  # the last entry of each bucket
+        self.values = {}  # key -> value
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value, key):
+        """
+        Indexes key under value, replacing the value it was indexed under if any.
+        """
+        if key in self.values:
+            self.remove(self.values[key], key)
+
+        self.values[key] = value
+        entry = (value, key)
+
+        if not self.buckets:
+            self.buckets.append([entry])
+            self.maxes.append(entry)
+            return
+
+        i = min(bisect_left(self.maxes, entry), len(self.maxes) - 1)
+        bucket = self.buckets[i]
+        insort(bucket, entry)
+        self.maxes[i] = bucket[-1]
+
+        if len(bucket) > 2 * self.load:
+            self.buckets[i:i + 1] = [bucket[:self.load], bucket[self.load:]]
+            self.maxes[i:i + 1] = [bucket[self.load - 1], bucket[-1]]
+
+    def remove(self, value, key):
+        if key not in self.values or self.values[key] != value:
+            return
+
+        del self.values[key]
+        entry = (value, key)
+        i = bisect_left(self.maxes, entry)
+        bucket = self.buckets[i]
+        del bucket[bisect_left(bucket, entry)]
+
+        if bucket:
+            self.maxes[i] = bucket[-1]
+        else:
+            del self.buckets[i]
+            del self.maxes[i]
+
+    def range(self, after=None, upto=None, limit=None):
+        """
+        :param after: Tuple(value, key), only entries after it
+        :param upto: only entries with a value up to and including it
+        :param limit: at most this many entries, None for all
+        :return: list of Tuple(value, key), in order
+        """
+        i, j = 0, 0
+
+        if after is not None:
+            i = bisect_right(self.maxes, after)
+
+            if i < len(self.buckets):
+                j = bisect_right(self.buckets[i], after)
+
+        found = []
+
+        while i < len(self.buckets):
+            bucket = self.buckets[i]
+            end = len(bucket)
+
+            if upto is not None and bucket[-1][0] > upto:
+                end = bisect_right(bucket, (upto, LAST), j)
+
+            if limit is not None:
+                end = min(end, j + limit - len(found))
+
+            found.extend(bucket[j:end])
+
+            if end < len(bucket) or (limit is not None and len(found) >= limit):
+                break
+
+            i, j = i + 1, 0
+
+        return found
+
+
+class ResourceIndexes(object):
+    """
+    Secondary indexes over the resources of a store: by next eligible time,
+    host, credential and state. The store calls `add()` on every save so the
+    indexes follow the resources as of their last save or update, changes made
+    to a resource in between are not seen until it is updated.
+    """
+    def __init__(self):
+        self.entries = {}  # key -> IndexEntry
+        self.deadlines = SortedIndex()
+        self.hosts = HashIndex()
+        self.credentials = HashIndex()
+        self.states = HashIndex()
+
+    def add(self, key, resource):
+        """
+        Indexes the resource under key, replacing what it was indexed under before.
+        """
+        entry = self.entries.get(key)
+
+        if entry is None:
+            entry = self.entries[key] = IndexEntry(resource)
+            self.deadlines.add(entry.deadline, key)
+            self.hosts.add(entry.host, key)
+            self.credentials.add(entry.credential, key)
+            self.states.add(entry.state, key)
+            return
+
+        deadline = resource.timings.next_eligible_at
+
+        if deadline != entry.deadline:
+            self.deadlines.remove(entry.deadline, key)
+            self.deadlines.add(deadline, key)
+            entry.deadline = deadline
+
+        if resource.state != entry.state:
+            self.states.remove(entry.state, key)
+            self.states.add(resource.state, key)
+            entry.state = resource.state
+
+        if resource.uri != entry.uri:
+            host = resource_host(resource)
+            self.hosts.remove(entry.host, key)
+            self.hosts.add(host, key)
+            entry.uri = resource.uri
+            entry.host = host
+
+        if resource.send_headers is not entry.send_headers:  # send headers are shared, see `intern_send_headers()`
+            credential = resource_credential(resource)
+            self.credentials.remove(entry.credential, key)
+            self.credentials.add(credential, key)
+            entry.send_headers = resource.send_headers
+            entry.credential = credential
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+
+        if entry is not None:
+            self.deadlines.remove(entry.deadline, key)
+            self.hosts.remove(entry.host, key)
+            self.credentials.remove(entry.credential, key)
+            self.states.remove(entry.state, key)
+
+        return entry
@@ -0,0 +1,55 @@
+import importlib
+import json
+
+__author__ = 'jason'
+
+# JSON decoders by preference, C decoders first. Each module provides `loads`.
+DECODERS = ("orjson", "ujson", "simplejson", "json")
+
+
+def resolve_decoder(names=DECODERS):
+    """
+    :param names: module names to try, in order of preference
+    :return: Tuple(name, loads) of the first decoder installed, stdlib json if none are
+    """
+    for name in names:
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            continue
+
+        return name, module.loads
+
+    return "json", json.loads
+
+
+class Payload(object):
+    """
+    A response body which is only decoded when a consumer asks for its data.
+    The raw bytes travel through the pipeline and decoding happens at most once.
+    """
+    _undecoded = object()
+
+    def __init__(self, body, decoder=json.loads, data=_undecoded):
+        """
+        :param body: the raw response body
+        :param decoder: a callable which decodes the body, None for bodies which
+                        are not decoded (the data is the body)
+        :param data: the data if already decoded
+        """
+        self.body = body
+        self.decoder = decoder
+        self._data = data
+
+    def __len__(self):
+        return len(self.body)
+
+    def is_decoded(self):
+        return self._data is not Payload._undecoded
+
+    @property
+    def data(self):
+        if self._data is Payload._undecoded:
+            self._data = self.body if self.decoder is None else self.decoder(self.body)
+
+        return self._data
@@ -0,0 +1,102 @@
+from v2.data.states import ResourceStates
+from v2.data.processors import DataProcessor
+
+try:
+    import numpy
+except ImportError:  # batch analysis is optional, see `BatchResourceAnalyzer.available()`
+    numpy = None
+
+__author__ = 'jason'
+
+# classification code for resources which can be requested, other codes are ResourceStates values
+CAN_REQUEST = -1
+
+
+class ResourceTimingTable(object):
+    """
+    Struct of arrays view over a batch of resources. Each column is a NumPy
+    array with one row per resource, in the order the resources were given.
+    The columns are gathered from what `ResourceTimings.refresh()` already
+    precomputed, so the table holds no rule of its own. Timestamps are in
+    milliseconds.
+    """
+    def __init__(self, resources):
+        count = len(resources)
+        timings = [resource.timings for resource in resources]
+
+        def column(values, dtype=numpy.int64):
+            return numpy.fromiter(values, dtype=dtype, count=count)
+
+        self.resources = resources
+        self.next_eligible_at = column(t.next_eligible_at for t in timings)
+        self.waiting_states = column(CAN_REQUEST if t.waiting_state is None else t.waiting_state.value
+                                     for t in timings)
+        self.edge_errors = column((t.edge_error for t in timings), dtype=numpy.bool_)
+        self.errors = column((r.has_error() for r in resources), dtype=numpy.bool_)
+        self.owned = column((r.has_owner() for r in resources), dtype=numpy.bool_)
+
+    def __len__(self):
+        return len(self.resources)
+
+
+class BatchResourceAnalyzer(DataProcessor):
+    """
+    Vectorized counterpart of `ResourceAnalyzer.can_request`. Classifies a whole
+    batch of resources in one pass over a `ResourceTimingTable` and returns the
+    same decisions the scalar analyzer would.
+    """
+    def __init__(self, name, parent_logger=None):
+        DataProcessor.__init__(self, name, parent_logger)
+
+    @staticmethod
+    def available():
+        return numpy is not None
+
+    @staticmethod
+    def classify(table, now):
+        """
+        :param table: a ResourceTimingTable
+        :param now: timestamp in milliseconds
+        :return: Tuple(codes, deadlines) arrays. Codes are CAN_REQUEST or a ResourceStates
+                 value. Deadlines are the timestamp each waiting resource is next eligible.
+        """
+        deadlines = table.next_eligible_at
+
+        # priority order matches the scalar analyzer, first condition wins
+        codes = numpy.select([table.errors, table.owned, table.edge_errors, now >= deadlines],
+                             [ResourceStates.Error.value,
+                              ResourceStates.HasOwner.value,
+                              ResourceStates.EdgeError.value,
+                              CAN_REQUEST],
+                             default=table.waiting_states)
+
+        return codes, deadlines
+
+    def analyze(self, resources, now):
+        """
+        Classifies the resources and groups them for bulk routing.
+        :param resources: list of resources
+        :param now: timestamp in milliseconds
+        :return: Tuple(requestable, waiting, errored) where waiting is a list of
+                 Tuple(resource, deadline).
+        """
+        codes, deadlines = self.classify(ResourceTimingTable(resources), now)
+
+        requestable = [resources[i] for i in numpy.flatnonzero(codes == CAN_REQUEST)]
+        waiting = [(resources[i], int(deadlines[i])) for i in
+                   numpy.flatnonzero((codes == ResourceStates.WaitingForInterval.value) |
+                                     (codes == ResourceStates.WaitingForReset.value))]
+        errored = [resources[i] for i in
+                   numpy.flatnonzero((codes == ResourceStates.Error.value) |
+                                     (codes == ResourceStates.HasOwner.value) |
+                                     (codes == ResourceStates.EdgeError.value))]
+
+        for resource in errored:
+            self.log.error("resource is in an error state, owned or an edge case and cannot be requested.",
+                           resource_id=resource.id_int,
+                           resource_uri=resource.uri)
+
+        self.log.debug("batch analyzed.", size=len(resources), requestable=len(requestable),
+                       waiting=len(waiting), errored=len(errored))
+
+        return requestable, waiting, errored
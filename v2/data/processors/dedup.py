@@ -0,0 +1,103 @@
+from heapq import heappop, heappush
+
+from v2.data.processors import DataProcessor
+
+__author__ = 'jason'
+
+
+def event_id(event):
+    """
+    :param event: a decoded event
+    :return: the event's id as an int, GitHub ids are increasing numeric strings
+    """
+    return int(event["id"])
+
+
+class SeenEvents(object):
+    """
+    The events seen for one resource. Ids above the `high_water_mark` are new,
+    below it the `size` highest ids seen are remembered so events arriving out
+    of order are still forwarded once. The lowest ids are evicted first, so
+    every id up to `floor` was seen or is older than the ids remembered.
+    """
+    def __init__(self, size):
+        self.recent = []  # heap of the ids remembered, lowest first
+        self.recent_ids = set()
+        self.size = size
+        self.floor = None  # highest id evicted, below the lowest id remembered
+        self.high_water_mark = None  # highest id seen
+
+    def is_new(self, id):
+        if self.high_water_mark is None or id > self.high_water_mark:
+            return True
+
+        if self.floor is not None and id <= self.floor:
+            return False
+
+        return id not in self.recent_ids
+
+    def add(self, id):
+        heappush(self.recent, id)
+        self.recent_ids.add(id)
+
+        if self.high_water_mark is None or id > self.high_water_mark:
+            self.high_water_mark = id
+
+        if len(self.recent) > self.size:
+            self.floor = heappop(self.recent)  # ids are only added above the floor, it only rises
+            self.recent_ids.discard(self.floor)
+
+
+class EventDeduplicator(DataProcessor):
+    """
+    Forwards only the events of a resource which were not seen before, as
+    polled pages overlap. Events without an id are always forwarded.
+    """
+    def __init__(self, name, parent_logger=None, recent_size=256, id_fx=event_id):
+        DataProcessor.__init__(self, name, parent_logger)
+        self.recent_size = recent_size
+        self.id_fx = id_fx
+        self.seen = {}  # resource id_int -> SeenEvents
+
+    def get_seen(self, resource):
+        seen = self.seen.get(resource.id_int)
+
+        if seen is None:
+            seen = self.seen[resource.id_int] = SeenEvents(self.recent_size)
+
+        return seen
+
+    def filter(self, resource, events):
+        """
+        :param resource:
+        :param events: list of decoded events
+        :return: list of the new events, in the given order
+        """
+        seen = self.get_seen(resource)
+        new = []
+        new_ids = set()
+
+        # the page is judged as of the previous pages, evicting while adding its ids
+        # would raise the floor over the ids of the page not reached yet
+        for event in events:
+            try:
+                id = self.id_fx(event)
+            except (KeyError, TypeError, ValueError):
+                new.append(event)
+                continue
+
+            if seen.is_new(id) and id not in new_ids:
+                new_ids.add(id)
+                new.append(event)
+
+        for id in new_ids:
+            seen.add(id)
+
+        if len(new) < len(events):
+            self.log.debug("skipped events already seen.", resource_id=resource.id_int,
+                           events=len(events), new=len(new))
+
+        return new
+
+    def forget(self, resource):
+        self.seen.pop(resource.id_int, None)
@@ -0,0 +1,64 @@
+import zlib
+
+from gevent.threadpool import ThreadPool
+
+__author__ = 'jason'
+
+
+class ExecutionModes:
+    Thread = "thread"  # a gevent threadpool, zlib releases the GIL while compressing
+
+
+class BodyDigest(object):
+    """
+    The CPU heavy work on a response body, done away from the hub.
+    """
+    def __init__(self, compressed=None):
+        self.compressed = compressed  # zlib compressed body, None if not compressed
+
+
+def digest_bodies(bodies, compress_level=6):
+    """
+    Runs within a worker thread, keep it free of shared state.
+    :param bodies: list of bodies
+    :param compress_level: zlib level, None to not compress
+    :return: list of BodyDigest, one per body
+    """
+    digests = []
+
+    for body in bodies:
+        digest = BodyDigest()
+
+        if compress_level is not None:
+            digest.compressed = zlib.compress(body, compress_level)
+
+        digests.append(digest)
+
+    return digests
+
+
+class ParseExecutor(object):
+    """
+    Runs `digest_bodies` for a batch of bodies off the gevent hub in a gevent
+    threadpool. The calling greenlet waits on the result while the hub keeps
+    running the other services.
+
+    Only compression is offloaded, zlib releases the GIL while it works so the
+    hub does run meanwhile. Decoding JSON holds the GIL, in a thread it would
+    stall the hub all the same, so bodies are left to decode lazily on the hub
+    when a consumer reads them (see `Payload`). The threads are real threads
+    even under `monkey.patch_all()`. Run `MultiProcessOS` to use more cores.
+    """
+    def __init__(self, mode=ExecutionModes.Thread, size=2):
+        self.mode = mode
+        self.size = size
+        self.threads = ThreadPool(size)
+
+    def digest(self, bodies, compress_level=6):
+        """
+        :return: list of BodyDigest, one per body
+        """
+        return self.threads.apply(digest_bodies, (bodies, compress_level))
+
+    def close(self):
+        self.threads.kill()
@@ -9,13 +9,11 @@ class ResourceAnalyzer(DataProcessor):
         DataProcessor.__init__(self, name, parent_logger)
 
     def is_edge_case(self, resource):
-        value = resource.timings.has_limit_been_reached() \
-               and resource.timings.has_reset_window_past() \
-               and resource.timings.requested_since_reset()
+        value = resource.timings.edge_error
 
         if value is True:
             self.log.error("resource has timings that exhibit an error edge case.",
-                           resource_id=str(resource.id),
+                           resource_id=resource.id_int,
                            resource_uri=resource.uri)
 
         return value
@@ -23,85 +21,85 @@ class ResourceAnalyzer(DataProcessor):
     def detect_error_state(self, resource):
         return resource.has_error() or resource.has_owner() or self.is_edge_case(resource)
 
-    def can_request(self, resource):
+    def can_request(self, resource, now=None):
+        """
+        Determines if a resource can be requested. The timings carry a precomputed
+        next eligible timestamp (see `ResourceTimings.refresh()`), so the business
+        check is a single comparison.
+        :param resource:
+        :param now: timestamp in milliseconds, read once if not provided. Callers
+                    analyzing many resources may pass the same value.
+        :return: Tuple(can_request, possible_state)
+        """
+        timings = resource.timings
+
+        if now is None:
+            now = timings.get_now()
+
         # == Base Checks == only check operationals at this point, for speed
         # checks if error exists
         if resource.has_error():
             self.log.error("resource is in state of error while trying to see if it can be requested.",
-                           resource_id=str(resource.id),
+                           resource_id=resource.id_int,
                            resource_uri=resource.uri,
-                           interval_remaining=resource.timings.interval_remaining(),
-                           limit_remaining=resource.timings.rate_limit_remaining,
-                           reset_remaining=resource.timings.reset_time_remaining())
+                           eligible_in=timings.next_eligible_at - now,
+                           limit_remaining=timings.rate_limit_remaining)
             return False, ResourceStates.Error
 
         # if someone owns the resource, it cannot be called. Think of it as a lock with semantics.
         if resource.has_owner():
             self.log.error("resource already has an owner registered to it.",
                            resource_owner=resource.owner,
-                           resource_id=str(resource.id),
+                           resource_id=resource.id_int,
                            resource_uri=resource.uri,
-                           interval_remaining=resource.timings.interval_remaining(),
-                           limit_remaining=resource.timings.rate_limit_remaining,
-                           reset_remaining=resource.timings.reset_time_remaining())
+                           eligible_in=timings.next_eligible_at - now,
+                           limit_remaining=timings.rate_limit_remaining)
             return False, ResourceStates.HasOwner
 
         # == Business Checks == now business logic can be accessed
         if self.is_edge_case(resource):
             self.log.error("resource was found to be in an edge case error state.",
-                           resource_id=str(resource.id),
+                           resource_id=resource.id_int,
                            resource_uri=resource.uri,
-                           interval_remaining=resource.timings.interval_remaining(),
-                           limit_remaining=resource.timings.rate_limit_remaining,
-                           reset_remaining=resource.timings.reset_time_remaining())
+                           limit_remaining=timings.rate_limit_remaining)
             return False, ResourceStates.EdgeError
 
-        # Kept here for ease of reading, but if performance is an issue, make instance or static methods
-        def check_reset_window():
-            if resource.timings.has_reset_window_past():
-                self.log.debug("resource limit was reached, but can now be reset",
-                               resource_id=str(resource.id),
-                               resource_uri=resource.uri,
-                               interval_remaining=resource.timings.interval_remaining(),
-                               limit_remaining=resource.timings.rate_limit_remaining,
-                               reset_remaining=resource.timings.reset_time_remaining())
-                return True, None
-            else:
-                self.log.debug("resource limit was reached, waiting for reset.",
-                               resource_id=str(resource.id),
-                               resource_uri=resource.uri,
-                               interval_remaining=resource.timings.interval_remaining(),
-                               limit_remaining=resource.timings.rate_limit_remaining,
-                               reset_remaining=resource.timings.reset_time_remaining())
-                return False, ResourceStates.WaitingForReset
-
-        def check_timings(next_fx):
-            if resource.timings.has_limit_been_reached():
-                return next_fx()
-            else:
-                msg = "resource interval passed, limit not yet exceeded, ready to be requested."
-                self.log.debug(msg,
-                               resource_id=str(resource.id),
-                               resource_uri=resource.uri,
-                               interval_remaining=resource.timings.interval_remaining(),
-                               limit_remaining=resource.timings.rate_limit_remaining,
-                               reset_remaining=resource.timings.reset_time_remaining())
-                return True, None
-
-        def check_interval(next_fx):
-            if resource.timings.has_interval_passed():
-                return next_fx()
+        if now >= timings.next_eligible_at:
+            self.log.debug("resource interval passed, limit not yet exceeded or reset, ready to be requested.",
+                           resource_id=resource.id_int,
+                           resource_uri=resource.uri,
+                           limit_remaining=timings.rate_limit_remaining)
+            return True, None
+
+        self.log.debug("resource waiting.",
+                       resource_id=resource.id_int,
+                       resource_uri=resource.uri,
+                       state=timings.waiting_state.name,
+                       eligible_in=timings.next_eligible_at - now,
+                       limit_remaining=timings.rate_limit_remaining)
+        return False, timings.waiting_state
+
+    def analyze(self, resources, now):
+        """
+        Runs `can_request` over a batch of resources and groups the results for
+        bulk routing. Same contract as `BatchResourceAnalyzer.analyze`.
+        :param resources: list of resources
+        :param now: timestamp in milliseconds
+        :return: Tuple(requestable, waiting, errored) where waiting is a list of
+                 Tuple(resource, deadline).
+        """
+        requestable = []
+        waiting = []
+        errored = []
+
+        for resource in resources:
+            can_request, possible_state = self.can_request(resource, now)
+
+            if can_request:
+                requestable.append(resource)
+            elif possible_state in [ResourceStates.WaitingForReset, ResourceStates.WaitingForInterval]:
+                waiting.append((resource, resource.timings.next_eligible_at))
             else:
-                self.log.debug("resource waiting for interval.",
-                               resource_id=str(resource.id),
-                               resource_uri=resource.uri,
-                               interval_remaining=resource.timings.interval_remaining(),
-                               limit_remaining=resource.timings.rate_limit_remaining,
-                               reset_remaining=resource.timings.reset_time_remaining())
-                return False, ResourceStates.WaitingForInterval
-
-        def then_check_timings(next_fx):
-            return lambda: check_timings(next_fx)
-
-        # would rather do pattern matching or a monadic map...
-        return check_interval(then_check_timings(check_reset_window))
+                errored.append(resource)
+
+        return requestable, waiting, errored
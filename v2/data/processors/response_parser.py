@@ -1,3 +1,4 @@
+from v2.data.payload import Payload, resolve_decoder
 from v2.data.processors import DataProcessor
 from v2.data.states import ResourceStates
 
@@ -6,24 +7,109 @@ __author__ = 'jason'
 
 
 class ResponseParser(DataProcessor):
-    def __init__(self, name, parent_logger=None):
+    """
+    Parses responses, updating the resource's timings from the headers.
+
+    With a `ResponseCache` the body of each 200 is cached along with its
+    validators, and a 304 is served the cached body (see `read_body()`). When
+    the cached body is gone the resource's validators are dropped, so the next
+    request fetches the full body again.
+
+    Bodies are not decoded here. Each result is wrapped in a `Payload` which
+    decodes JSON bodies with `decoder` (the fastest installed, see
+    `resolve_decoder()`) only once a consumer reads its data, and is handed
+    to `publish` if one is given.
+    """
+    def __init__(self, name, parent_logger=None, cache=None, decoder=None, publish=None):
+        """
+        :param cache: an optional ResponseCache
+        :param decoder: callable decoding JSON bodies
+        :param publish: optional callable, called with (resource, payload) for each result
+        """
         DataProcessor.__init__(self, name, parent_logger)
+        self.cache = cache
+        self.publish = publish
+
+        if decoder is None:
+            decoder_name, decoder = resolve_decoder()
+            self.log.debug("resolved json decoder.", decoder=decoder_name)
+
+        self.decoder = decoder
 
     @staticmethod
     def parse_headers(response, resource):
         resource.timings.update(response, resource.headers)
 
+    @staticmethod
+    def parse_rate_limit(response, resource):
+        """
+        Error responses still count against the rate limit, and a 403 is how the
+        server says it is spent, keep the resource's view of it current.
+        """
+        resource.timings.update_rate_limit(response, resource.headers)
+
+    @staticmethod
+    def carries_rate_limit(response, resource):
+        """
+        :return: True if the response tells the rate limit, whatever its status
+        """
+        return response.headers.get(resource.headers.rate_limit_remaining) is not None
+
+    @staticmethod
+    def validated(response, resource):
+        """
+        :return: True if the response carries an ETag or a Last-Modified, only then can a 304 follow
+        """
+        return (response.headers.get(resource.headers.etag) is not None
+                or response.headers.get(resource.headers.last_modified) is not None)
+
+    def read_body(self, response, resource):
+        """
+        :param response:
+        :param resource:
+        :return: the response body, for a 304 the cached body or None when not cached
+        """
+        if response.status_code != 304:
+            return response.content
+
+        if self.cache is None:
+            return None
+
+        cached = self.cache.get(resource.uri)
+
+        if cached is None or not cached.matches(resource.timings.etag, resource.timings.last_modified):
+            return None
+
+        return cached.content()
+
+    def cache_body(self, response, resource, digest=None):
+        timings = resource.timings
+
+        if self.cache is None or response.content is None:  # nothing to cache for streamed responses
+            return
+
+        if timings.etag is None and timings.last_modified is None:  # can never be served a 304
+            self.cache.remove(resource.uri)
+            return
+
+        if digest is not None and digest.compressed is not None:
+            self.cache.put_compressed(resource.uri, timings.etag, timings.last_modified, digest.compressed)
+        else:
+            self.cache.put(resource.uri, timings.etag, timings.last_modified, response.content)
+
     # @staticmethod
-    def parse(self, response, resource):
+    def parse(self, response, resource, digest=None):
+        """
+        :param response:
+        :param resource:
+        :param digest: optional BodyDigest of the response body, computed off the hub
+        :return: True if the resource should go back to analysis
+        """
         status_code = response.status_code
 
-        def publish_results(resp, res):
-            content = None
-
-            if res.is_json():
-                content = resp.json()
-            else:
-                content = resp.content
+        def publish_results(body, res):
+            if self.publish is not None:
+                self.publish(res, Payload(body, self.decoder if res.is_json() else None))
 
             return True
 
@@ -33,6 +119,7 @@ class ResponseParser(DataProcessor):
         def default():
             msg = "Found a response code which didn't expect, setting resource to error state."
             self.log.error(msg, status_code=status_code)
+            ResponseParser.parse_rate_limit(response, resource)
             resource.set_error_state()
             return publish_error()
 
@@ -40,29 +127,48 @@ class ResponseParser(DataProcessor):
             msg = "200 response code received."
             self.log.debug(msg, status_code=status_code)
             ResponseParser.parse_headers(response, resource)
-            return publish_results(response, resource)
+            self.cache_body(response, resource, digest)
+
+            if response.content is None:  # streamed, the events were published as they arrived
+                return True
+
+            return publish_results(response.content, resource)
 
         def res304():
             msg = "304 not modified received, waiting for next interval"
             self.log.debug(msg, status_code=status_code)
+            body = self.read_body(response, resource)  # validators sent are those before the update
             ResponseParser.parse_headers(response, resource)
+
+            if body is not None:
+                return publish_results(body, resource)
+
+            if self.cache is not None:
+                self.log.debug("body not cached, next request will not be conditional.",
+                               resource_uri=resource.uri)
+                resource.timings.etag = None
+                resource.timings.last_modified = None
+
             return True
 
         def res403():
             msg = "Client credentials are no longer valid or were not able to be verified."
             self.log.debug(msg, status_code=status_code)
+            ResponseParser.parse_rate_limit(response, resource)
             resource.set_error_state()
             return publish_error()
 
         def res404():
             msg = "Response received noting resource does not exist, or does not exist any longer."
             self.log.error(msg, status_code=status_code)
+            ResponseParser.parse_rate_limit(response, resource)
             resource.set_error_state()
             return publish_error()
 
         def res500():
             msg = "Response received noting resource does not exist, or does not exist any longer."
             self.log.debug(msg, status_code=status_code)
+            ResponseParser.parse_rate_limit(response, resource)
             resource.set_error_state()
             return publish_error()
 
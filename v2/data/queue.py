@@ -1,138 +1,408 @@
-from gevent.queue import Queue
+from gevent.event import Event
+from gevent.queue import Queue, Empty
 from abc import ABCMeta, abstractmethod
+import heapq
+import itertools
+
+from v2.utils import timeutils
 
 __author__ = 'jason'
 
 
+class Topics:
+    """
+    Names of the topics used throughout the pipeline.
+    """
+    Frozen = "frozen"
+    Analyze = "analyze"
+    AnalyzeErrors = "analyze-errors"
+    Requests = "requests"
+    RequestErrors = "request-errors"
+    Publish = "publish"
+    PublishErrors = "publish-errors"
+    Results = "results"  # Tuple(Resource, Payload), only published when enabled on the response parser
+    Events = "events"  # Tuple(Resource, event), new events from the results, see `EventDedupService`
+
+
+class OverloadPolicies:
+    """
+    What a producer does when a downstream topic is above its high watermark.
+    """
+    Block = "block"  # wait until the topic drains to its low watermark
+    Shed = "shed"  # back off, the producer decides what to do with the item
+
+
+# Per topic limits used by MemQueue. The requests and publish topics are bounded as
+# publish entries hold full responses. Analyze and frozen hold at most every resource
+# once and are left unbounded, bounding them could deadlock the analyze -> requests ->
+# publish -> analyze cycle. The results and events sinks are left unbounded too, their
+# producers never check them and would block for ever on a sink nothing consumes.
+TOPIC_LIMITS = {
+    Topics.Requests: {"capacity": 10000, "high_watermark": 5000, "low_watermark": 2500},
+    Topics.Publish: {"capacity": 1000, "high_watermark": 250, "low_watermark": 100}
+}
+
+
+def resource_deadline(resource):
+    """
+    Default deadline for items put on the frozen topic without one.
+    :param resource:
+    :return: the timestamp the resource is next eligible to be requested
+    """
+    return resource.timings.next_eligible_at
+
+
+class Topic(object):
+    """
+    A named FIFO topic backed by a gevent Queue.
+
+    A topic may be bounded by a `capacity`, where puts block when full. The
+    watermarks signal overload to producers before that point: a topic becomes
+    overloaded at the high watermark and stays so until drained to the low
+    watermark, so producers don't flap around a single threshold.
+    """
+    def __init__(self, name, capacity=None, high_watermark=None, low_watermark=None):
+        self.name = name
+        self.queue = Queue(capacity)
+
+        if high_watermark is None:
+            high_watermark = capacity
+
+        if low_watermark is None and high_watermark is not None:
+            low_watermark = high_watermark // 2
+
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.overloaded = False
+        self.drained = Event()  # set while the topic is not overloaded
+        self.drained.set()
+
+    def is_overloaded(self):
+        if not self.overloaded and self.high_watermark is not None \
+                and self.queue.qsize() >= self.high_watermark:
+            self.overloaded = True
+            self.drained.clear()
+
+        return self.overloaded
+
+    def _check_drained(self):
+        if self.overloaded and self.queue.qsize() <= self.low_watermark:
+            self.overloaded = False
+            self.drained.set()
+
+    def wait_for_capacity(self, timeout=None):
+        """
+        Blocks while the topic is overloaded.
+        :param timeout: seconds to wait, None waits until drained
+        :return: True if the topic is no longer overloaded
+        """
+        if self.is_overloaded():
+            self.drained.wait(timeout)
+
+        return not self.overloaded
+
+    def put(self, item):
+        self.queue.put(item)
+        return self.queue.qsize()
+
+    def put_many(self, items):
+        queue = self.queue
+        for item in items:
+            queue.put(item)
+
+        return queue.qsize()
+
+    def get(self, block=True, timeout=None):
+        item = self.queue.get(block, timeout)
+
+        if self.overloaded:
+            self._check_drained()
+
+        return item
+
+    def get_batch(self, max_items, timeout=None):
+        """
+        Blocks until at least one item is available, then drains whatever
+        else is ready without blocking, up to `max_items`.
+        :param max_items: maximum number of items to return, None for all ready
+        :param timeout: seconds to wait for the first item, None waits forever
+        :return: list of items, empty only if the timeout expired
+        """
+        queue = self.queue
+
+        try:
+            batch = [queue.get(True, timeout)]
+        except Empty:
+            return []
+
+        while (max_items is None or len(batch) < max_items) and not queue.empty():
+            batch.append(queue.get_nowait())
+
+        if self.overloaded:
+            self._check_drained()
+
+        return batch
+
+    def qsize(self):
+        return self.queue.qsize()
+
+
+class DelayQueue(object):
+    """
+    A deadline ordered queue. Items are kept in a heap keyed on the
+    timestamp (in milliseconds) at which they become due, so a reader
+    can sleep exactly until the earliest deadline rather than polling
+    fixed interval buckets.
+
+    Items sharing a deadline are released in the order they were put.
+    Exposes the same interface as `Topic`, items put without a deadline
+    are keyed with `deadline_fx(item)`.
+    """
+    def __init__(self, name="delay", deadline_fx=resource_deadline):
+        self.name = name
+        self.deadline_fx = deadline_fx
+        self.heap = []
+        self.counter = itertools.count()  # tie breaker, keeps insertion order for equal deadlines
+        self.wakeup = Event()  # set when a new earliest deadline arrives
+
+    def put(self, item, deadline=None):
+        """
+        :param item: the item to hold
+        :param deadline: timestamp in milliseconds when the item is due
+        :return: size of the queue
+        """
+        if deadline is None:
+            deadline = self.deadline_fx(item)
+
+        entry = (deadline, next(self.counter), item)
+        heapq.heappush(self.heap, entry)
+
+        if self.heap[0] is entry:  # new earliest deadline, wake any reader to re-evaluate its sleep
+            self.wakeup.set()
+
+        return len(self.heap)
+
+    def put_many(self, items):
+        size = 0
+        for item in items:
+            size = self.put(item)
+
+        return size
+
+    def qsize(self):
+        return len(self.heap)
+
+    def is_overloaded(self):
+        return False  # unbounded, holds at most every resource once
+
+    def wait_for_capacity(self, timeout=None):
+        return True
+
+    def next_deadline(self):
+        if self.heap:
+            return self.heap[0][0]
+
+        return None
+
+    def pop_due(self, now=None, max_items=None):
+        """
+        Non blocking, pops every item whose deadline is at or before now.
+        :param now: timestamp in milliseconds, generated if not provided
+        :param max_items: maximum number of items to pop, None for all due
+        :return: list of due items, may be empty
+        """
+        if now is None:
+            now = timeutils.milliseconds()
+
+        due = []
+        heap = self.heap
+
+        while heap and heap[0][0] <= now and (max_items is None or len(due) < max_items):
+            due.append(heapq.heappop(heap)[2])
+
+        return due
+
+    def get(self, block=True, timeout=None):
+        """
+        Gets a single due item.
+        :return: the item, raises `Empty` if nothing became due
+        """
+        due = self.get_batch(1, timeout if block else 0)
+
+        if not due:
+            raise Empty()
+
+        return due[0]
+
+    def get_batch(self, max_items=None, timeout=None):
+        """
+        Blocks until at least one item is due and returns the due items.
+        :param max_items: maximum number of items to return, None for all due
+        :param timeout: seconds to wait, None waits until an item is due.
+        :return: list of due items, empty only if the timeout expired
+        """
+        expires = None
+        if timeout is not None:
+            expires = timeutils.milliseconds() + int(timeout * 1000)
+
+        while True:
+            now = timeutils.milliseconds()
+            due = self.pop_due(now, max_items)
+
+            if due:
+                return due
+
+            wait = None  # empty, wait until something is put
+            if self.heap:
+                wait = self.heap[0][0] - now
+
+            if expires is not None:
+                if now >= expires:
+                    return due
+
+                wait = expires - now if wait is None else min(wait, expires - now)
+
+            # no other greenlet can run between the clear and the wait
+            self.wakeup.clear()
+            self.wakeup.wait(None if wait is None else wait / 1000.0)
+
+
 class BaseQueue(object):
+    """
+    Topic based queue interface. Implementations keep a registry of topics,
+    new topics need only be registered. The named methods below are
+    conveniences over the generic interface.
+    """
     __metaclass__ = ABCMeta
 
-    # -- Frozen 50 Queue --
+    # -- Generic Topic API --
     @abstractmethod
-    def get_frozen_50(self):
+    def register_topic(self, name, topic=None):
         raise NotImplementedError("Please Implement this method")
 
     @abstractmethod
-    def put_frozen_50(self, item):
+    def put(self, topic, item):
         raise NotImplementedError("Please Implement this method")
 
     @abstractmethod
-    def frozen_50_size(self):
+    def put_many(self, topic, items):
         raise NotImplementedError("Please Implement this method")
 
-    # -- Frozen 250 Queue --
     @abstractmethod
-    def get_frozen_250(self):
+    def get(self, topic, block=True, timeout=None):
         raise NotImplementedError("Please Implement this method")
 
     @abstractmethod
-    def put_frozen_250(self, item):
+    def get_batch(self, topic, max_items, timeout=None):
         raise NotImplementedError("Please Implement this method")
 
     @abstractmethod
-    def frozen_250_size(self):
+    def size(self, topic):
         raise NotImplementedError("Please Implement this method")
 
-    # -- Frozen 500 Queue --
     @abstractmethod
-    def get_frozen_500(self):
+    def is_overloaded(self, topic):
         raise NotImplementedError("Please Implement this method")
 
     @abstractmethod
-    def put_frozen_500(self, item):
+    def wait_for_capacity(self, topic, timeout=None):
         raise NotImplementedError("Please Implement this method")
 
-    @abstractmethod
-    def frozen_500_size(self):
-        raise NotImplementedError("Please Implement this method")
+    def admit(self, topic, policy=OverloadPolicies.Block, timeout=None):
+        """
+        Backpressure check for producers, call before putting on a topic.
+        Above the high watermark a blocking producer waits until the topic
+        drains to its low watermark, a shedding producer is told to back off.
+        :param topic:
+        :param policy: one of OverloadPolicies
+        :param timeout: seconds a blocking producer waits, None waits until drained
+        :return: True if the producer may put on the topic, False if it should shed
+        """
+        if not self.is_overloaded(topic):
+            return True
 
-    # -- Frozen 1000 Queue --
-    @abstractmethod
-    def get_frozen_1000(self):
-        raise NotImplementedError("Please Implement this method")
+        if policy == OverloadPolicies.Block:
+            return self.wait_for_capacity(topic, timeout)
 
-    @abstractmethod
-    def put_frozen_1000(self, item):
-        raise NotImplementedError("Please Implement this method")
+        return False
 
+    # -- Frozen (delay) Queue --
     @abstractmethod
-    def frozen_1000_size(self):
+    def put_frozen(self, item, deadline):
         raise NotImplementedError("Please Implement this method")
 
+    def get_frozen(self, timeout=None):
+        """
+        Blocks until at least one item is due and returns every item
+        which is due. An empty list is returned if the timeout expires.
+        :param timeout: seconds to wait, None waits until an item is due.
+        :return:
+        """
+        return self.get_batch(Topics.Frozen, None, timeout)
+
+    def frozen_size(self):
+        return self.size(Topics.Frozen)
+
     # -- Analyzer --
-    @abstractmethod
     def get_analyze(self):
-        raise NotImplementedError("Please Implement this method")
+        return self.get(Topics.Analyze)
 
-    @abstractmethod
     def put_analyze(self, item):
-        raise NotImplementedError("Please Implement this method")
+        return self.put(Topics.Analyze, item)
 
-    @abstractmethod
     def analyze_size(self):
-        raise NotImplementedError("Please Implement this method")
+        return self.size(Topics.Analyze)
 
-    @abstractmethod
     def get_analyze_error(self):
-        raise NotImplementedError("Please Implement this method")
+        return self.get(Topics.AnalyzeErrors)
 
-    @abstractmethod
     def put_analyze_error(self, item):
-        raise NotImplementedError("Please Implement this method")
+        return self.put(Topics.AnalyzeErrors, item)
 
-    @abstractmethod
     def analyze_error_size(self):
-        raise NotImplementedError("Please Implement this method")
+        return self.size(Topics.AnalyzeErrors)
 
     # -- Requestor --
-    @abstractmethod
     def get_requests(self):
-        raise NotImplementedError("Please Implement this method")
+        """
+        Get a single item from the request queue.
+        :return:
+        """
+        return self.get(Topics.Requests)
 
-    @abstractmethod
     def put_requests(self, item):
-        raise NotImplementedError("Please Implement this method")
+        return self.put(Topics.Requests, item)
 
-    @abstractmethod
     def requests_size(self):
-        raise NotImplementedError("Please Implement this method")
+        return self.size(Topics.Requests)
 
-    @abstractmethod
     def get_requests_error(self):
-        raise NotImplementedError("Please Implement this method")
+        return self.get(Topics.RequestErrors)
 
-    @abstractmethod
     def put_requests_error(self, item):
-        raise NotImplementedError("Please Implement this method")
+        return self.put(Topics.RequestErrors, item)
 
-    @abstractmethod
     def requests_error_size(self):
-        raise NotImplementedError("Please Implement this method")
+        return self.size(Topics.RequestErrors)
 
     # -- Publish --
-    @abstractmethod
     def get_publish(self):
-        raise NotImplementedError("Please Implement this method")
+        return self.get(Topics.Publish)
 
-    @abstractmethod
     def put_publish(self, item):
-        raise NotImplementedError("Please Implement this method")
+        return self.put(Topics.Publish, item)
 
-    @abstractmethod
     def publish_size(self):
-        raise NotImplementedError("Please Implement this method")
+        return self.size(Topics.Publish)
 
-    @abstractmethod
     def get_publish_error(self):
-        raise NotImplementedError("Please Implement this method")
+        return self.get(Topics.PublishErrors)
 
-    @abstractmethod
     def put_publish_error(self, item):
-        raise NotImplementedError("Please Implement this method")
+        return self.put(Topics.PublishErrors, item)
 
-    @abstractmethod
     def publish_error_size(self):
-        raise NotImplementedError("Please Implement this method")
+        return self.size(Topics.PublishErrors)
 
 
 class MemQueue(BaseQueue):
@@ -141,144 +411,63 @@ class MemQueue(BaseQueue):
     that it is not persistent. Good for tests.
     """
 
-    def __init__(self):
+    def __init__(self, limits=None):
+        """
+        :param limits: per topic limits, a dict of topic name to `Topic` keyword
+                       arguments. Defaults to TOPIC_LIMITS.
+        """
+        self.limits = TOPIC_LIMITS if limits is None else limits
         self.data = {
-            "topics": {
-                "frozen-50": Queue(), # red and write in 50ms intervals
-                "frozen-250": Queue(),  # read and write in 250ms intervals
-                "frozen-500": Queue(),  # read and write in 500ms intervals
-                "frozen-1000": Queue(),  # read and write in 1000ms (1s) intervals
-                "analyze": Queue(),
-                "analyze-errors": Queue(),
-                "requests": Queue(),
-                "request-errors": Queue(),
-                "publish": Queue(),
-                "publish-errors": Queue()
-            },
+            "topics": {},
             "metrics": {}
         }
 
-        # aliases for the data dict above
-        # frozen queues
-        self.frozen_50 = self.data["topics"]["frozen-50"]
-        self.frozen_250 = self.data["topics"]["frozen-250"]
-        self.frozen_500 = self.data["topics"]["frozen-500"]
-        self.frozen_1000 = self.data["topics"]["frozen-1000"]
-
-        self.analyze = self.data["topics"]["analyze"]
-        self.analyze_errors = self.data["topics"]["analyze-errors"]
-        self.requests = self.data["topics"]["requests"]
-        self.request_errors = self.data["topics"]["request-errors"]
-        self.publish = self.data["topics"]["publish"]
-        self.publish_errors = self.data["topics"]["publish-errors"]
-
-    # -- Frozen 50 Queue --
-    def get_frozen_50(self):
-        return self.frozen_50.get()
-
-    def put_frozen_50(self, item):
-        self.frozen_50.put(item)
-        return self.frozen_50.qsize()
-
-    def frozen_50_size(self):
-        return self.frozen_50.qsize()
-
-    # -- Frozen 250 Queue --
-    def get_frozen_250(self):
-        return self.frozen_250.get()
-
-    def put_frozen_250(self, item):
-        self.frozen_250.put(item)
-        return self.frozen_250.qsize()
-
-    def frozen_250_size(self):
-        return self.frozen_250.qsize()
-
-    # -- Frozen 500 Queue --
-    def get_frozen_500(self):
-        return self.frozen_500.get()
-
-    def put_frozen_500(self, item):
-        self.frozen_500.put(item)
-        return self.frozen_500.qsize()
-
-    def frozen_500_size(self):
-        return self.frozen_500.qsize()
-
-    # -- Frozen 1000 Queue --
-    def get_frozen_1000(self):
-        return self.frozen_1000.get()
-
-    def put_frozen_1000(self, item):
-        self.frozen_1000.put(item)
-        return self.frozen_1000.qsize()
-
-    def frozen_1000_size(self):
-        return self.frozen_1000.qsize()
-
-    # -- Analyzer --
-    def get_analyze(self):
-        return self.analyze.get()
-
-    def put_analyze(self, item):
-        self.analyze.put(item)
-        return self.analyze.qsize()
-
-    def analyze_size(self):
-        return self.analyze.qsize()
-
-    def get_analyze_error(self):
-        return self.analyze_errors.get()
+        # alias for the data dict above
+        self.topics = self.data["topics"]
 
-    def put_analyze_error(self, item):
-        self.analyze_errors.put(item)
-        return self.analyze_errors.qsize()
+        # resources waiting on an interval or reset window
+        self.register_topic(Topics.Frozen, DelayQueue(Topics.Frozen))
 
-    def analyze_error_size(self):
-        return self.analyze_errors.qsize()
+        for name in [Topics.Analyze, Topics.AnalyzeErrors,
+                     Topics.Requests, Topics.RequestErrors,
+                     Topics.Publish, Topics.PublishErrors,
+                     Topics.Results, Topics.Events]:
+            self.register_topic(name)
 
-    # -- Requestor --
-    def get_requests(self):
+    def register_topic(self, name, topic=None):
         """
-        Get a single item from the request queue.
-        :return:
+        Registers a topic, by default a FIFO `Topic` bounded by the configured limits.
+        :param name:
+        :param topic: an object with the `Topic` interface
+        :return: the registered topic
         """
-        return self.requests.get()
-
-    def put_requests(self, item):
-        self.requests.put(item)
-        return self.requests.qsize()
-
-    def requests_size(self):
-        return self.requests.qsize()
+        if topic is None:
+            topic = Topic(name, **self.limits.get(name, {}))
 
-    def get_requests_error(self):
-        return self.request_errors.get()
+        self.topics[name] = topic
+        return topic
 
-    def put_requests_error(self, item):
-        self.request_errors.put(item)
-        return self.request_errors.qsize()
+    def put(self, topic, item):
+        return self.topics[topic].put(item)
 
-    def requests_error_size(self):
-        return self.request_errors.qsize()
+    def put_many(self, topic, items):
+        return self.topics[topic].put_many(items)
 
-    # -- Publish --
-    def get_publish(self):
-        return self.publish.get()
+    def get(self, topic, block=True, timeout=None):
+        return self.topics[topic].get(block, timeout)
 
-    def put_publish(self, item):
-        self.publish.put(item)
-        return self.publish.qsize()
+    def get_batch(self, topic, max_items, timeout=None):
+        return self.topics[topic].get_batch(max_items, timeout)
 
-    def publish_size(self):
-        return self.publish.qsize()
+    def size(self, topic):
+        return self.topics[topic].qsize()
 
-    def get_publish_error(self):
-        return self.publish_errors.get()
+    def is_overloaded(self, topic):
+        return self.topics[topic].is_overloaded()
 
-    def put_publish_error(self, item):
-        self.publish_errors.put(item)
-        return self.publish_errors.qsize()
+    def wait_for_capacity(self, topic, timeout=None):
+        return self.topics[topic].wait_for_capacity(timeout)
 
-    def publish_error_size(self):
-        return self.publish_errors.qsize()
+    # -- Frozen (delay) Queue --
+    def put_frozen(self, item, deadline):
+        return self.topics[Topics.Frozen].put(item, deadline)
@@ -0,0 +1,139 @@
+from v2.data.index import resource_credential, resource_host
+
+__author__ = 'jason'
+
+
+def rate_limit_key(resource):
+    """
+    Resources sending the same credential share its rate limit, anonymous
+    resources share the limit of their host. Credentials are hashed so they
+    are not kept as keys.
+    :param resource:
+    :return: the key of the rate limit the resource draws on
+    """
+    credential = resource_credential(resource)
+
+    if credential:
+        return "credential/%s" % credential
+
+    return "host/%s" % resource_host(resource)
+
+
+class RateLimitBudget(object):
+    """
+    The authoritative budget of one rate limit, a token bucket which holds the
+    requests remaining within the current reset window. Tokens are taken as
+    requests are admitted and refilled from the server's view on each response.
+    A token taken for a request which is not made is released, the next
+    response corrects the budget if the request reached the server after all.
+    Timestamps are in milliseconds.
+    """
+    def __init__(self, key):
+        self.key = key
+        self.limit = None
+        self.remaining = None  # unknown until the first response
+        self.reset_at = 0
+        self.window_start = None
+        self.requests = 0  # requests admitted within the current window
+
+    def observe(self, limit, remaining, reset_at, now):
+        """
+        Updates the budget from a response.
+        """
+        self.limit = limit
+
+        if reset_at > self.reset_at:  # a new window
+            self.remaining = remaining
+            self.reset_at = reset_at
+            self.window_start = now
+            self.requests = 0
+        else:
+            # responses may trail requests admitted since, keep the lower count
+            self.remaining = min(self.remaining, remaining)
+
+    def acquire(self, now):
+        """
+        Takes a token for a request.
+        :param now: timestamp in milliseconds
+        :return: None if the request may be made, otherwise the timestamp the budget resets
+        """
+        if self.remaining is None or now > self.reset_at:  # unknown or past window, the next response tells
+            self.requests += 1
+            return None
+
+        if self.remaining <= 0:
+            return self.reset_at + 1
+
+        self.remaining -= 1
+        self.requests += 1
+        return None
+
+    def release(self, now):
+        """
+        Gives back a token taken by `acquire()` for a request which was shed or failed.
+        :param now: timestamp in milliseconds
+        """
+        self.requests = max(self.requests - 1, 0)
+
+        if self.remaining is None or now > self.reset_at:  # no token was taken
+            return
+
+        self.remaining += 1
+
+        if self.limit is not None:
+            self.remaining = min(self.remaining, self.limit)
+
+    def request_rate(self, now):
+        """
+        :param now: timestamp in milliseconds
+        :return: requests per second within the current window
+        """
+        if self.window_start is None or now <= self.window_start:
+            return 0.0
+
+        return self.requests * 1000.0 / (now - self.window_start)
+
+
+class RateLimitRegistry(object):
+    """
+    Rate limit budgets shared by the resources which draw on them, keyed by
+    `key_fx` (see `rate_limit_key`). Every response updates the budget, and a
+    resource is only requested when its budget has a token left.
+    """
+    def __init__(self, key_fx=rate_limit_key):
+        self.key_fx = key_fx
+        self.budgets = {}
+
+    def get_budget(self, resource):
+        key = self.key_fx(resource)
+        budget = self.budgets.get(key)
+
+        if budget is None:
+            budget = self.budgets[key] = RateLimitBudget(key)
+
+        return budget
+
+    def observe(self, resource, now):
+        """
+        Updates the resource's budget from its timings, call once they were
+        updated from a response.
+        """
+        timings = resource.timings
+        self.get_budget(resource).observe(timings.rate_limit, timings.rate_limit_remaining,
+                                          timings.time_to_reset, now)
+
+    def acquire(self, resource, now):
+        """
+        :param resource:
+        :param now: timestamp in milliseconds
+        :return: None if the resource may be requested, otherwise the timestamp its budget resets
+        """
+        return self.get_budget(resource).acquire(now)
+
+    def release(self, resource, now):
+        """
+        Gives back the token acquired for a resource which was not requested.
+        :param resource:
+        :param now: timestamp in milliseconds
+        """
+        self.get_budget(resource).release(now)
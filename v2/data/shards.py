@@ -0,0 +1,31 @@
+import zlib
+
+__author__ = 'jason'
+
+
+def shard_of(key, count):
+    """
+    Stable across processes and runs, unlike `hash()`.
+    :param key: resource key, its uri
+    :param count: number of shards
+    :return: the index of the shard which owns the key
+    """
+    if isinstance(key, unicode):
+        key = key.encode("utf-8")
+
+    return (zlib.crc32(key) & 0xffffffff) % count
+
+
+class Shard(object):
+    """
+    One of `count` shards of the resources, by the crc32 of their key.
+    """
+    def __init__(self, index, count):
+        self.index = index
+        self.count = count
+
+    def owns(self, key):
+        return shard_of(key, self.count) == self.index
+
+    def __repr__(self):
+        return '{"shard":{"index":%d,"count":%d}}' % (self.index, self.count)
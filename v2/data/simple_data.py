@@ -4,7 +4,7 @@ import inspect
 
 class ServiceMetaData:
     def __init__(self, alias, delay=0, retries=-1, retry_delay_fx=no_delay,
-                 start_timeout=0, recovery_enabled=False):
+                 start_timeout=0, recovery_enabled=False, depends_on=None):
         """
 
         :param alias: service name also known as alias
@@ -23,6 +23,8 @@ class ServiceMetaData:
                                  This allows quick modification to the service if in prod
                                  without modifying the retry count (i.e. an external
                                  service which is relied upon is down temporarily).
+        :param depends_on: aliases of the services which must have started before this one first
+                           starts, this service is also registered once they are in the directory.
         :return:
         """
         # base info
@@ -35,9 +37,11 @@ class ServiceMetaData:
 
         self.recovery_enabled = recovery_enabled  # if the service is allowed to recover
         self.start_timeout = start_timeout  # the amount of time to wait for the service to start
+        self.depends_on = list(depends_on or [])  # aliases of services to start first
 
         # runtime info
         self.starts = 0
+        self.time_to_ready = None  # seconds from boot (or being added) to first started
         self.exceptions = []
         self.failed = False  # this might not be in sync with service state, thus might not be useful at all
 
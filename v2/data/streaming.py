@@ -0,0 +1,166 @@
+import re
+
+from v2.data.payload import Payload
+
+__author__ = 'jason'
+
+STRUCTURE = re.compile(r'["\[\]{},]')  # characters which change the parser state outside strings
+STRING_END = re.compile(r'["\\]')  # characters which change the parser state within strings
+
+
+class JsonArrayStream(object):
+    """
+    Incremental parser for a JSON array which arrives in chunks, such as a page
+    of events. Each element is yielded as soon as its closing delimiter
+    arrives, as a `Payload` of its raw text, so memory is bounded by the chunk
+    and the element being read rather than by the whole body.
+
+    Elements are only split, not validated, malformed JSON surfaces when a
+    payload's data is read. A body which is not an array is buffered and
+    yielded whole on `close()`.
+    """
+    def __init__(self, decoder):
+        self.decoder = decoder
+        self.buffer = []  # pieces of the element being read
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False  # an escape ended the last chunk
+        self.started = False
+        self.document = False  # not an array, buffering the whole body
+        self.done = False
+
+    def _element(self, piece):
+        self.buffer.append(piece)
+        text = "".join(self.buffer).strip()
+        self.buffer = []
+
+        if text:
+            return Payload(text, self.decoder)
+
+        return None
+
+    def _start(self, chunk):
+        """
+        :return: the index after the opening bracket, None if the chunk is only whitespace
+        """
+        stripped = chunk.lstrip()
+
+        if not stripped:
+            return None
+
+        self.started = True
+
+        if stripped[0] != "[":
+            self.document = True
+            return 0
+
+        self.depth = 1
+        return len(chunk) - len(stripped) + 1
+
+    def feed(self, chunk):
+        """
+        :param chunk: the next chunk of the body
+        :return: list of Payload, the elements completed by the chunk
+        """
+        if self.done:
+            return []
+
+        i = 0
+
+        if not self.started:
+            i = self._start(chunk)
+
+            if i is None:
+                return []
+
+        if self.document:
+            self.buffer.append(chunk[i:])
+            return []
+
+        elements = []
+        start = i
+        end = len(chunk)
+
+        if self.escaped:
+            i += 1
+            self.escaped = False
+
+        while i < end:
+            if self.in_string:
+                match = STRING_END.search(chunk, i)
+
+                if match is None:
+                    break
+
+                i = match.end()
+
+                if match.group() == "\\":
+                    if i == end:
+                        self.escaped = True
+
+                    i += 1
+                else:
+                    self.in_string = False
+
+                continue
+
+            match = STRUCTURE.search(chunk, i)
+
+            if match is None:
+                break
+
+            c = match.group()
+            i = match.end()
+
+            if c == '"':
+                self.in_string = True
+            elif c == "[" or c == "{":
+                self.depth += 1
+            elif c == "]" or c == "}":
+                self.depth -= 1
+
+                if self.depth == 0:  # end of the array
+                    element = self._element(chunk[start:i - 1])
+
+                    if element is not None:
+                        elements.append(element)
+
+                    self.done = True
+                    return elements
+            elif self.depth == 1:  # a comma between elements
+                element = self._element(chunk[start:i - 1])
+
+                if element is not None:
+                    elements.append(element)
+
+                start = i
+
+        self.buffer.append(chunk[start:])
+        return elements
+
+    def close(self):
+        """
+        :return: list of Payload, the whole body if it was not an array
+        """
+        if self.document:
+            element = self._element("")
+            return [] if element is None else [element]
+
+        if self.started and not self.done:
+            raise ValueError("JSON array ended before its closing bracket.")
+
+        return []
+
+
+class StreamedResponse(object):
+    """
+    Stands in for a response whose body was streamed as events, only the
+    status and headers remain for the publish stage.
+    """
+    def __init__(self, response, events, size):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = response.url
+        self.content = None  # consumed by the stream
+        self.events = events
+        self.size = size
@@ -1,16 +1,21 @@
 from v2.utils import timeutils
 from v2.data.states import ResourceStates
 
-from uuid import uuid4
+from uuid import UUID, uuid4
 
 __author__ = 'jason'
 
 
-class ResourceHeaders:
+class ResourceHeaders(object):
     """
     Resource Headers is the mapping for request headers which the resource
     will use to parse the response with.
+    Nearly every resource uses the same mapping, resources share one instance
+    per distinct mapping (see `intern_headers()`) so treat them as read-only.
     """
+    __slots__ = ("interval", "rate_limit", "rate_limit_remaining", "time_to_reset", "etag",
+                 "cache_control", "last_modified", "ifnonmatch", "ifmodifiedsince")
+
     def __init__(self,
                  interval='X-Poll-Interval',
                  limit='X-RateLimit-Limit',
@@ -24,17 +29,67 @@ class ResourceHeaders:
         self.cache_control = 'Cache-Control'
         self.last_modified = 'Last-Modified'
         self.ifnonmatch = 'If-None-Match'
+        self.ifmodifiedsince = 'If-Modified-Since'
+
+    def to_dict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    @staticmethod
+    def from_dict(values):
+        headers = ResourceHeaders()
+
+        for name, value in values.iteritems():
+            setattr(headers, name, value)
+
+        return headers
+
+    def key(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+
+# flyweights shared by resources, see `intern_headers()` and `intern_send_headers()`
+_headers = {}
+_send_headers = {}
+
+
+def intern_headers(headers=None):
+    """
+    :param headers: a ResourceHeaders, None for the default mapping
+    :return: the shared ResourceHeaders equal to `headers`
+    """
+    if headers is None:
+        headers = ResourceHeaders()
 
+    return _headers.setdefault(headers.key(), headers)
 
-class Resource:
+
+def intern_send_headers(send_headers=None):
+    """
+    Resources sending the same headers (such as the same credential) share one
+    profile, read-only as the requestor copies it per request.
+    :param send_headers: dict of headers
+    :return: the shared dict equal to `send_headers`
+    """
+    if not send_headers:
+        send_headers = {}
+
+    return _send_headers.setdefault(frozenset(send_headers.iteritems()), send_headers)
+
+
+class Resource(object):
     """
     Basic structure representing a resource.
+    Slotted and sharing its header mappings so that millions of resources fit
+    in one process. The id is kept as an int and `unique_name` is computed when
+    asked for.
     """
+    __slots__ = ("uri", "id_int", "timings", "headers", "send_headers", "owner", "queue_topic", "json", "state")
+
     def __init__(self,
                  uri,
                  timings,
-                 headers=ResourceHeaders(),
-                 send_headers={},
+                 headers=None,
+                 send_headers=None,
                  owner="",
                  json=False
                  ):
@@ -48,18 +103,19 @@ class Resource:
                         initial setting is set manually but then updated as
                         requests are received.
         :param send_headers: these are the headers that are required for any
-                             specific request such as API Keys.
+                             specific request such as API Keys. Treated as read-only,
+                             per request headers are added to a copy by the requestor.
+                             Shared with resources sending the same headers.
         :param owner:
         :param json: set to True if expecting JSON content, will allow downstream
                      parsing.
         :return:
         """
         self.uri = uri
-        self.id = uuid4()  # unique id representing the resource
-        self.unique_name = '/%s/%s' % (self.id, self.uri)
+        self.id_int = uuid4().int  # unique id representing the resource, as an int for maps and logs
         self.timings = timings
-        self.headers = headers
-        self.send_headers = send_headers
+        self.headers = intern_headers(headers)
+        self.send_headers = intern_send_headers(send_headers)
 
         # a string representing the guid of an
         # owner which is working on the resource
@@ -73,6 +129,21 @@ class Resource:
         self.state = ResourceStates.Idle
         # self.reload = False  # this needs more work
 
+    @property
+    def id(self):
+        """
+        The id as a UUID, built on each access, key maps and logs on `id_int` instead.
+        """
+        return UUID(int=self.id_int)
+
+    @id.setter
+    def id(self, value):
+        self.id_int = value.int
+
+    @property
+    def unique_name(self):
+        return '/%s/%s' % (self.id, self.uri)
+
     def is_json(self):
         return self.json
 
@@ -95,7 +166,7 @@ class Resource:
         return '{"resource":{"id":"%s","uri":"%s"}}' % (self.id, self.uri)
 
 
-class ResourceTimings:
+class ResourceTimings(object):
     """
     Structure to hold current request timings.
     Though external APIs may deal with second resolution, internally
@@ -103,28 +174,44 @@ class ResourceTimings:
     important timing vars:
         - interval: in milliseconds
         - time_to_reset: in milliseconds
+
+    Whenever the timings change the next eligible timestamp is precomputed
+    (see `refresh()`), so deciding if a resource may be requested is a single
+    comparison against now.
     """
+    __slots__ = ("interval", "rate_limit", "rate_limit_remaining", "time_to_reset", "etag", "last_modified",
+                 "interval_timestamp", "last_request_timestamp", "next_eligible_at", "waiting_state", "edge_error")
+
     def __init__(self,
                  interval=1000,  # interval is in milliseconds
                  rate_limit=1,
                  rate_limit_remaining=1,
                  time_to_reset=60,
-                 etag=None
+                 etag=None,
+                 last_modified=None
                  ):
         self.interval = interval
         self.rate_limit = rate_limit
         self.rate_limit_remaining = rate_limit_remaining
         self.time_to_reset = time_to_reset  # this is time to reset in milliseconds
         self.etag = etag
+        self.last_modified = last_modified
         self.interval_timestamp = None  # this is the timestamp which the next interval checkpoint would be
         self.last_request_timestamp = None
 
+        # cached decision, see refresh()
+        self.next_eligible_at = 0  # timestamp (ms) at which the resource may next be requested
+        self.waiting_state = None  # state to report while now is before next_eligible_at
+        self.edge_error = False  # timings exhibit the error edge case
+        self.refresh()
+
     @staticmethod
     def get_now():
         return timeutils.milliseconds()
 
     def update_timestamp(self):
         self.last_request_timestamp = self.get_now()
+        self.refresh()
 
     def update_interval_timestamp(self, use_now=False):
         """
@@ -138,6 +225,39 @@ class ResourceTimings:
         else:
             self.interval_timestamp = self.last_request_timestamp + self.interval
 
+        self.refresh()
+
+    def refresh(self):
+        """
+        Precomputes when this resource may next be requested and the state to
+        report until then. Must be called if timing fields are changed directly.
+
+        The interval and reset checks are strictly greater than, so a resource
+        becomes eligible 1ms after the interval timestamp or reset window.
+        The edge case (limit reached yet requested after the reset window) does
+        not depend on the clock, a request can never be recorded in the future.
+        :return:
+        """
+        limit_reached = self.rate_limit_remaining == 0
+
+        self.edge_error = limit_reached \
+            and self.last_request_timestamp is not None \
+            and self.last_request_timestamp > self.time_to_reset
+
+        eligible_at = 0  # new resources are eligible immediately
+        waiting_state = None
+
+        if self.interval_timestamp is not None:
+            eligible_at = self.interval_timestamp + 1
+            waiting_state = ResourceStates.WaitingForInterval
+
+        if limit_reached and self.time_to_reset + 1 > eligible_at:
+            eligible_at = self.time_to_reset + 1
+            waiting_state = ResourceStates.WaitingForReset
+
+        self.next_eligible_at = eligible_at
+        self.waiting_state = waiting_state
+
     def has_limit_been_reached(self):
         return self.rate_limit_remaining == 0
 
@@ -193,9 +313,43 @@ class ResourceTimings:
         self.rate_limit = get_value(header_keys.rate_limit, int)
         self.rate_limit_remaining = get_value(header_keys.rate_limit_remaining, int)
         self.time_to_reset = get_value(header_keys.time_to_reset, int) * 1000  # seconds need to convert to milliseconds
-        self.etag = get_value(header_keys.etag)
-        self.update_timestamp()
-        self.update_interval_timestamp()
+        etag = get_value(header_keys.etag)
+        last_modified = get_value(header_keys.last_modified)
+
+        # a 304 may omit the validators, those sent still hold
+        if response.status_code != 304 or etag is not None:
+            self.etag = etag
+
+        if response.status_code != 304 or last_modified is not None:
+            self.last_modified = last_modified
+
+        # same as update_timestamp() and update_interval_timestamp(), with a single refresh
+        self.last_request_timestamp = self.get_now()
+        self.interval_timestamp = self.last_request_timestamp + self.interval
+        self.refresh()
+
+    def update_rate_limit(self, response, header_keys):
+        """
+        Updates only the rate limit, from a response which carries nothing else
+        to go by, such as a 403 once the limit is spent.
+        :return: True if the response carried the rate limit
+        """
+        headers = response.headers
+        remaining = headers.get(header_keys.rate_limit_remaining)
+
+        if remaining is None:
+            return False
+
+        self.rate_limit_remaining = int(remaining)
+
+        if headers.get(header_keys.rate_limit) is not None:
+            self.rate_limit = int(headers.get(header_keys.rate_limit))
+
+        if headers.get(header_keys.time_to_reset) is not None:
+            self.time_to_reset = int(headers.get(header_keys.time_to_reset)) * 1000  # seconds to milliseconds
+
+        self.refresh()
+        return True
 
     @staticmethod
     def get_header_value(headers, header_key, key_type=str):
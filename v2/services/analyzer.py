@@ -1,7 +1,9 @@
 # Lib
-from v2.data.processors.resource import ResourceAnalyzer, ResourceStates
-from v2.data.processors.timing_sorter import ResourceTimingSorter
+from v2.data.processors.resource import ResourceAnalyzer
+from v2.data.processors.batch_analyzer import BatchResourceAnalyzer
+from v2.data.queue import OverloadPolicies, Topics
 from v2.services.services import BaseService
+from v2.utils import timeutils
 
 # System
 import gevent
@@ -18,35 +20,97 @@ class AnalyzerService(BaseService):
 
     By this nature this service uses the BaseService class which
     within itself composities a greenlet.
+
+    The analyze topic is drained in batches of up to `batch_size` and each
+    class of result is routed in bulk. When NumPy is installed a batch is
+    classified in one vectorized pass (see `BatchResourceAnalyzer`) over the
+    timings `ResourceTimings.refresh()` precomputed. Batches smaller than
+    `batch_threshold` use the scalar analyzer, below it gathering the table
+    costs more than it saves.
+
+    When the request topic is above its high watermark the service applies its
+    `overload_policy`: `OverloadPolicies.Block` waits for the requestors to drain
+    it, `OverloadPolicies.Shed` freezes the requestable resources for `shed_delay`
+    milliseconds and moves on.
+
+    With a `RateLimitService` in the directory each requestable resource takes
+    a token from the budget it shares with its siblings, a resource whose budget
+    is spent is frozen until the budget resets. Tokens are only taken once the
+    request topic admitted the batch, a shed batch keeps its budget.
     """
-    def __init__(self, name, parent_logger=None, enable_service_recovery=False):
+    def __init__(self, name, parent_logger=None, enable_service_recovery=False,
+                 batch_size=1000, batch_threshold=128, overload_policy=OverloadPolicies.Block, shed_delay=1000):
         BaseService.__init__(self, name, parent_logger=parent_logger, enable_service_recovery=enable_service_recovery)
         self.analyzer = ResourceAnalyzer("resource-analyzer", parent_logger=self.log)
-        self.timing_sorter = ResourceTimingSorter("timing-sorter", parent_logger=self.log)
+        self.batch_analyzer = None
+        self.batch_size = batch_size
+        self.batch_threshold = batch_threshold
+        self.overload_policy = overload_policy
+        self.shed_delay = shed_delay
         self.queue = None
+        self.rate_limits = None
+
+        if BatchResourceAnalyzer.available():
+            self.batch_analyzer = BatchResourceAnalyzer("batch-resource-analyzer", parent_logger=self.log)
 
     def register(self):
         self.queue = self.get_directory_service_proxy().get_service("queue-service")
+        self.rate_limits = self.get_directory_service_proxy().find_service("rate-limit-service")
+
+    def get_resources(self):
+        """
+        Blocks until resources are available to analyze.
+        :return: list of resources
+        """
+        return self.queue.get_batch(Topics.Analyze, self.batch_size)
+
+    def _acquire_budgets(self, requestable, waiting, now):
+        admitted = []
+        deferred = []
+
+        for resource in requestable:
+            reset_at = self.rate_limits.acquire(resource, now)
+
+            if reset_at is None:
+                admitted.append(resource)
+            else:
+                deferred.append((resource, reset_at))
 
-    def _analyze_resource(self, resource):
-        # dirs = self.get_directory_service_proxy()
-        can_request, possible_state = self.analyzer.can_request(resource)
-        if can_request:
-            size = self.queue.put_requests(resource)
-            self.log.debug("resource put on request queue, size: [%d]" % size)
-        else:  # can't request because something is wrong or not ready
-            # Optimization: check the state and if the state is interval time related
-            # put the resource on the appropriate frozen queue. This will prevent
-            # a high resolution event loop from always evaluating resources that are
-            # known to not be ready until the far future
-            # If a resource cannot be requested it is either waiting for a time vector,
-            # or is in an error state. Time in this case is a vector because it's is an
-            # interval (interval delta, or reset window delta)
-            if possible_state in [ResourceStates.WaitingForReset, ResourceStates.WaitingForInterval]:
-                self.timing_sorter.sort(resource, possible_state, self.queue)
-            elif possible_state in [ResourceStates.EdgeError, ResourceStates.Error, ResourceStates.HasOwner]:
-                size = self.queue.put_analyze_error(resource)
-                self.log.debug("resource put back on analyze queue, size: [%d]" % size)
+        if deferred:
+            self.log.debug("[%d] resources deferred until their shared rate limit resets" % len(deferred))
+
+        return admitted, waiting + deferred
+
+    def _analyze_batch(self, resources, now):
+        analyzer = self.analyzer
+        if self.batch_analyzer is not None and len(resources) >= self.batch_threshold:
+            analyzer = self.batch_analyzer
+
+        requestable, waiting, errored = analyzer.analyze(resources, now)
+
+        if requestable and not self.queue.admit(Topics.Requests, self.overload_policy):
+            self.log.warn("request queue overloaded, shedding resources.", shed=len(requestable),
+                          shed_delay=self.shed_delay)
+            waiting = waiting + [(resource, now + self.shed_delay) for resource in requestable]
+            requestable = []
+
+        if self.rate_limits is not None and requestable:
+            requestable, waiting = self._acquire_budgets(requestable, waiting, now)
+
+        if requestable:
+            size = self.queue.put_many(Topics.Requests, requestable)
+            self.log.debug("[%d] resources put on request queue, size: [%d]" % (len(requestable), size))
+
+        # Optimization: resources waiting on a time vector (interval delta, or reset
+        # window delta) are frozen until they are due. This will prevent a high
+        # resolution event loop from always evaluating resources that are known to
+        # not be ready until the far future.
+        for resource, deadline in waiting:
+            self.queue.put_frozen(resource, deadline)
+
+        if errored:
+            size = self.queue.put_many(Topics.AnalyzeErrors, errored)
+            self.log.debug("[%d] resources put on analyze error queue, size: [%d]" % (len(errored), size))
 
     def event_loop(self):
         """
@@ -54,16 +118,12 @@ class AnalyzerService(BaseService):
         """
 
         while self.should_loop():
-            # Don't do the below commented line, as the event loop will run fast
+            # Don't log the queue size on every loop, as the event loop will run fast
             # and will result in multiple lines being printed! Also that many of
             # log entries makes it confusing when narrowing down things. It is
             # better to tie a logging event to a logical event such as when a
-            # resource may be requested (see below `can_request` method).
-            # # don't do this -> self.log.debug("Size now: %d" % self.queue.analyzer_size())
-
-            resource = self.queue.get_analyze()  # pop from queue
-
-            if resource is not None:  # if an item exists
-                self._analyze_resource(resource)
+            # resource may be requested (see `ResourceAnalyzer.can_request`).
+            resources = self.get_resources()  # drain what is ready
+            self._analyze_batch(resources, timeutils.milliseconds())
 
             gevent.idle()
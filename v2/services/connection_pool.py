@@ -0,0 +1,114 @@
+# Lib
+
+# System
+from greplin import scales
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import requests
+
+__author__ = 'jason'
+
+
+class ConnectionPoolManager(object):
+    """
+    Sizes and instruments the connection pools of a requests Session.
+
+    Every host gets its own keep-alive pool of `pool_maxsize` connections,
+    `host_pool_sizes` overrides the size for specific hosts. With `pool_block`
+    a request waits for a free connection rather than opening a throwaway one
+    past the pool size, which churns connections (and TLS handshakes) under
+    high concurrency.
+
+    Stats, exposed through scales under `path`:
+      - reused: requests sent on an already open connection
+      - created: requests which had to open a new connection
+      - pool_wait: seconds spent waiting to check out a connection
+    """
+    reused = scales.IntStat('reused')
+    created = scales.IntStat('created')
+    pool_wait = scales.PmfStat('pool_wait')
+
+    def __init__(self, path, pool_connections=10, pool_maxsize=10, pool_block=True, host_pool_sizes=None):
+        """
+        :param path: scales path of the stats
+        :param pool_connections: number of host pools to keep
+        :param pool_maxsize: connections kept per host
+        :param pool_block: wait for a free connection when a host's pool is exhausted
+        :param host_pool_sizes: dict of host (`api.github.com`) to pool size
+        """
+        scales.init(self, path)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.host_pool_sizes = {} if host_pool_sizes is None else host_pool_sizes
+        self.pool_classes = {
+            "http": self.instrument(HTTPConnectionPool),
+            "https": self.instrument(HTTPSConnectionPool)
+        }
+
+    def instrument(self, pool_class):
+        """
+        :param pool_class: a urllib3 connection pool class
+        :return: a subclass which reports connection checkouts to this manager
+        """
+        manager = self
+
+        class InstrumentedConnectionPool(pool_class):
+            def _get_conn(self, timeout=None):
+                with manager.pool_wait.time():
+                    conn = pool_class._get_conn(self, timeout)
+
+                # connections connect lazily, and a dropped connection is closed on checkout
+                if conn.sock is None:
+                    manager.created += 1
+                else:
+                    manager.reused += 1
+
+                return conn
+
+        return InstrumentedConnectionPool
+
+    def create_adapter(self, pool_maxsize):
+        return InstrumentedHTTPAdapter(self,
+                                       pool_connections=self.pool_connections,
+                                       pool_maxsize=pool_maxsize,
+                                       pool_block=self.pool_block)
+
+    def mount(self, session):
+        adapter = self.create_adapter(self.pool_maxsize)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        for host, size in self.host_pool_sizes.iteritems():
+            adapter = self.create_adapter(size)
+            session.mount("http://%s/" % host, adapter)
+            session.mount("https://%s/" % host, adapter)
+
+        return session
+
+    def create_session(self):
+        return self.mount(requests.Session())
+
+    def reuse_ratio(self):
+        """
+        :return: fraction of requests sent on an open connection, None before any request
+        """
+        total = self.reused + self.created
+
+        if total == 0:
+            return None
+
+        return float(self.reused) / total
+
+
+class InstrumentedHTTPAdapter(HTTPAdapter):
+    """
+    An HTTPAdapter whose connection pools report to a ConnectionPoolManager.
+    """
+    def __init__(self, manager, **kwargs):
+        self.manager = manager  # set first, `HTTPAdapter.__init__` creates the pool manager
+        HTTPAdapter.__init__(self, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        HTTPAdapter.init_poolmanager(self, connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.manager.pool_classes
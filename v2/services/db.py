@@ -1,8 +1,9 @@
 # Lib
-from v2.data.db import BaseDB, MemDB
+from v2.data.db import BaseDB, MemDB, SqliteDB
 from v2.services.services import BaseService
 
 # System
+import gevent
 
 __author__ = 'jason'
 
@@ -10,10 +11,17 @@ __author__ = 'jason'
 class DBService(BaseDB, BaseService):
     """
     Database service proxy.
+    The db implementation is resolved by `resolve_db()`, override it to use
+    another store. Stores which write behind are flushed every
+    `flush_interval` seconds, and when the service stops.
     """
-    def __init__(self, name, parent_logger=None, enable_service_recovery=False):
+    def __init__(self, name, parent_logger=None, enable_service_recovery=False, flush_interval=1):
         BaseService.__init__(self, name, parent_logger=parent_logger, enable_service_recovery=enable_service_recovery)
-        self.db = MemDB()  # db implementation
+        self.flush_interval = flush_interval
+        self.db = self.resolve_db()  # db implementation
+
+    def resolve_db(self):
+        return MemDB()
 
     # below methods are proxies to the db interface
     def save_resource_with_key(self, resource, key):
@@ -31,5 +39,68 @@ class DBService(BaseDB, BaseService):
     def update_resource(self, resource, key):
         return self.db.update_resource(resource, key)
 
+    def delete_resource(self, key):
+        return self.db.delete_resource(key)
+
     def resource_count(self):
         return self.db.resource_count()
+
+    def get_resources_by_deadline(self, limit=None, after=None):
+        return self.db.get_resources_by_deadline(limit, after)
+
+    def get_resources_due(self, now, limit=None):
+        return self.db.get_resources_due(now, limit)
+
+    def get_resources_by_state(self, state):
+        return self.db.get_resources_by_state(state)
+
+    def get_resources_by_host(self, host):
+        return self.db.get_resources_by_host(host)
+
+    def get_resources_by_credential(self, credential):
+        return self.db.get_resources_by_credential(credential)
+
+    def change_seq(self):
+        return self.db.change_seq()
+
+    def get_changes(self, after, limit=None):
+        return self.db.get_changes(after, limit)
+
+    def wait_for_changes(self, after, timeout=None):
+        return self.db.wait_for_changes(after, timeout)
+
+    def flush(self):
+        return self.db.flush()
+
+    def close(self):
+        return self.db.close()
+
+    def event_loop(self):
+        """
+        The event loop.
+        """
+        while self.should_loop():
+            gevent.sleep(self.flush_interval)
+
+            try:
+                written = self.flush()
+            except Exception as ex:  # such as a locked database, the resources are flushed next time
+                self.log.warn("flush failed, retrying on the next interval.", error=str(ex))
+                continue
+
+            if written > 0:
+                self.log.debug("[%d] resources flushed" % written)
+
+    def stop(self):
+        self.flush()
+        return BaseService.stop(self)
+
+
+class SqliteDBService(DBService):
+    """
+    Database service persisted to the SQLite file at `path`.
+    """
+    path = "resources.db"
+
+    def resolve_db(self):
+        return SqliteDB(self.path)
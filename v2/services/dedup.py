@@ -0,0 +1,58 @@
+# Lib
+from v2.data.processors.dedup import EventDeduplicator
+from v2.data.queue import Topics
+from v2.services.services import BaseService
+
+# System
+import gevent
+
+__author__ = 'jason'
+
+
+class EventDedupService(BaseService):
+    """
+    Consumes the results topic, pages from the response parser or single events
+    streamed by the requestor, and puts only the events not seen before for
+    their resource on the events topic as Tuple(Resource, event). Sinks then
+    work in proportion to new events rather than to page size.
+    """
+    def __init__(self, name, parent_logger=None, enable_service_recovery=False, batch_size=100, recent_size=256):
+        BaseService.__init__(self, name, parent_logger=parent_logger, enable_service_recovery=enable_service_recovery)
+        self.deduplicator = EventDeduplicator("event-deduplicator", parent_logger=self.log, recent_size=recent_size)
+        self.batch_size = batch_size
+        self.queue = None
+
+    def set_queue(self, queue):
+        self.queue = queue
+
+    def register(self):
+        self.queue = self.get_directory_service_proxy().get_service("queue-service")
+
+    def dedup(self, resource, payload):
+        """
+        :param resource:
+        :param payload: a Payload of a page (list of events) or of a single event
+        :return: list of Tuple(Resource, event) for the new events
+        """
+        events = payload.data
+
+        if not isinstance(events, list):
+            events = [events]
+
+        return [(resource, event) for event in self.deduplicator.filter(resource, events)]
+
+    def event_loop(self):
+        """
+        The event loop.
+        """
+        while self.should_loop():
+            new = []
+
+            for resource, payload in self.queue.get_batch(Topics.Results, self.batch_size):
+                new.extend(self.dedup(resource, payload))
+
+            if new:
+                size = self.queue.put_many(Topics.Events, new)
+                self.log.debug("[%d] new events put on events queue, size: [%d]" % (len(new), size))
+
+            gevent.idle()
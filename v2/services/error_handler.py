@@ -84,7 +84,7 @@ class ErrorHandlerMixin:
         return handlers
 
     def handle_error(self, exception):
-        service_meta = self.get_directory_service_proxy().get_service_meta(self.alias)
+        service_meta = self.get_meta()
 
         if service_meta is not None:
             service_meta.add_exception(exception)
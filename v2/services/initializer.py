@@ -1,6 +1,8 @@
 # Lib
+from v2.data.changes import ChangeTypes
 from v2.data.timings import ResourceTimings, Resource
 from v2.services.services import BaseService
+from v2.system.exceptions import ChangeFeedTruncatedException
 
 # System
 import gevent
@@ -29,13 +31,25 @@ def github_events_resource():
 class InitializerService(BaseService):
     """
     Put resources into a queue.
+    Follows the db change feed and registers the resources inserted or updated
+    under keys not registered yet, `page_size` changes per loop, blocking while
+    there are none. On start, or when it fell behind the feed, it resyncs by
+    registering every resource in the order they are next eligible.
+
+    Given a `Shard` only the resources it owns are registered, the others are
+    left to the workers owning them (see `MultiProcessOS`).
     """
-    def __init__(self, name, parent_logger=None, enable_service_recovery=False):
+    def __init__(self, name, parent_logger=None, enable_service_recovery=False, page_size=100, wait_timeout=None,
+                 shard=None):
         BaseService.__init__(self, name, parent_logger=parent_logger, enable_service_recovery=enable_service_recovery)
         self.current_batch = []
         self.db = None
         self.queue = None
         self.registered = {}  # simple dict cache keeping resources already registered
+        self.page_size = page_size
+        self.wait_timeout = wait_timeout  # seconds to block for changes, None for ever
+        self.seq = None  # seq of the last change consumed, None to resync
+        self.shard = shard
 
     def seed_data(self):
         self.db.save_resource(github_events_resource())
@@ -46,20 +60,63 @@ class InitializerService(BaseService):
         self.queue = self.get_directory_service_proxy().get_service("queue-service")
         self.seed_data()
 
+    def register_resource(self, res_uri, res):
+        if self.shard is not None and not self.shard.owns(res_uri):
+            return
+
+        if res_uri not in self.registered:
+            self.queue.put_analyze(res)
+            self.registered[res_uri] = res
+            self.log.info("registered new resource, id:[%s], uri:[%s], size: [%d]" % (res.id, res_uri, self.queue.analyze_size()))
+        # else:  # resource already exists
+            # if resource.reload:  # check if it needs reloading
+            #     self.registered.pop(resource.id)  # popping it will reload it next loop
+            #     self.log.debug("resource set to be reloaded, id:[%s], uri:[%s]" % (resource.id, resource.uri))
+
+    def resync(self):
+        """
+        Registers every resource not registered yet, the change feed is then
+        followed from the change it was taken at.
+        """
+        self.seq = self.db.change_seq()
+
+        for res_uri, res in self.db.get_resources_by_deadline():
+            self.register_resource(res_uri, res)
+
+        self.log.debug("resynced from the db, seq: [%d], registered: [%d]" % (self.seq, len(self.registered)))
+
+    def apply(self, change):
+        if change.type == ChangeTypes.Delete:
+            self.registered.pop(change.key, None)
+            return
+
+        res = self.db.get_resource(change.key)
+
+        if res is not None:  # else deleted since
+            self.register_resource(change.key, res)
+
     def event_loop(self):
         """
         The event loop.
         Resource reloading is disabled at the moment.
         """
         while self.should_loop():
-            for res_uri, res in self.db.get_resources():
-                if res_uri not in self.registered:
-                    self.queue.put_analyze(res)
-                    self.registered[res_uri] = res
-                    self.log.info("registered new resource, id:[%s], uri:[%s], size: [%d]" % (res.id, res_uri, self.queue.analyze_size()))
-                # else:  # resource already exists
-                    # if resource.reload:  # check if it needs reloading
-                    #     self.registered.pop(resource.id)  # popping it will reload it next loop
-                    #     self.log.debug("resource set to be reloaded, id:[%s], uri:[%s]" % (resource.id, resource.uri))
+            if self.seq is None:
+                self.resync()
+
+            try:
+                changes = self.db.get_changes(self.seq, self.page_size)
+            except ChangeFeedTruncatedException as ex:
+                self.log.warn("fell behind the change feed, resyncing. [%s]" % ex)
+                self.seq = None
+                continue
+
+            if not changes:
+                self.db.wait_for_changes(self.seq, self.wait_timeout)
+                continue
+
+            for change in changes:
+                self.apply(change)
 
+            self.seq = changes[-1].seq
             gevent.idle()
@@ -10,13 +10,12 @@ __author__ = 'jason'
 class QueueService(BaseService, BaseQueue):
     """
     Queue service proxy.
+    Only the generic topic interface is proxied, the named conveniences
+    (`put_analyze()` etc...) are inherited from BaseQueue and call into it.
     WARNING: I've more than once accidently done a copy/paste and not realize that
              was calling the method again, causing a stack trace with the dreaded
-             `RuntimeError: maximum recursion depth exceeded`. To catch further
-             instances of this see the TODO.
-    TODO: look for methods of self.put or self.get and flag on presence of them on this
-          file. This service should not have any such methods. See warning for more
-          info.
+             `RuntimeError: maximum recursion depth exceeded`. Every proxy below
+             must call `self.queue`, never `self`.
     """
 
     def __init__(self, name, parent_logger=None, enable_service_recovery=False):
@@ -24,99 +23,30 @@ class QueueService(BaseService, BaseQueue):
         self.queue = MemQueue()  # queue implementation
 
     # below methods are proxies to the queue interface
-    # -- Frozen 50 Queue --
-    def get_frozen_50(self):
-        return self.queue.get_frozen_50()
+    def register_topic(self, name, topic=None):
+        return self.queue.register_topic(name, topic)
 
-    def put_frozen_50(self, item):
-        return self.queue.put_frozen_50(item)
+    def put(self, topic, item):
+        return self.queue.put(topic, item)
 
-    def frozen_50_size(self):
-        return self.queue.frozen_50_size()
+    def put_many(self, topic, items):
+        return self.queue.put_many(topic, items)
 
-    # -- Frozen 250 Queue --
-    def get_frozen_250(self):
-        return self.queue.get_frozen_250()
+    def get(self, topic, block=True, timeout=None):
+        return self.queue.get(topic, block, timeout)
 
-    def put_frozen_250(self, item):
-        return self.queue.put_frozen_250(item)
+    def get_batch(self, topic, max_items, timeout=None):
+        return self.queue.get_batch(topic, max_items, timeout)
 
-    def frozen_250_size(self):
-        return self.queue.frozen_250_size()
+    def size(self, topic):
+        return self.queue.size(topic)
 
-    # -- Frozen 500 Queue --
-    def get_frozen_500(self):
-        return self.queue.get_frozen_500()
+    def is_overloaded(self, topic):
+        return self.queue.is_overloaded(topic)
 
-    def put_frozen_500(self, item):
-        return self.queue.put_frozen_500(item)
+    def wait_for_capacity(self, topic, timeout=None):
+        return self.queue.wait_for_capacity(topic, timeout)
 
-    def frozen_500_size(self):
-        return self.queue.frozen_500_size()
-
-    # -- Frozen 1000 Queue --
-    def get_frozen_1000(self):
-        return self.queue.get_frozen_1000()
-
-    def put_frozen_1000(self, item):
-        return self.queue.put_frozen_1000(item)
-
-    def frozen_1000_size(self):
-        return self.queue.frozen_1000_size()
-
-    # -- Analyzer --
-    def get_analyze(self):
-        return self.queue.get_analyze()
-
-    def put_analyze(self, item):
-        return self.queue.put_analyze(item)
-
-    def analyze_size(self):
-        return self.queue.analyze_size()
-
-    def get_analyze_error(self):
-        return self.queue.get_analyze_error()
-
-    def put_analyze_error(self, item):
-        return self.queue.put_analyze_error(item)
-
-    def analyze_error_size(self):
-        return self.queue.analyze_error_size()
-
-    # -- Requestor --
-    def put_requests(self, item):
-        return self.queue.put_requests(item)
-
-    def get_requests(self):
-        return self.queue.get_requests()
-
-    def requests_size(self):
-        return self.queue.requests_size()
-
-    def get_requests_error(self):
-        return self.queue.get_requests_error()
-
-    def put_requests_error(self, item):
-        return self.queue.put_requests_error(item)
-
-    def requests_error_size(self):
-        return self.queue.requests_error_size()
-
-    # -- Publish --
-    def get_publish(self):
-        return self.queue.get_publish()
-
-    def put_publish(self, item):
-        return self.queue.put_publish(item)
-
-    def publish_size(self):
-        return self.queue.publish_size()
-
-    def get_publish_error(self):
-        return self.queue.get_publish_error()
-
-    def put_publish_error(self, item):
-        return self.queue.put_publish_error(item)
-
-    def publish_error_size(self):
-        return self.queue.publish_error_size()
\ No newline at end of file
+    # -- Frozen (delay) Queue --
+    def put_frozen(self, item, deadline):
+        return self.queue.put_frozen(item, deadline)
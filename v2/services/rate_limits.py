@@ -0,0 +1,30 @@
+# Lib
+from v2.data.rate_limits import RateLimitRegistry
+from v2.services.services import BaseService
+
+# System
+
+__author__ = 'jason'
+
+
+class RateLimitService(BaseService):
+    """
+    Rate limit registry service proxy, shares one budget per credential or
+    host between the services. The analyzer acquires a token before a resource
+    is requested, the requestor releases it when the request is shed or fails,
+    and the response parser updates the budgets from responses.
+    Optional, services look it up with `find_service("rate-limit-service")`.
+    """
+
+    def __init__(self, name, parent_logger=None, enable_service_recovery=False):
+        BaseService.__init__(self, name, parent_logger=parent_logger, enable_service_recovery=enable_service_recovery)
+        self.registry = RateLimitRegistry()
+
+    def observe(self, resource, now):
+        return self.registry.observe(resource, now)
+
+    def acquire(self, resource, now):
+        return self.registry.acquire(resource, now)
+
+    def release(self, resource, now):
+        return self.registry.release(resource, now)
@@ -19,27 +19,108 @@ import requests
 # print resp.content
 
 # Lib
+from v2.data.payload import resolve_decoder
+from v2.data.queue import OverloadPolicies, Topics
+from v2.data.streaming import JsonArrayStream, StreamedResponse
+from v2.services.connection_pool import ConnectionPoolManager
 from v2.services.services import BaseService
+from v2.system.exceptions import ResponseTooLargeException
+from v2.utils import timeutils
 # from v2.data.db import MemDB
 # from v2.data.queue import MemQueue
 
 # System
 import gevent
+from gevent.event import AsyncResult
+from gevent.lock import BoundedSemaphore
+from greplin import scales
+from gevent.pool import Pool
+from collections import OrderedDict
+from urlparse import urlparse
 
 __author__ = 'jason'
 
 
+# request headers which make otherwise identical requests distinct, see `RequestorService.flight_key()`
+FLIGHT_HEADERS = ("Authorization", "If-None-Match", "If-Modified-Since")
+
+
 class RequestorService(BaseService):
     """
     Requests resources.
+
+    Up to `concurrency` requests are in flight at once, each in its own
+    greenlet from a bounded pool. `per_host_limit` optionally caps the in
+    flight requests to any one host, and `pacing` is the number of seconds to
+    wait between dispatching requests (0 dispatches as fast as the pool allows).
+
+    The session's keep-alive pools are managed by a `ConnectionPoolManager`,
+    sized to keep a connection open per in flight request unless overridden by
+    `host_pool_sizes`. Connection reuse and pool wait stats are under the
+    service's scales path at `connection-pool`.
+
+    Each resource's request is prepared once, with its URI, the session
+    defaults and the resource's `send_headers`, and cached as a template. Every
+    call sends a copy of the template with only the conditional headers added,
+    so neither the session nor the resource are mutated. Call
+    `invalidate_template()` after changing a resource's URI or send headers.
+    Up to `max_templates` templates are kept, the least recently used first
+    evicted, so resources no longer requested do not hold theirs.
+
+    Identical requests in flight at the same time (same URI, credential and
+    conditional headers, such as one feed registered by several tenants) are
+    coalesced, one network call is made and its response is shared. The
+    resources joining a request in flight give back their rate limit token.
+
+    With `stream` the body of a 200 for a JSON resource is read in chunks of
+    `chunk_size` bytes and each element of the JSON array is put on the results
+    topic as a `Payload` as soon as it arrives. A `StreamedResponse`, with only
+    the status and headers, goes on to the publish topic. Memory per request is
+    bounded by the chunk and the event being read. A body over `max_body_bytes`
+    is aborted, events already put on the results topic stay there. Streamed
+    requests are not coalesced, and there is no body to cache, so run the
+    response parser without a cache.
+
+    Responses are held on the publish topic until parsed. Before requesting,
+    the service checks the publish topic and applies its `overload_policy`:
+    `OverloadPolicies.Block` waits for the parsers to drain it,
+    `OverloadPolicies.Shed` freezes the resource for `shed_delay` milliseconds
+    without requesting it.
+
+    With a `RateLimitService` in the directory the token the analyzer took for
+    a resource is released when its request is shed or fails.
     """
-    def __init__(self, name, parent_logger=None, enable_service_recovery=False):
+    coalesced = scales.IntStat('coalesced')  # requests served by another in flight request
+
+    def __init__(self, name, parent_logger=None, enable_service_recovery=False, batch_size=None,
+                 overload_policy=OverloadPolicies.Block, shed_delay=1000,
+                 concurrency=10, per_host_limit=None, pacing=0, host_pool_sizes=None, pool_block=True,
+                 stream=False, chunk_size=16 * 1024, max_body_bytes=None, max_templates=10000):
         BaseService.__init__(self, name, parent_logger=parent_logger, enable_service_recovery=enable_service_recovery)
         self.queue = None
         self.session = None
+        self.rate_limits = None
+        self.batch_size = concurrency if batch_size is None else batch_size
+        self.overload_policy = overload_policy
+        self.shed_delay = shed_delay
+        self.pool = Pool(concurrency)
+        self.per_host_limit = per_host_limit
+        self.pacing = pacing
+        self.host_locks = {}  # host -> BoundedSemaphore, created on first request to the host
+        self.templates = OrderedDict()  # resource id_int -> PreparedRequest, least recently used first
+        self.max_templates = max_templates
+        self.in_flight = {}  # flight key -> AsyncResult of the response
+        self.connection_pool = ConnectionPoolManager("%s/connection-pool" % self.unique_name,
+                                                     pool_maxsize=per_host_limit or concurrency,
+                                                     pool_block=pool_block,
+                                                     host_pool_sizes=host_pool_sizes)
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_body_bytes = max_body_bytes
+        self.decoder = resolve_decoder()[1]
 
     def resolve_session(self):
-        return requests.Session()
+        return self.connection_pool.create_session()
 
     def set_session(self):
         self.session = self.resolve_session()
@@ -49,33 +130,199 @@ class RequestorService(BaseService):
 
     def register(self):
         self.set_queue(self.get_directory_service_proxy().get_service("queue-service"))
+        self.rate_limits = self.get_directory_service_proxy().find_service("rate-limit-service")
         self.set_session()
 
+    def get_host_lock(self, resource):
+        """
+        :param resource:
+        :return: the semaphore capping requests to the resource's host, None when uncapped
+        """
+        if self.per_host_limit is None:
+            return None
+
+        host = urlparse(resource.uri).netloc
+        lock = self.host_locks.get(host)
+
+        if lock is None:
+            lock = self.host_locks[host] = BoundedSemaphore(self.per_host_limit)
+
+        return lock
+
+    def get_template(self, resource):
+        """
+        :param resource:
+        :return: the cached request template for the resource, prepared on first use
+        """
+        template = self.templates.pop(resource.id_int, None)
+
+        if template is None:
+            request = requests.Request("GET", resource.uri, headers=resource.send_headers)
+            template = self.session.prepare_request(request)
+
+            if len(self.templates) >= self.max_templates:
+                self.templates.popitem(last=False)
+
+        self.templates[resource.id_int] = template  # most recently used
+        return template
+
+    def invalidate_template(self, resource):
+        self.templates.pop(resource.id_int, None)
+
+    def prepare(self, resource):
+        """
+        Copies the resource's template and adds the conditional headers.
+        :param resource:
+        :return: a PreparedRequest owned by this call
+        """
+        prepared = self.get_template(resource).copy()
+
+        if resource.timings.etag is not None:
+            prepared.headers[resource.headers.ifnonmatch] = resource.timings.etag
+
+        if resource.timings.last_modified is not None:
+            prepared.headers[resource.headers.ifmodifiedsince] = resource.timings.last_modified
+
+        return prepared
+
+    @staticmethod
+    def flight_key(prepared):
+        headers = prepared.headers
+        return (prepared.url,) + tuple(headers.get(name) for name in FLIGHT_HEADERS)
+
+    def send(self, resource, prepared, **kwargs):
+        lock = self.get_host_lock(resource)
+
+        if lock is None:
+            return self.session.send(prepared, **kwargs)
+
+        with lock:
+            return self.session.send(prepared, **kwargs)
+
+    def stream_events(self, resource, prepared):
+        """
+        Sends the request, streaming the events of a 200 onto the results topic.
+        :param resource:
+        :param prepared:
+        :return: a StreamedResponse for a streamed 200, otherwise the Response
+        """
+        resp = self.send(resource, prepared, stream=True)
+
+        if resp.status_code != 200 or not resource.is_json():
+            return resp  # the body is small or not events, read as usual
+
+        parser = JsonArrayStream(self.decoder)
+        size = 0
+        events = 0
+
+        try:
+            for chunk in resp.iter_content(self.chunk_size):
+                size += len(chunk)
+
+                if self.max_body_bytes is not None and size > self.max_body_bytes:
+                    raise ResponseTooLargeException(resource.uri, self.max_body_bytes)
+
+                for payload in parser.feed(chunk):
+                    self.queue.put(Topics.Results, (resource, payload))
+                    events += 1
+
+            for payload in parser.close():
+                self.queue.put(Topics.Results, (resource, payload))
+                events += 1
+        finally:
+            resp.close()
+
+        self.log.debug("response streamed.", resource_id=resource.id_int, events=events, size=size)
+        return StreamedResponse(resp, events, size)
+
+    def fetch(self, resource, prepared):
+        """
+        Sends the request, unless an identical request is in flight in which
+        case its response (or exception) is shared. A shared response releases
+        the resource's token, a shared exception releases it in `dispatch()`.
+        :param resource:
+        :param prepared:
+        :return: the Response
+        """
+        key = self.flight_key(prepared)
+        flight = self.in_flight.get(key)
+
+        if flight is not None:
+            self.coalesced += 1
+            self.log.debug("identical request in flight, sharing its response.", resource_id=resource.id_int)
+            resp = flight.get()
+            self.release_budget(resource)  # no call of its own was made
+            return resp
+
+        flight = self.in_flight[key] = AsyncResult()
+
+        try:
+            resp = self.send(resource, prepared)
+            flight.set(resp)
+            return resp
+        except Exception as ex:
+            flight.set_exception(ex)
+            raise
+        finally:
+            del self.in_flight[key]
+
+    def request(self, resource):
+        self.log.debug("found resource to request")
+
+        if self.stream:
+            resp = self.stream_events(resource, self.prepare(resource))
+        else:
+            resp = self.fetch(resource, self.prepare(resource))
+        self.log.info("request complete", status_code=resp.status_code, resource_id=resource.id_int)
+
+        # put Tuple(Resource, Response) in publish queue
+        size = self.queue.put(Topics.Publish, (resource, resp))
+        self.log.debug("resource put on publish queue for parsing, size: [%d]" % size)
+
+    def release_budget(self, resource):
+        """
+        Gives back the rate limit token taken for a resource which was not requested.
+        :param resource:
+        """
+        if self.rate_limits is not None:
+            self.rate_limits.release(resource, timeutils.milliseconds())
+
+    def dispatch(self, resource):
+        """
+        Runs within a pool greenlet. A failed request only fails its resource,
+        which is put on the request error queue, the service keeps running.
+        :param resource:
+        """
+        try:
+            self.request(resource)
+        except Exception as ex:
+            self.log.error("request failed, putting resource on request error queue.", resource_id=resource.id_int,
+                           resource_uri=resource.uri, error=str(ex))
+            self.release_budget(resource)
+            self.queue.put(Topics.RequestErrors, resource)
+
+    def stop(self):
+        self.pool.kill()
+        return BaseService.stop(self)
+
     def event_loop(self):
         """
         The event loop.
         """
         while self.should_loop():
-            resource = self.queue.get_requests()  # pop from queue
-
-            if resource is not None:  # if an item exists
-                self.log.debug("found resource to request")
-
-                # update headers
-                self.session.headers = resource.send_headers
-                self.session.headers.update({
-                    "If-None-Match": '%s' % resource.timings.etag
-                })
+            for resource in self.queue.get_batch(Topics.Requests, self.batch_size):  # pop from queue
+                if resource is None:
+                    continue
 
-                # resp = self.session.get("https://api.github.com/events")
-                resp = self.session.get(resource.uri)
-                self.log.info("request complete", status_code=resp.status_code, resource_id=str(resource.id))
-                # self.log.info(resp.headers)
-                # self.log.info(resp.content)
+                if self.queue.admit(Topics.Publish, self.overload_policy):
+                    self.pool.spawn(self.dispatch, resource)  # blocks while all pool slots are in flight
+                else:
+                    self.log.warn("publish queue overloaded, shedding resource.", resource_id=resource.id_int,
+                                  shed_delay=self.shed_delay)
+                    self.release_budget(resource)
+                    self.queue.put_frozen(resource, timeutils.milliseconds() + self.shed_delay)
 
-                # put Tuple(Resource, Response) in publish queue
-                self.queue.put_publish((resource, resp))
-                self.log.debug("resource put on publish queue for parsing, size: [%d]" % self.queue.publish_size())
+                if self.pacing > 0:
+                    gevent.sleep(self.pacing)
 
-            gevent.sleep(2)
             gevent.idle()
@@ -1,6 +1,10 @@
 # Lib
+from v2.data.cache import ResponseCache
+from v2.data.processors.offload import ParseExecutor
 from v2.data.processors.response_parser import ResponseParser
+from v2.data.queue import Topics
 from v2.services.services import BaseService
+from v2.utils import timeutils
 
 # System
 import gevent
@@ -9,11 +13,46 @@ __author__ = 'jason'
 
 
 class ResponseParserService(BaseService):
-    def __init__(self, name, parent_logger=None, enable_service_recovery=False):
+    """
+    Parses published responses and puts their resources back for analysis.
+    Each wakeup drains what is ready on the publish topic, up to `batch_size`,
+    and blocks on the topic while it is empty.
+    With `cache_bytes` the bodies of the last responses carrying an ETag or a
+    Last-Modified are cached, up to that many bytes compressed, so 304s can be
+    served the unchanged body. The cache is off by default (`cache_bytes=None`),
+    turn it on only when something reads the body of a 304. With a `RateLimitService` in
+    the directory every response which tells the rate limit, errors such as a
+    403 included, updates the resource's shared budget.
+
+    With `publish_results` every result is put on the results topic as a
+    Tuple(Resource, Payload), undecoded until the consumer reads its data.
+    Leave it off unless something consumes the results topic.
+
+    With an `execution_mode` (see `ExecutionModes`) the bodies of a batch are
+    compressed for the cache as one task in a pool of `executor_size` threads,
+    zlib releases the GIL so the hub keeps scheduling the other services
+    meanwhile. Published results are still decoded on the hub, lazily when a
+    consumer reads them, as decoding holds the GIL even in a thread.
+    """
+    def __init__(self, name, parent_logger=None, enable_service_recovery=False, batch_size=100,
+                 cache_bytes=None, publish_results=False,
+                 execution_mode=None, executor_size=2):
+        """
+        :param publish_results: put every result on the results topic, off by default. Turn it on
+                                along with an `EventDedupService`, which consumes the results topic,
+                                `app.py` drives both with its `publish_events` flag (`EVENTS=1`).
+        """
         BaseService.__init__(self, name, parent_logger=parent_logger, enable_service_recovery=enable_service_recovery)
-        self.response_parser = ResponseParser("response-parser", parent_logger=self.log)
+        self.cache = None if cache_bytes is None else ResponseCache(max_bytes=cache_bytes)
+        self.response_parser = ResponseParser("response-parser", parent_logger=self.log, cache=self.cache,
+                                              publish=self.publish_result if publish_results else None)
         self.db = None
         self.queue = None
+        self.rate_limits = None
+        self.batch_size = batch_size
+        self.execution_mode = execution_mode
+        self.executor_size = executor_size
+        self.executor = None  # created on first use, see `get_executor()`
 
     def set_queue(self, queue):
         self.queue = queue
@@ -21,28 +60,88 @@ class ResponseParserService(BaseService):
     def register(self):
         self.db = self.get_directory_service_proxy().get_service("database-service")
         self.queue = self.get_directory_service_proxy().get_service("queue-service")
+        self.rate_limits = self.get_directory_service_proxy().find_service("rate-limit-service")
+
+    def publish_result(self, resource, payload):
+        self.queue.put(Topics.Results, (resource, payload))
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = ParseExecutor(self.execution_mode, self.executor_size)
+
+        return self.executor
+
+    def digest(self, batch):
+        """
+        Offloads compressing the bodies of the batch's cacheable 200s to the executor.
+        :param batch: list of Tuple(Resource, Response)
+        :return: list of BodyDigest or None, one per item
+        """
+        digests = [None] * len(batch)
+        compress_level = None if self.cache is None else self.cache.compress_level
+
+        if self.execution_mode is None or compress_level is None:
+            return digests
+
+        offloaded = [i for i, (resource, response) in enumerate(batch)
+                     if resource is not None and response is not None
+                     and response.status_code == 200 and response.content is not None
+                     and self.response_parser.validated(response, resource)]
+
+        if not offloaded:
+            return digests
+
+        bodies = [batch[i][1].content for i in offloaded]
+
+        for i, digest in zip(offloaded, self.get_executor().digest(bodies, compress_level)):
+            digests[i] = digest
+
+        return digests
+
+    def parse(self, resource, response, digest=None):
+        """
+        Parses a single publish item.
+        :return: True if the resource should go back to analysis
+        """
+        if resource is not None and response is not None:  # if an item exists
+            self.log.debug("found resource, parsing...")
+            parsed = self.response_parser.parse(response, resource, digest)
+
+            if self.rate_limits is not None and self.response_parser.carries_rate_limit(response, resource):
+                self.rate_limits.observe(resource, timeutils.milliseconds())
+
+            if self.db is not None:  # timings changed, persisted on the db's next flush
+                self.db.update_resource(resource, resource.uri)
+
+            return parsed
+
+        # serious error if we got here
+        # log the error and put on the publish error queue
+        error_msg = "Found either resource or response that was None, resource: [%s], response: [%s]"
+        self.log.error(error_msg % (resource, response))
+        size = self.queue.put(Topics.PublishErrors, (resource, response))
+        self.log.error("resource put on publish error queue, size: [%d]" % size)
+        return False
 
     def event_loop(self):
         """
         The event loop.
         """
         while self.should_loop():
-            resource, response = self.queue.get_publish()  # pop from queue
-
-            if resource is not None and response is not None:  # if an item exists
-                self.log.debug("found resource, parsing...")
-                parse_success = self.response_parser.parse(response, resource)
-                if parse_success:
-                    self.queue.put_analyze(resource)
-                    self.log.debug("resource id:[%s] parsed, and put on analyze queue for analysis, size: [%d]" %
-                                   (str(resource.id), self.queue.analyze_size()))
-            else:  # serious error if we got here
-                # log the error and put on the publish error queue
-                error_msg = "Found either resource or response that was None, resource: [%s], response: [%s]"
-                self.log.error(error_msg % (resource, response))
-                self.queue.put_publish_error((resource, response))
-                self.log.error("resource put on publish error queue, size: [%d]" %
-                               self.queue.get_publish_error())
-
-            gevent.sleep(2)
+            batch = self.queue.get_batch(Topics.Publish, self.batch_size)  # blocks until a response is published
+            parsed = [resource for (resource, response), digest in zip(batch, self.digest(batch))
+                      if self.parse(resource, response, digest)]
+
+            if parsed:
+                size = self.queue.put_many(Topics.Analyze, parsed)
+                self.log.debug("[%d] resources parsed, and put on analyze queue for analysis, size: [%d]" %
+                               (len(parsed), size))
+
             gevent.idle()
+
+    def stop(self):
+        if self.executor is not None:
+            self.executor.close()
+            self.executor = None
+
+        return BaseService.stop(self)
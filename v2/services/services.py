@@ -71,6 +71,9 @@ class BaseService(ErrorHandlerMixin):
 
         self.log = Logger.get_logger(self.lineage)
         self.greenlet = None
+        self.start_timer = None  # pending delayed start, see `start()`
+        self.handle = None  # cached directory handle, see `get_directory_handle()`
+        self.started_listeners = []  # called with the service whenever it has started
         self._service_state = None
         self.set_state(BaseStates.Idle)
 
@@ -120,20 +123,13 @@ class BaseService(ErrorHandlerMixin):
         A timeout occurs when a service remains in the starting phase.
         :return:
         """
-        timeout = self.get_directory_service_proxy().get_service_meta(self.alias).start_timeout
-
-        if timeout > 0 and self.is_starting():
-            delay = self.get_directory_service_proxy().get_service_meta(self.alias).delay
-            timeout = self.get_directory_service_proxy().get_service_meta(self.alias).start_timeout
+        meta = self.get_meta()
 
+        if meta.start_timeout > 0 and self.is_starting():
             # calculate by adding the delay that will be introduced
             # with the timeout value, and this time index will be the maximum time
             # which with to wait for the service to start
-            expected_timeout = delay + timeout
-
-            # now determine if the time that has passed has met or exceeded the
-            # calculated timeout index from above
-            return self.start_time_delta() >= expected_timeout
+            return self.start_time_delta() >= meta.delay + meta.start_timeout
 
         return False
 
@@ -157,6 +153,13 @@ class BaseService(ErrorHandlerMixin):
         """
         pass
 
+    def add_started_listener(self, listener):
+        """
+        :param listener: called with this service each time it enters the `Started` state, keep it short
+        :return:
+        """
+        self.started_listeners.append(listener)
+
     def post_handle_error(self, exception=None):
         """
         Triggered after error handlers have run.
@@ -171,6 +174,9 @@ class BaseService(ErrorHandlerMixin):
         self.set_state(BaseStates.Started)
         self.time_started_index = time.time()
 
+        for listener in self.started_listeners:
+            listener(self)
+
         # self.event_loop()
 
         try:
@@ -179,7 +185,12 @@ class BaseService(ErrorHandlerMixin):
             self.handle_error(ex)
             self.post_handle_error(ex)  # a built-in method which signals the post event of handling errors
 
-    def start(self, meta=None):
+    def start(self, meta=None, timers=None):
+        """
+        :param meta: the service metadata, for the start delay
+        :param timers: a TimerWheel to hold a delayed start, if None the start is a greenlet spawned later
+        :return: the greenlet, not started yet if delayed on the timers
+        """
         if self.get_state() is not BaseStates.Idle:  # or not self.enable_service_recovery:
             self.log.error("could not start service as it is not in an idle state, current state: [%s]" %
                            self.get_state(), state=self.get_state())
@@ -197,7 +208,13 @@ class BaseService(ErrorHandlerMixin):
                 delay = meta.next_delay()
 
             self.time_starting_index = time.time()
-            self.greenlet = gevent.spawn_later(delay, self.start_event_loop)
+
+            if timers is not None and delay > 0:
+                self.greenlet = gevent.Greenlet(self.start_event_loop)
+                self.start_timer = timers.schedule(delay, self.greenlet.start)
+            else:
+                self.greenlet = gevent.spawn_later(delay, self.start_event_loop)
+
             self.set_state(BaseStates.Starting)  # TODO: time how long services take to actually start
         else:  # no meta, assume base service
             self.time_starting_index = time.time()
@@ -216,6 +233,10 @@ class BaseService(ErrorHandlerMixin):
         self.log.info("Stopping...")
         self.set_state(BaseStates.Stopping)
 
+        if self.start_timer is not None:
+            self.start_timer.cancel()
+            self.start_timer = None
+
         if self.greenlet is not None:
             gevent.kill(self.greenlet)
         else:
@@ -256,13 +277,20 @@ class BaseService(ErrorHandlerMixin):
     def has_state(self):
         return self.get_state() is not None
 
+    def is_start_pending(self):
+        """
+        The greenlet waits on a delayed start, see `start()`.
+        :return:
+        """
+        return self.greenlet is not None and not self.greenlet.started and not self.greenlet.dead
+
     def is_zombie(self):
         """
         If there is no state such as Idle, Start, or Stop then this service
         is a zombie.
         :return:
         """
-        return not self.has_state() or not self.greenlet.started
+        return not self.has_state() or not (self.greenlet.started or self.is_start_pending())
 
     def is_truly_dead(self):
         """
@@ -301,8 +329,27 @@ class BaseService(ErrorHandlerMixin):
         self.log.debug("Service state is being set to: [%s]" % state)
         self._service_state = state
 
+    def get_directory_handle(self):
+        """
+        :return: this service's directory handle, None if not in the directory
+        """
+        handle = self.handle
+
+        if handle is None or not handle.valid:
+            handle = self.handle = self.get_directory_service_proxy().get_handle(self.alias)
+
+        return handle
+
+    def get_meta(self):
+        """
+        :return: this service's metadata, None if not in the directory
+        """
+        handle = self.get_directory_handle()
+        return None if handle is None else handle.service_meta
+
     def set_directory_service_proxy(self, directory_proxy):
         self.directory_proxy = directory_proxy
+        self.handle = None
 
     def get_directory_service_proxy(self):
         return self.directory_proxy
@@ -367,25 +414,90 @@ class QueuedService(BaseService):
         return self._queue
 
 
+class ServiceHandle(object):
+    """
+    A cached reference to a directory entry, see `DirectoryService.get_handle()`.
+    Holds the service and its metadata (like a `ServiceDirectoryEntry`) until
+    the entry is invalidated, check `valid` before use.
+    """
+    __slots__ = ("alias", "service", "service_meta", "version", "valid")
+
+    def __init__(self, alias, entry, version):
+        self.alias = alias
+        self.service = entry.service
+        self.service_meta = entry.service_meta
+        self.version = version  # directory version the handle was taken at
+        self.valid = True
+
+
 class DirectoryService(BaseService):
     """
     Proxy for directory dictionary as opposed to the full
     dictionary. At least to control mishaps. This is
     essentially a service catalogue.
+
+    Hands out cached handles to the entries, invalidated by the service
+    manager when a service is added, removed or restarted, so hot paths read
+    attributes rather than looking the entry up on every call.
     """
     def __init__(self, service_manager_directory, parent_logger=None):
         BaseService.__init__(self, "directory-service", parent_logger=parent_logger)
         self._service_manager_directory = service_manager_directory
+        self._handles = {}  # alias -> ServiceHandle
+        self.version = 0  # incremented on every invalidation
 
     def event_loop(self):
         pass
 
+    def get_handle(self, alias):
+        """
+        :param alias:
+        :return: the ServiceHandle, the same one until invalidated, or None if not in the directory
+        """
+        handle = self._handles.get(alias)
+
+        if handle is not None and handle.valid:
+            return handle
+
+        entry = self._service_manager_directory.get(alias)
+
+        if entry is None:
+            return None
+
+        handle = self._handles[alias] = ServiceHandle(alias, entry, self.version)
+        return handle
+
+    def invalidate(self, alias):
+        """
+        Call when the entry of the alias is added, removed or restarted.
+        :param alias:
+        :return:
+        """
+        self.version += 1
+        handle = self._handles.pop(alias, None)
+
+        if handle is not None:
+            handle.valid = False
+
     def get_service_count(self):
         return len(self._service_manager_directory)
 
     def get_service(self, alias):
         return self._service_manager_directory.get(alias).service
 
+    def find_service(self, alias):
+        """
+        For optional services.
+        :param alias:
+        :return: the service, or None if not in the directory
+        """
+        entry = self._service_manager_directory.get(alias)
+
+        if entry is None:
+            return None
+
+        return entry.service
+
     def get_service_meta(self, alias):
         service = self._service_manager_directory.get(alias)
         if service is not None:
@@ -39,6 +39,12 @@ class CannedOS(BaseService):
         BaseService.__init__(self, name)
         self.scheduler = Scheduler("scheduler", parent_logger=self.log)
 
+    def event_loop(self):
+        """
+        One pass, the scheduler runs the services.
+        """
+        pass
+
     def bootup(self):
         """
         Boots up the OS and any services which the scheduler has
@@ -58,15 +64,16 @@ class CannedOS(BaseService):
             self.scheduler.stop()
             self.stop()
 
-    def schedule_service(self, service_class, service_meta, error_handlers=[]):
+    def schedule_service(self, service_class, service_meta, error_handlers=[], **kwargs):
         """
         Take a service and let the instaniation begin here.
         :param service_class: python class to use
         :param service_meta: metadata about the service
         :param error_handlers: a list of error handlers which to execute
+        :param kwargs: passed on to the service constructor
         :return:
         """
-        service = service_class(service_meta.alias, parent_logger=self.log)
+        service = service_class(service_meta.alias, parent_logger=self.log, **kwargs)
         service.add_error_handlers(error_handlers)
         self.scheduler.add_service_with_meta(service, service_meta)
 
@@ -22,6 +22,13 @@ class ServiceMetaDataNotFound(Exception):
         Exception.__init__(self, self.msg)
 
 
+class ServiceDependencyCycleException(Exception):
+    msg = "The dependencies of service [%s] lead back to it, it could never start."
+
+    def __init__(self, alias):
+        Exception.__init__(self, self.msg % alias)
+
+
 class ServiceException(Exception):
     msg = "A service has raised an exception or an error was detected! Inner error: [%s]"
 
@@ -41,3 +48,17 @@ class HandlerException(Exception):
 
     def __init__(self, inner_error):
         Exception.__init__(self, self.msg % inner_error)
+
+
+class ResponseTooLargeException(Exception):
+    msg = "Response body from [%s] exceeded the maximum of [%d] bytes, request aborted."
+
+    def __init__(self, uri, max_bytes):
+        Exception.__init__(self, self.msg % (uri, max_bytes))
+
+
+class ChangeFeedTruncatedException(Exception):
+    msg = "Changes after seq [%d] were dropped from the change feed, the oldest kept is [%d]."
+
+    def __init__(self, after, first):
+        Exception.__init__(self, self.msg % (after, first))
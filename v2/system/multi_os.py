@@ -0,0 +1,165 @@
+from __future__ import absolute_import  # `os` is the stdlib module, not v2.system.os
+
+# external
+import multiprocessing
+import os
+import signal
+
+import gevent
+import gevent.os
+from gevent.event import Event
+
+# lib
+from v2.data.shards import Shard
+from v2.services.retry_delays import basic_delay
+from v2.system.canned_os import CannedOS
+
+__author__ = 'jason'
+
+
+class WorkerEntry(object):
+    """
+    A worker process as seen by the parent.
+    """
+    def __init__(self, shard):
+        self.shard = shard
+        self.pid = None  # None while not running
+        self.starts = 0
+        self.exits = []  # wait statuses, see `os.WEXITSTATUS()`
+        self.exited = Event()  # set while not running
+
+    def is_alive(self):
+        return self.pid is not None
+
+
+class MultiProcessOS(CannedOS):
+    """
+    Runs the pipeline on `workers` processes, one gevent hub per core.
+
+    The parent boots its own scheduler, then forks the workers. Each worker
+    boots a CannedOS of its own, with its own scheduler and service manager,
+    and `setup(os, shard)` schedules its services there. Services sharding
+    their work (see `InitializerService`) take the `Shard`, so each worker only
+    polls the resources it owns by the crc32 of their key.
+
+    The parent supervises the workers: a child watcher reports each exit and
+    the worker is forked again after `retry_delay_fx(starts)` seconds, held on
+    the parent scheduler's timers, until `retries` (-1 for ever) are spent.
+    Workers are sent SIGTERM on shutdown and SIGKILL after `stop_timeout`.
+
+    Workers share nothing but the db file: each holds its own queues, caches
+    and rate limit budgets.
+    """
+    def __init__(self, name, setup, workers=None, retries=-1, retry_delay_fx=basic_delay, stop_timeout=10):
+        CannedOS.__init__(self, name)
+        self.setup = setup  # fx(os, shard) scheduling the services of a worker
+        self.worker_count = multiprocessing.cpu_count() if workers is None else workers
+        self.retries = retries
+        self.retry_delay_fx = retry_delay_fx
+        self.stop_timeout = stop_timeout
+        self.workers = {}  # shard index -> WorkerEntry
+        self.stopping = False
+
+    def bootup(self):
+        """
+        Boots up the OS, then forks the workers.
+        :return:
+        """
+        CannedOS.bootup(self)
+
+        for index in xrange(self.worker_count):
+            self.workers[index] = WorkerEntry(Shard(index, self.worker_count))
+            self.spawn_worker(index)
+
+    def spawn_worker(self, index):
+        if self.stopping:
+            return None
+
+        entry = self.workers[index]
+        pid = gevent.os.fork_and_watch(lambda watcher: self.on_worker_exit(index, watcher))
+
+        if pid == 0:
+            self.run_worker(entry.shard)  # never returns
+
+        entry.pid = pid
+        entry.starts += 1
+        entry.exited.clear()
+        self.log.info("worker [%d] forked, pid: [%d], starts: [%d]" % (index, pid, entry.starts))
+        return pid
+
+    def run_worker(self, shard):
+        """
+        The worker process, exits once its OS has shut down on SIGTERM.
+        :param shard:
+        :return:
+        """
+        code = 0
+
+        try:
+            # the parent's state was forked along, it must not fork workers here. Restarts
+            # are forked from the timers' greenlet, which this worker then runs on.
+            self.stopping = True
+
+            worker = CannedOS("%s/worker-%d" % (self.alias, shard.index))
+            stopped = Event()
+            gevent.signal(signal.SIGTERM, stopped.set)
+
+            worker.bootup()
+            self.setup(worker, shard)
+
+            while not stopped.wait(1):  # a timeout keeps the hub from exiting while idle
+                pass
+
+            worker.shutdown()
+        except BaseException as ex:
+            self.log.error("worker [%d] failed: [%s]" % (shard.index, ex))
+            code = 1
+        finally:
+            os._exit(code)
+
+    def on_worker_exit(self, index, watcher):
+        """
+        Runs in the hub, keep it short, restarts are forked from the timers.
+        """
+        gevent.os.waitpid(watcher.pid, os.WNOHANG)  # drops the finished watcher
+
+        entry = self.workers[index]
+        entry.pid = None
+        entry.exits.append(watcher.rstatus)
+        entry.exited.set()
+
+        if self.stopping:
+            return
+
+        if self.retries != -1 and (entry.starts - 1) >= self.retries:
+            self.log.error("worker [%d] exited, status: [%d], retry limit [%d] reached" % (
+                index, watcher.rstatus, self.retries))
+            return
+
+        delay = self.retry_delay_fx(entry.starts)
+        self.log.warn("worker [%d] exited, status: [%d], restarting in [%s]s" % (index, watcher.rstatus, delay))
+        self.scheduler.timers.schedule(delay, self.spawn_worker, index)
+
+    def alive_workers(self):
+        return len([entry for entry in self.workers.itervalues() if entry.is_alive()])
+
+    def stop_workers(self):
+        self.stopping = True
+
+        for entry in self.workers.itervalues():
+            if entry.is_alive():
+                os.kill(entry.pid, signal.SIGTERM)
+
+        for entry in self.workers.itervalues():
+            pid = entry.pid
+
+            if pid is not None and not entry.exited.wait(self.stop_timeout) and entry.pid == pid:
+                self.log.warn("worker [%d] did not stop in [%s]s, killing" % (entry.shard.index, self.stop_timeout))
+                os.kill(pid, signal.SIGKILL)
+
+    def shutdown(self):
+        if self.is_stopping() or self.has_stopped():
+            self.log.warn("service has already received command to stop, ignoring additional request...")
+        else:
+            self.stop_workers()
+            CannedOS.shutdown(self)
@@ -1,12 +1,17 @@
 # external
+import time
+
 import gevent
+from gevent.event import Event
 from greplin import scales
 
 # lib
-from v2.system.exceptions import ServiceMetaDataNotFound, ServiceNotIdleException, ServiceTimeout
+from v2.system.exceptions import ServiceDependencyCycleException, ServiceMetaDataNotFound, ServiceNotIdleException, \
+    ServiceTimeout
 from v2.services.services import BaseService, DirectoryService
 from v2.system.states import BaseStates
 from v2.system.strategies import RoundRobinIndexer
+from v2.system.timers import TimerWheel
 from v2.data.simple_data import ServiceMetaData, ServiceDirectoryEntry
 
 __author__ = 'jason'
@@ -15,13 +20,38 @@ __author__ = 'jason'
 class ServiceManager(BaseService):
     """
     ServiceManager is in charge of starting or stopping services.
+
+    Supervision is driven by events rather than by polling every service.
+    A service is only checked once it is marked dirty (see `notify()`): when
+    it is added, when its greenlet finishes (a link set on every start) or when
+    its start timeout may have passed (a timer set on every start). The
+    scheduler waits on `changed` and checks the dirty services, so the work
+    per loop follows the number of state changes, not the number of services.
+
+    Services first start in dependency order (see `ServiceMetaData.depends_on`):
+    a service waits until the services it depends on have started, and is
+    checked again as each of them starts, so independent services start
+    together in waves. The seconds each service takes to be ready, from boot
+    or from being added, and the seconds until every service added has been
+    ready once, are recorded.
     """
     family_latency = scales.HistogramAggregationStat('latency')
+    checks = scales.IntStat('checks')  # services checked by `monitor_services()`
+    time_to_ready = scales.PmfStat('time_to_ready')  # seconds for a service to first start
+    time_to_boot = scales.DoubleStat('time_to_boot')  # seconds for every service to first start
 
-    def __init__(self, name, parent_logger=None):
+    def __init__(self, name, parent_logger=None, timers=None):
         scales.init(self, '/service-manager')
         BaseService.__init__(self, name, parent_logger=parent_logger)
 
+        # delayed starts and start timeouts, the scheduler's wheel if any
+        self.timers = TimerWheel() if timers is None else timers
+        self.dirty = set()  # aliases of the services to check
+        self.changed = Event()  # set when a service is marked dirty
+        self.dependents = {}  # alias -> set of aliases of the services depending on it
+        self.unregistered = set()  # aliases of the services to register on their first start
+        self.unready = {}  # alias -> time added, for the services yet to first start
+        self.time_booted_index = None  # time the manager started
         self.service_directory = {}  # the directory
         service_directory = DirectoryService(self.service_directory, parent_logger=self.log)  # wrapper
 
@@ -43,6 +73,21 @@ class ServiceManager(BaseService):
             return (service_entry.service.ready() and
                     not service_entry.service.has_started())
 
+        def dependencies_started(service_entry):
+            """
+            A service only first starts once the services it depends on have started,
+            it is checked again as each of them starts.
+            :param service_entry:
+            :return:
+            """
+            for dependency in service_entry.service_meta.depends_on:
+                dependency_entry = self.service_directory.get(dependency)
+
+                if dependency_entry is None or not dependency_entry.service.has_started():
+                    return False
+
+            return True
+
         def recoverable(service_entry):
             """
             A recoverable service is one which is a zombie (has no BaseService state)
@@ -94,7 +139,11 @@ class ServiceManager(BaseService):
             pid = None
 
             try:
-                pid = service_entry.service.start(service_entry.service_meta)
+                if service_entry.service_meta.alias in self.unregistered:
+                    self.unregistered.discard(service_entry.service_meta.alias)
+                    service_entry.service.register()  # its dependencies are now in the directory
+
+                pid = service_entry.service.start(service_entry.service_meta, timers=self.timers)
             except ServiceNotIdleException as service_ex:
                 # TODO: use the finite exception in the future
                 service_entry.service.handle_error(service_ex)
@@ -103,6 +152,10 @@ class ServiceManager(BaseService):
                 service_entry.service.handle_error(ex)
 
             service_entry.service_meta.increment_starts()
+
+            if pid is not None:
+                self.watch(service_entry)
+
             return pid_status(pid)
 
         def timed_out(service_entry):
@@ -136,6 +189,11 @@ class ServiceManager(BaseService):
                     in_entry.service_meta.exceptions.append(in_entry.service.greenlet.exception)
                 return start(in_entry)
             elif startable(in_entry):
+                if not dependencies_started(in_entry):
+                    self.log.debug("service [%s] waiting on its dependencies" % in_entry.service_meta.alias,
+                                   service_alias=in_entry.service_meta.alias)
+                    return 0
+
                 self.log.info("executing service start for [%s]" % in_entry.service_meta.alias,
                               service_alias=in_entry.service_meta.alias)
                 return start(in_entry)
@@ -147,9 +205,12 @@ class ServiceManager(BaseService):
             elif timed_out(in_entry):
                 return remove_service(in_entry)
             else:  # if already started perhaps, and not a zombie, or has not yet timed out; do nothing.
+                if in_entry.service.is_starting():  # checked before its timeout, check again then
+                    self.watch_start_timeout(in_entry)
+
                 return 0
 
-        entry = self.get_service_entry(alias)
+        entry = self.get_handle(alias)  # cached, attribute access until the service is added, removed or restarted
 
         # weird use case should never happen
         # if entry is None:
@@ -159,9 +220,102 @@ class ServiceManager(BaseService):
         check_meta(entry)
         return handle(entry)
 
+    def event_loop(self):
+        """
+        Supervision runs within the scheduler's loop, see `monitor_services()`.
+        """
+        pass
+
+    def notify(self, alias):
+        """
+        Marks a service to be checked by the next `monitor_services()`. Call it
+        whenever something may change what the manager should do with it.
+        :param alias:
+        :return:
+        """
+        self.dirty.add(alias)
+        self.changed.set()
+
+    def watch(self, service_entry):
+        """
+        Checks the service when its greenlet finishes, and when its start
+        times out if it has a start timeout.
+        :param service_entry:
+        :return:
+        """
+        alias = service_entry.service_meta.alias
+        service_entry.service.greenlet.rawlink(lambda greenlet: self.notify(alias))
+        self.watch_start_timeout(service_entry)
+
+    def on_service_started(self, service):
+        """
+        Called from the service's greenlet each time it enters the `Started` state,
+        checks the services depending on it and records how long it took to be ready.
+        :param service:
+        :return:
+        """
+        for dependent in self.dependents.get(service.alias, ()):
+            self.notify(dependent)
+
+        added = self.unready.pop(service.alias, None)
+
+        if added is None or self.time_booted_index is None:  # restarted, or started on its own
+            return
+
+        meta = self.get_service_meta(service.alias)
+        meta.time_to_ready = service.time_started_index - max(added, self.time_booted_index)
+        self.time_to_ready = meta.time_to_ready
+        self.log.info("service [%s] ready in [%.3f]s" % (service.alias, meta.time_to_ready),
+                      service_alias=service.alias)
+
+        if not self.unready:
+            self.time_to_boot = service.time_started_index - self.time_booted_index
+            self.log.info("all [%d] services ready in [%.3f]s" % (len(self.service_directory), self.time_to_boot))
+
+    def check_dependencies(self, service_meta):
+        """
+        :param service_meta: of a service to add
+        :return:
+        :raises ServiceDependencyCycleException: if its dependencies, through the services added, depend on it
+        """
+        seen = set()
+        pending = list(service_meta.depends_on)
+
+        while pending:
+            alias = pending.pop()
+
+            if alias == service_meta.alias:
+                raise ServiceDependencyCycleException(service_meta.alias)
+
+            if alias in seen:
+                continue
+
+            seen.add(alias)
+            entry = self.service_directory.get(alias)
+
+            if entry is not None:
+                pending.extend(entry.service_meta.depends_on)
+
+    def watch_start_timeout(self, service_entry):
+        meta = service_entry.service_meta
+
+        if meta.start_timeout > 0:
+            remaining = meta.delay + meta.start_timeout - service_entry.service.start_time_delta()
+            self.timers.schedule(remaining, self.notify, meta.alias)
+
+    def wait_for_changes(self, timeout=None):
+        """
+        Blocks the calling greenlet until a service is marked dirty.
+        :param timeout: seconds, None to wait for ever
+        :return: True if services are dirty
+        """
+        self.changed.wait(timeout)
+        return len(self.dirty) > 0
+
     def monitor_services(self):
         """
-        Starts all designated services from the internal directory.
+        Starts, restarts or times out the dirty services from the internal
+        directory, see `notify()`.
 
         A service once stopped is removed from this directory and that
         prevents it from starting back up again.
@@ -181,13 +335,16 @@ class ServiceManager(BaseService):
         :return:
         """
         started_services = 0
+        dirty, self.dirty = self.dirty, set()
+        self.changed.clear()
 
-        for alias, entry in self.service_directory.iteritems():
+        for alias in dirty:
             """
-            Very important to not change this directory's size during
-            the start_service or any child there after.
+            Services stopped since they were marked are no longer in the directory.
             """
-            started_services += self.start_service(alias)
+            if alias in self.service_directory:
+                self.checks += 1
+                started_services += self.start_service(alias)
 
         if started_services > 0:
             self.log.debug("started [%d] services in one event loop" % started_services)
@@ -196,6 +353,7 @@ class ServiceManager(BaseService):
 
     def start(self):
         BaseService.start(self)
+        self.time_booted_index = time.time()
         self.get_directory_service_proxy().start()
 
         self.log.info("starting services...")
@@ -209,17 +367,35 @@ class ServiceManager(BaseService):
         :param service: the actual service
         :param service_meta: metadata about the service
         :return:
+        :raises ServiceDependencyCycleException: if the service's dependencies depend on it
         """
         self.log.debug("service %s added" % service_meta.alias)
         service.set_directory_service_proxy(self.get_directory_service_proxy())
-        service.register()  # trigger and registration of data
+
+        # services looking up their dependencies are registered once those are in the directory
+        deferred = not all(dependency in self.service_directory for dependency in service_meta.depends_on)
+
+        if not deferred:
+            service.register()  # trigger and registration of data
 
         if service_meta.alias in self.service_directory:
             self.log.warn("service [%s] already exists" % service_meta.alias)
             return False
 
+        self.check_dependencies(service_meta)
+
+        if deferred:
+            self.unregistered.add(service_meta.alias)
+
+        for dependency in service_meta.depends_on:
+            self.dependents.setdefault(dependency, set()).add(service_meta.alias)
+
+        service.add_started_listener(self.on_service_started)
         entry = ServiceDirectoryEntry(service, service_meta)
         self.service_directory[service_meta.alias] = entry  # record the service, aka the pid
+        self.unready[service_meta.alias] = time.time()
+        self.get_directory_service_proxy().invalidate(service_meta.alias)
+        self.notify(service_meta.alias)
         return True
 
     def stop_service_pid(self, service, halt=False):
@@ -247,6 +423,9 @@ class ServiceManager(BaseService):
 
             if not halt:
                 self.service_directory.pop(incoming_service.alias)
+                self.unready.pop(incoming_service.alias, None)
+                self.unregistered.discard(incoming_service.alias)
+                self.get_directory_service_proxy().invalidate(incoming_service.alias)
 
             return True
 
@@ -271,6 +450,8 @@ class ServiceManager(BaseService):
     def restart_service(self, alias):
         self.log.info("Attempting restart of service: [%s]" % alias, service_alias=alias)
         if self.stop_service(alias, halt=True):  # service was able to be stopped
+            self.get_directory_service_proxy().invalidate(alias)
+
             if self.start_service(alias) > 0:  # service was able to be started
                 self.log.info("Service [%s] restarted successfully" % alias, service_alias=alias)
                 return True
@@ -303,6 +484,9 @@ class ServiceManager(BaseService):
     def get_service_entry(self, alias):
         return self.get_directory_service_proxy().get_service_entry(alias)
 
+    def get_handle(self, alias):
+        return self.get_directory_service_proxy().get_handle(alias)
+
 
 class Scheduler(BaseService):
     """
@@ -321,8 +505,11 @@ class Scheduler(BaseService):
     def __init__(self, name, parent_logger=None):
         BaseService.__init__(self, name, parent_logger=parent_logger)
 
+        # one wheel holds the delayed starts, retry delays and start timeouts of every service
+        self.timers = TimerWheel()
+
         # workers each handle one rest endpoint
-        self.service_manager = ServiceManager("service-manager", parent_logger=self.log)
+        self.service_manager = ServiceManager("service-manager", parent_logger=self.log, timers=self.timers)
 
         self.set_directory_service_proxy(self.service_manager.get_directory_service_proxy())
 
@@ -332,7 +519,8 @@ class Scheduler(BaseService):
     def event_loop(self):
         while self.should_loop():
             # self.event_loop_next()
-            # schedule the service manager to start designated services if any
+            # block until services change, then have the service manager act on them
+            self.service_manager.wait_for_changes()
             pids = self.service_manager.monitor_services()
 
             gevent.idle()
@@ -402,5 +590,6 @@ class Scheduler(BaseService):
         """
         self.service_manager.stop_services()
         self.service_manager.stop()
+        self.timers.stop()
         BaseService.stop(self)
 
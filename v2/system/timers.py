@@ -0,0 +1,237 @@
+import sys
+import time
+
+import gevent
+from gevent.event import Event
+
+__author__ = 'jason'
+
+
+class Timer(object):
+    """
+    A callback scheduled on a `TimerWheel`.
+    """
+    __slots__ = ("wheel", "expires", "callback", "args", "cancelled")
+
+    def __init__(self, wheel, expires, callback, args):
+        self.wheel = wheel
+        self.expires = expires  # tick at which the timer fires
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        O(1), the timer is dropped when its slot is reached.
+        """
+        if not self.cancelled:
+            self.cancelled = True
+            self.wheel.pending -= 1
+
+
+class TimerWheel(object):
+    """
+    Hierarchical timer wheel: `levels` wheels of `2 ** bits` slots, each slot of
+    a level spanning a whole turn of the level below. A timer is put in the
+    slot of the lowest level which reaches its expiry and moves down a level
+    each time the wheel above turns, so scheduling, cancelling and firing are
+    O(1) per timer whatever the number of timers. Timers further than the top
+    level reaches wait in an overflow list.
+
+    Timers fire on the first tick at or after their expiry, never before, in
+    one greenlet which runs only while timers are pending. It sleeps until the
+    next tick with work (see `next_tick()`), not tick by tick, and is woken
+    early when a sooner timer is scheduled. Times are seconds. Callbacks run
+    within that greenlet, keep them short and do not raise.
+    """
+    def __init__(self, tick=0.01, bits=6, levels=4, clock=time.time):
+        self.tick = tick
+        self.bits = bits
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.levels = levels
+        self.clock = clock
+        self.wheels = [[[] for _ in xrange(self.size)] for _ in xrange(levels)]
+        self.overflow = []
+        self.current = self.now_tick()  # the last tick processed
+        self.pending = 0  # timers neither fired nor cancelled
+        self.greenlet = None
+        self.wake_tick = None  # the tick the greenlet sleeps until
+        self.wakeup = Event()  # set to wake the greenlet for a sooner timer
+
+    def now_tick(self):
+        return int(self.clock() / self.tick)
+
+    def __len__(self):
+        return self.pending
+
+    def schedule(self, delay, callback, *args):
+        """
+        :param delay: seconds from now
+        :param callback: called with `args` once the delay has passed
+        :return: the Timer, to cancel it
+        """
+        if self.pending == 0:  # nothing to process up to now
+            self.current = max(self.current, self.now_tick())
+
+        expires = int((self.clock() + max(delay, 0)) / self.tick) + 1  # the first whole tick after the expiry
+        timer = Timer(self, expires, callback, args)
+        self.pending += 1
+        self._add(timer)
+
+        if self.greenlet is None:
+            self.greenlet = gevent.spawn(self.run)
+        elif self.wake_tick is not None and expires < self.wake_tick:
+            self.wakeup.set()
+
+        return timer
+
+    def _add(self, timer):
+        delta = timer.expires - self.current
+
+        if delta <= 0:  # due, fire on the next tick
+            self.wheels[0][(self.current + 1) & self.mask].append(timer)
+            return
+
+        for level in xrange(self.levels):
+            if delta < 1 << (self.bits * (level + 1)):
+                self.wheels[level][(timer.expires >> (self.bits * level)) & self.mask].append(timer)
+                return
+
+        self.overflow.append(timer)
+
+    def _cascade(self, level):
+        """
+        Moves the timers of the current slot of `level` down, as the level below turned.
+        :return: True if this level turned as well
+        """
+        index = (self.current >> (self.bits * level)) & self.mask
+        timers = self.wheels[level][index]
+        self.wheels[level][index] = []
+
+        for timer in timers:
+            if not timer.cancelled:
+                self._add(timer)
+
+        return index == 0
+
+    def next_tick(self):
+        """
+        The next tick with work: the first non-empty slot of the lowest level,
+        or the first turn of a higher level (or of the top level, for the
+        overflow) which moves timers down, whichever comes first. Ticks in
+        between hold nothing and are skipped. Slots of cancelled timers count,
+        that only wakes the greenlet once more.
+        :return: the tick
+        """
+        best = None
+
+        for offset in xrange(1, self.size + 1):
+            if self.wheels[0][(self.current + offset) & self.mask]:
+                best = self.current + offset
+                break
+
+        for level in xrange(1, self.levels + 1):
+            span = 1 << (self.bits * level)
+            turn = (self.current // span + 1) * span
+
+            if best is not None and turn >= best:  # the turns of higher levels are later still
+                break
+
+            if level == self.levels:
+                if self.overflow:
+                    best = turn
+                break
+
+            for offset in xrange(self.size):
+                tick = turn + offset * span
+
+                if best is not None and tick >= best:
+                    break
+
+                if self.wheels[level][(tick >> (self.bits * level)) & self.mask]:
+                    best = tick
+                    break
+
+        return best
+
+    def advance(self, now_tick=None):
+        """
+        Processes every tick up to `now_tick`, firing the timers due.
+        :return: the number of timers fired
+        """
+        if now_tick is None:
+            now_tick = self.now_tick()
+
+        fired = 0
+
+        while self.current < now_tick and self.pending > 0:
+            tick = self.next_tick()
+
+            if tick is None or tick > now_tick:  # nothing due up to now
+                self.current = now_tick
+                break
+
+            self.current = tick
+
+            if self.current & self.mask == 0:
+                level = 1
+
+                while level < self.levels and self._cascade(level):
+                    level += 1
+
+                if level == self.levels:  # the top level turned
+                    overflow, self.overflow = self.overflow, []
+
+                    for timer in overflow:
+                        if not timer.cancelled:
+                            self._add(timer)
+
+            index = self.current & self.mask
+            timers = self.wheels[0][index]
+            self.wheels[0][index] = []
+
+            for timer in timers:
+                if timer.cancelled:
+                    continue
+
+                if timer.expires > self.current:  # a later turn of this slot
+                    self._add(timer)
+                    continue
+
+                timer.cancelled = True
+                self.pending -= 1
+                fired += 1
+
+                try:
+                    timer.callback(*timer.args)
+                except Exception:
+                    gevent.get_hub().handle_error(timer.callback, *sys.exc_info())
+
+        if self.pending == 0:
+            self.current = max(self.current, now_tick)
+
+        return fired
+
+    def run(self):
+        try:
+            while self.pending > 0:
+                self.wake_tick = self.next_tick()
+                self.wakeup.clear()
+
+                if self.wake_tick is None:  # nothing left in the slots
+                    break
+
+                self.wakeup.wait(max(self.wake_tick * self.tick - self.clock(), 0))
+                self.advance()
+        finally:
+            self.greenlet = None
+            self.wake_tick = None
+
+    def stop(self):
+        """
+        Stops firing, timers still pending fire once a timer is scheduled again.
+        """
+        if self.greenlet is not None:
+            self.greenlet.kill()
+            self.greenlet = None